@@ -12,8 +12,10 @@ target_metadata = Base.metadata
 # Конфигурация Alembic
 config = context.config
 
-# Настройка логирования
-if config.config_file_name is not None:
+# Настройка логирования (не трогаем логгеры приложения при запуске из Database.setup)
+if config.config_file_name is not None and config.attributes.get(
+    "configure_logger", True
+):
     fileConfig(config.config_file_name)
 
 def run_migrations_offline():
@@ -41,6 +43,8 @@ def run_migrations_online():
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
+            # SQLite не умеет ALTER COLUMN, там таблицы пересоздаются
+            render_as_batch=connection.dialect.name == "sqlite",
         )
 
         with context.begin_transaction():
@@ -0,0 +1,39 @@
+"""visitors holds seat
+
+Revision ID: 4afb2175eca4
+Revises: a2791e301bf9
+Create Date: 2026-10-16 22:30:49.311445
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4afb2175eca4'
+down_revision: Union[str, None] = 'a2791e301bf9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "visitors",
+        sa.Column("holds_seat", sa.Boolean(), nullable=False, server_default="1"),
+    )
+    # Счётчик раньше не увеличивался при регистрации, пересчитываем его
+    op.execute(
+        "UPDATE registrations SET visitors_count = ("
+        "SELECT count(*) FROM visitors"
+        " WHERE visitors.to_datetime = registrations.date AND visitors.holds_seat"
+        ")"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("visitors") as batch_op:
+        batch_op.drop_column("holds_seat")
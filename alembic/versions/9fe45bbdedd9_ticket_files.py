@@ -0,0 +1,41 @@
+"""ticket files
+
+Revision ID: 9fe45bbdedd9
+Revises: 4afb2175eca4
+Create Date: 2026-10-16 22:37:55.221388
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9fe45bbdedd9'
+down_revision: Union[str, None] = '4afb2175eca4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Database.setup раньше вызывал create_all до миграций, и таблица могла
+    # появиться без них
+    if sa.inspect(op.get_bind()).has_table("ticket_files"):
+        return
+    op.create_table(
+        "ticket_files",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("hash_code", sa.String(), nullable=False),
+        sa.Column("style", sa.String(), nullable=False),
+        sa.Column("qr_key", sa.String(), nullable=False),
+        sa.Column("file_id", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("hash_code", "style"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("ticket_files")
@@ -0,0 +1,39 @@
+"""visitors hot lookup indexes
+
+Revision ID: a2791e301bf9
+Revises: 
+Create Date: 2026-10-16 22:28:53.771709
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a2791e301bf9'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_visitors_tg_id_to_datetime_is_active",
+        "visitors",
+        ["tg_id", "to_datetime", "is_active"],
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_visitors_to_datetime_is_active",
+        "visitors",
+        ["to_datetime", "is_active"],
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_visitors_to_datetime_is_active", table_name="visitors")
+    op.drop_index("ix_visitors_tg_id_to_datetime_is_active", table_name="visitors")
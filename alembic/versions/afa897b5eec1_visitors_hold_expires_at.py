@@ -0,0 +1,45 @@
+"""visitors_hold_expires_at
+
+Revision ID: afa897b5eec1
+Revises: b51afc198d45
+Create Date: 2026-10-17 00:15:43.889607
+
+"""
+from datetime import datetime, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'afa897b5eec1'
+down_revision: Union[str, None] = 'b51afc198d45'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("visitors", sa.Column("hold_expires_at", sa.DateTime(), nullable=True))
+    op.create_index("ix_visitors_hold_expires_at", "visitors", ["hold_expires_at"])
+    # Брошенные раньше неоплаченные записи держали место бессрочно, даем
+    # им пять минут на оплату (время приложения локальное, как в моделях)
+    visitors = sa.table(
+        "visitors",
+        sa.column("is_active", sa.Boolean()),
+        sa.column("holds_seat", sa.Boolean()),
+        sa.column("hold_expires_at", sa.DateTime()),
+    )
+    op.execute(
+        visitors.update()
+        .where(visitors.c.is_active.is_(False), visitors.c.holds_seat.is_(True))
+        .values(hold_expires_at=datetime.now() + timedelta(minutes=5))
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_visitors_hold_expires_at", table_name="visitors")
+    with op.batch_alter_table("visitors") as batch_op:
+        batch_op.drop_column("hold_expires_at")
@@ -0,0 +1,52 @@
+"""telegram_ids_bigint
+
+Revision ID: b51afc198d45
+Revises: 067075f0991e
+Create Date: 2026-10-17 00:11:14.049569
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b51afc198d45'
+down_revision: Union[str, None] = '067075f0991e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# id пользователей и чатов Telegram не помещаются в 32 бита. В SQLite
+# INTEGER и так 64-битный, в PostgreSQL колонки нужно расширить
+COLUMNS = {
+    "pending_payments": ("tg_id", "chat_id"),
+    "broadcasts": ("author_id", "chat_id"),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, columns in COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            for column in columns:
+                batch_op.alter_column(
+                    column,
+                    existing_type=sa.Integer(),
+                    type_=sa.BigInteger(),
+                    existing_nullable=False,
+                )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, columns in COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            for column in columns:
+                batch_op.alter_column(
+                    column,
+                    existing_type=sa.BigInteger(),
+                    type_=sa.Integer(),
+                    existing_nullable=False,
+                )
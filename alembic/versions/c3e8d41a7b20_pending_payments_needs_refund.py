@@ -0,0 +1,32 @@
+"""pending_payments_needs_refund
+
+Revision ID: c3e8d41a7b20
+Revises: afa897b5eec1
+Create Date: 2026-10-17 12:40:05.517312
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8d41a7b20'
+down_revision: Union[str, None] = 'afa897b5eec1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "pending_payments",
+        sa.Column("needs_refund", sa.Boolean(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("pending_payments") as batch_op:
+        batch_op.drop_column("needs_refund")
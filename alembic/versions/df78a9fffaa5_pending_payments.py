@@ -0,0 +1,42 @@
+"""pending payments
+
+Revision ID: df78a9fffaa5
+Revises: 9fe45bbdedd9
+Create Date: 2026-10-16 22:44:42.536567
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'df78a9fffaa5'
+down_revision: Union[str, None] = '9fe45bbdedd9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Database.setup раньше вызывал create_all до миграций, и таблица могла
+    # появиться без них
+    if sa.inspect(op.get_bind()).has_table("pending_payments"):
+        return
+    op.create_table(
+        "pending_payments",
+        sa.Column("payment_id", sa.String(), nullable=False),
+        sa.Column("hash_code", sa.String(), nullable=False),
+        sa.Column("tg_id", sa.Integer(), nullable=False),
+        sa.Column("chat_id", sa.Integer(), nullable=False),
+        sa.Column("message_id", sa.Integer(), nullable=False),
+        sa.Column("to_datetime", sa.Date(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("payment_id"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("pending_payments")
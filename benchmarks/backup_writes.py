@@ -0,0 +1,102 @@
+"""Задержка записи во время резервного копирования
+
+На базе из rows посетителей писатель регистрирует посетителей
+(reg_new_visitor) в отдельном потоке, пока снимается бэкап:
+- legacy: журнал DELETE и sqlite3.backup за один шаг, как было;
+- chunked: WAL и Database._create_backup (по частям, gzip, проверка).
+Печатает длительность бэкапа, размер копии и задержки записей, которые
+пришлись на копирование.
+
+Запуск: python -m benchmarks.backup_writes [rows]
+"""
+
+import logging
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable
+
+from benchmarks.visitor_lookups import DAYS, populate
+from src.classes.database import Database
+
+
+def legacy_backup(db: Database) -> str:
+    """Бэкап как раньше: весь файл одним шагом, без сжатия"""
+    backup_name = f"{db.backup_dir}/{Path(db.db_name).name}_legacy.bak"
+    with sqlite3.connect(db.db_name) as src:
+        with sqlite3.connect(backup_name) as dst:
+            src.backup(dst)
+    return backup_name
+
+
+def run(label: str, db: Database, backup: Callable[[Database], str | None]) -> None:
+    event_day = date.today() + timedelta(days=DAYS)
+    db.add_event(event_day, 10**9)
+    event_date = datetime.combine(event_day, datetime.min.time())
+    # (начало, длительность) каждой записи
+    latencies: list[tuple[float, float]] = []
+    errors = 0
+    running = threading.Event()
+    running.set()
+
+    def writer():
+        nonlocal errors
+        tg_id = 10_000_000
+        while running.is_set():
+            tg_id += 1
+            start = time.perf_counter()
+            try:
+                db.reg_new_visitor(tg_id, event_date)
+            except Exception:
+                errors += 1
+            latencies.append((start, time.perf_counter() - start))
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    time.sleep(0.2)
+    start = time.perf_counter()
+    backup_name = backup(db)
+    end = time.perf_counter()
+    time.sleep(0.2)
+    running.clear()
+    thread.join()
+    # Записи, пересекающиеся с бэкапом (в том числе ждавшие его окончания)
+    during = [
+        duration
+        for begin, duration in latencies
+        if begin < end and begin + duration > start
+    ]
+
+    size = os.path.getsize(backup_name) if backup_name else 0
+    print(
+        f"{label:<8} бэкап {end - start:6.2f} с, {size / 1024 / 1024:7.1f} МБ; "
+        f"записей во время бэкапа {len(during):>5}, "
+        f"медиана {statistics.median(during) * 1e3:6.2f} мс, "
+        f"max {max(during) * 1e3:8.2f} мс, ошибок {errors}"
+    )
+
+
+def main(rows: int):
+    logging.getLogger("database").setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, journal_mode, backup in (
+            ("legacy", "DELETE", legacy_backup),
+            ("chunked", "WAL", Database._create_backup),
+        ):
+            os.environ["DB_JOURNAL_MODE"] = journal_mode
+            db = Database(str(Path(tmp) / label))
+            db.backup_dir = tmp
+            db.setup(backups=False)
+            populate(db, rows)
+            run(label, db, backup)
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
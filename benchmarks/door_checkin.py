@@ -0,0 +1,141 @@
+"""Пропускная способность проверки билетов на входе
+
+На базе с фоновыми посетителями и tickets билетами на сегодня сравнивает:
+- legacy: check_registration_by_hash + use_hash, как было в /check;
+- index: TicketIndex.check_in (первый скан - один UPDATE);
+- rescan: повторные сканы погашенных билетов (только память);
+- batch: TicketIndex.check_in_many по 10 кодов;
+- unknown: несуществующие старые коды (каждый - запрос к базе);
+- forged, wrong_date: токены с чужой подписью и на завтра
+  (отклоняются без базы).
+Сканеры работают параллельно (scanners корутин). В конце два сканера
+одновременно гасят одни и те же билеты - каждый должен пройти ровно раз.
+
+Запуск: python -m benchmarks.door_checkin [tickets] [scanners] [rows]
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from benchmarks.visitor_lookups import populate
+from src.classes.database import AsyncDatabase, Database
+from src.classes.ticket_index import ScanResult, TicketIndex
+from src.classes.ticket_token import TicketToken
+from src.config import config
+
+
+def add_tickets(db: Database, prefix: str, count: int) -> list[str]:
+    """Добавляет count активных билетов на сегодня"""
+    codes = [f"{prefix}{i}" for i in range(count)]
+    with sqlite3.connect(db.db_name) as conn:
+        conn.executemany(
+            "INSERT INTO visitors (tg_id, to_datetime, hash_code, is_active, is_used)"
+            " VALUES (?, ?, ?, 1, 0)",
+            (
+                (str(-i - 1), date.today().isoformat(), code)
+                for i, code in enumerate(codes)
+            ),
+        )
+    return codes
+
+
+async def scan(
+    label: str,
+    codes: list[str],
+    scanners: int,
+    check: Callable[[list[str]], Awaitable[int]],
+    batch: int = 1,
+) -> None:
+    """Раздает коды scanners сканерам и печатает сканы в секунду"""
+    chunks = [codes[i : i + batch] for i in range(0, len(codes), batch)]
+    queue: asyncio.Queue[list[str]] = asyncio.Queue()
+    for chunk in chunks:
+        queue.put_nowait(chunk)
+    passed = 0
+
+    async def scanner():
+        nonlocal passed
+        while not queue.empty():
+            admitted = await check(queue.get_nowait())
+            passed += admitted
+
+    start = time.perf_counter()
+    await asyncio.gather(*(scanner() for _ in range(scanners)))
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:<10} {len(codes):>6} сканов за {elapsed:6.2f} с: "
+        f"{len(codes) / elapsed:8.0f} сканов/с, пропущено {passed}"
+    )
+
+
+async def main(tickets: int, scanners: int, rows: int):
+    logging.getLogger("database").setLevel(logging.WARNING)
+    os.environ.setdefault("TICKET_SECRET", "door-checkin")
+    secret = config.reload(force=True).ticket_secrets[0]
+    with tempfile.TemporaryDirectory() as tmp:
+        sync_db = Database(str(Path(tmp) / "door"))
+        sync_db.setup(backups=False)
+        populate(sync_db, rows)
+        legacy_codes = add_tickets(sync_db, "legacy", tickets)
+        codes = add_tickets(sync_db, "door", tickets)
+        race_codes = add_tickets(sync_db, "race", tickets)
+        db = AsyncDatabase(sync_db)
+
+        async def legacy(chunk: list[str]) -> int:
+            if await db.check_registration_by_hash(chunk[0]):
+                try:
+                    return int(await db.use_hash(chunk[0]))
+                except ValueError:
+                    return 0
+            return 0
+
+        index = TicketIndex(db)
+        start = time.perf_counter()
+        await index.load()
+        print(f"загрузка индекса: {(time.perf_counter() - start) * 1000:.0f} мс")
+
+        async def indexed(chunk: list[str]) -> int:
+            results = await index.check_in_many(chunk)
+            return sum(result is ScanResult.OK for _, result in results)
+
+        await scan("legacy", legacy_codes, scanners, legacy)
+        await scan("index", codes[: tickets // 2], scanners, indexed)
+        await scan("rescan", codes[: tickets // 2], scanners, indexed)
+        await scan("batch", codes[tickets // 2 :], scanners, indexed, batch=10)
+
+        today, tomorrow = date.today(), date.today() + timedelta(days=1)
+        unknown = [f"unknown{i}" for i in range(tickets)]
+        forged = [TicketToken(i, today).sign(b"forged") for i in range(tickets)]
+        wrong_date = [TicketToken(i, tomorrow).sign(secret) for i in range(tickets)]
+        await scan("unknown", unknown, scanners, indexed)
+        await scan("forged", forged, scanners, indexed)
+        await scan("wrong_date", wrong_date, scanners, indexed)
+
+        # Два сканера на одном входе гасят одни и те же билеты
+        results = await asyncio.gather(
+            *(index.check_in(code) for code in race_codes for _ in range(2))
+        )
+        admitted = sum(result is ScanResult.OK for result in results)
+        with sqlite3.connect(sync_db.db_name) as conn:
+            stored = conn.execute(
+                "SELECT COUNT(*) FROM visitors WHERE hash_code LIKE 'race%' AND is_used"
+            ).fetchone()[0]
+        print(f"гонка: пропущено {admitted} из {len(race_codes)}, в базе {stored}")
+        db.close()
+        sync_db.engine.dispose()
+        if admitted != len(race_codes) or stored != len(race_codes):
+            raise SystemExit("Билет пропущен дважды или отметка не записана")
+
+
+if __name__ == "__main__":
+    args = [int(x) for x in sys.argv[1:]]
+    tickets, scanners, rows = args + [2000, 4, 100_000][len(args) :]
+    asyncio.run(main(tickets, scanners, rows))
@@ -0,0 +1,85 @@
+"""Бенчмарк задержки цикла событий при конкурентных колбэках
+
+Сравнивает синхронные вызовы Database прямо из корутин с вызовами через
+AsyncDatabase. Задержка измеряется опозданием «тикера», который каждые
+TICK секунд засыпает и проверяет, насколько позже он проснулся.
+
+Запуск: python -m benchmarks.event_loop_lag [callbacks]
+"""
+
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from src.classes.database import AsyncDatabase, Database
+
+TICK = 0.005
+
+
+async def ticker(lags: list[float], stop: asyncio.Event):
+    """Замеряет опоздание пробуждений цикла событий"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def sync_callback(db: Database, tg_id: int, event_date: date):
+    """Колбэк, обращающийся к базе напрямую (старое поведение)"""
+    db.check_registration_by_tgid(tg_id, event_date)
+    db.get_available(event_date)
+    db.reg_new_visitor(tg_id, datetime.combine(event_date, datetime.min.time()))
+    await asyncio.sleep(0)
+
+
+async def async_callback(db: AsyncDatabase, tg_id: int, event_date: date):
+    """Колбэк, ожидающий запросы через AsyncDatabase"""
+    await db.check_registration_by_tgid(tg_id, event_date)
+    await db.get_available(event_date)
+    await db.reg_new_visitor(tg_id, datetime.combine(event_date, datetime.min.time()))
+
+
+async def measure(name: str, callbacks) -> None:
+    """Запускает колбэки конкурентно и печатает статистику задержек"""
+    lags: list[float] = []
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*callbacks)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick_task
+    lags.sort()
+    p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))] if lags else 0.0
+    print(
+        f"{name:>6}: {elapsed:.2f} с, тиков {len(lags)}, "
+        f"lag p50={statistics.median(lags or [0]) * 1000:.1f} мс "
+        f"p99={p99 * 1000:.1f} мс max={max(lags or [0]) * 1000:.1f} мс"
+    )
+
+
+async def main(count: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(str(Path(tmp) / "bench"))
+        db.setup(backups=False)
+        sync_date = date.today() + timedelta(days=1)
+        async_date = date.today() + timedelta(days=2)
+        db.add_event(sync_date, count * 2)
+        db.add_event(async_date, count * 2)
+
+        await measure(
+            "sync", [sync_callback(db, i, sync_date) for i in range(count)]
+        )
+        adb = AsyncDatabase(db)
+        await measure(
+            "async", [async_callback(adb, i, async_date) for i in range(count)]
+        )
+        adb.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
@@ -0,0 +1,168 @@
+"""Локальный фейковый эквайринг и замер ожидания подтверждения оплаты
+
+FakeAcquirer реализует Init и GetState API эквайринга и после
+«оплаты» отправляет подписанное уведомление на NotificationURL. Скрипт
+сравнивает время от оплаты до пробуждения await_payment с приемником
+уведомлений и только с опросом, а также проверяет, что уведомление с
+поддельной подписью отклоняется.
+
+Запуск: python -m benchmarks.fake_acquirer [payments] [pay_delay]
+"""
+
+import asyncio
+import itertools
+import statistics
+import sys
+import time
+from typing import Any, Optional
+
+import httpx
+from aiohttp import web
+
+from src.classes.customtinkoffacquiringapclient import (
+    CustomTinkoffAcquiringAPIClient,
+    PaymentNotificationServer,
+)
+
+TERMINAL_KEY = "FakeTerminal"
+SECRET = "fake-secret"
+
+
+class FakeAcquirer:
+    """Фейковый сервер эквайринга на 127.0.0.1"""
+
+    def __init__(self, secret: str = SECRET, pay_delay: Optional[float] = None):
+        self.secret = secret
+        self.pay_delay = pay_delay
+        self.payments: dict[str, dict[str, Any]] = {}
+        self.requests = 0
+        self.url = ""
+        self._ids = itertools.count(1)
+        self._runner: Optional[web.AppRunner] = None
+        self._http: Optional[httpx.AsyncClient] = None
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_post("/v2/Init", self._init)
+        app.router.add_post("/v2/GetState", self._get_state)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{self._runner.addresses[0][1]}"
+        self._http = httpx.AsyncClient()
+        return self.url
+
+    async def stop(self):
+        if self._http:
+            await self._http.aclose()
+        if self._runner:
+            await self._runner.cleanup()
+
+    def attach(self, tb: CustomTinkoffAcquiringAPIClient):
+        """Направляет запросы клиента эквайринга на фейковый сервер"""
+        tb.API_ENDPOINT = f"{self.url}/v2/"
+
+    async def pay(self, payment_id: str, status: str = "CONFIRMED"):
+        """Меняет статус платежа и отправляет уведомление, если оно настроено"""
+        payment = self.payments[payment_id]
+        payment["Status"] = status
+        payment["paid_at"] = time.perf_counter()
+        if not payment.get("NotificationURL") or self._http is None:
+            return
+        data = {
+            "TerminalKey": payment["TerminalKey"],
+            "OrderId": payment["OrderId"],
+            "Success": status == "CONFIRMED",
+            "Status": status,
+            "PaymentId": int(payment_id),
+            "ErrorCode": "0",
+            "Amount": payment["Amount"],
+        }
+        data["Token"] = CustomTinkoffAcquiringAPIClient.sign(data, self.secret)
+        await self._http.post(payment["NotificationURL"], json=data)
+
+    async def _init(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        params = await request.json()
+        payment_id = str(next(self._ids))
+        self.payments[payment_id] = {**params, "Status": "NEW"}
+        if self.pay_delay is not None:
+            asyncio.get_running_loop().call_later(
+                self.pay_delay, lambda: asyncio.create_task(self.pay(payment_id))
+            )
+        return web.json_response(
+            {
+                "Success": True,
+                "ErrorCode": "0",
+                "PaymentId": payment_id,
+                "PaymentURL": f"{self.url}/pay/{payment_id}",
+                "Status": "NEW",
+            }
+        )
+
+    async def _get_state(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        params = await request.json()
+        payment = self.payments.get(str(params.get("PaymentId")))
+        if payment is None:
+            return web.json_response({"Success": False, "Message": "Not found"})
+        return web.json_response(
+            {"Success": True, "ErrorCode": "0", "Status": payment["Status"]}
+        )
+
+
+async def confirm_latency(
+    payments: int, pay_delay: float, notifications: bool
+) -> tuple[list[float], int]:
+    """Задержки (оплата -> пробуждение) и число запросов к эквайрингу"""
+    fake = FakeAcquirer(pay_delay=pay_delay)
+    await fake.start()
+    tb = CustomTinkoffAcquiringAPIClient(TERMINAL_KEY, SECRET)
+    fake.attach(tb)
+    tb.poll_interval = 10
+    receiver = None
+    if notifications:
+        receiver = PaymentNotificationServer(tb, "127.0.0.1", 0)
+        port = await receiver.start()
+        tb.notification_url = f"http://127.0.0.1:{port}{receiver.path}"
+        tb.poll_interval = 60
+
+    async def buyer(i: int) -> float:
+        payment = await tb.init_payment(250, f"order{i}", "Бенчмарк")
+        assert await tb.await_payment(payment["PaymentId"], timeout=120)
+        return time.perf_counter() - fake.payments[payment["PaymentId"]]["paid_at"]
+
+    latencies = await asyncio.gather(*(buyer(i) for i in range(payments)))
+
+    if receiver is not None:
+        forged = {"TerminalKey": TERMINAL_KEY, "PaymentId": 1, "Status": "CONFIRMED"}
+        forged["Token"] = CustomTinkoffAcquiringAPIClient.sign(forged, "wrong")
+        async with httpx.AsyncClient() as http:
+            response = await http.post(tb.notification_url or "", json=forged)
+        assert response.status_code == 403, "поддельное уведомление принято"
+        await receiver.stop()
+    await tb.close()
+    await fake.stop()
+    return list(latencies), fake.requests
+
+
+async def main(payments: int, pay_delay: float):
+    for notifications in (True, False):
+        latencies, requests = await confirm_latency(payments, pay_delay, notifications)
+        print(
+            f"{'уведомления' if notifications else 'опрос':<12} "
+            f"p50 {statistics.median(latencies) * 1000:8.1f} мс, "
+            f"max {max(latencies) * 1000:8.1f} мс, "
+            f"запросов к эквайрингу {requests}"
+        )
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    asyncio.run(
+        main(
+            int(args[0]) if len(args) > 0 else 50,
+            float(args[1]) if len(args) > 1 else 3.0,
+        )
+    )
@@ -0,0 +1,184 @@
+"""Гонка оплаты и истечения удержаний мест
+
+На событии с seats местами все места заняты неоплаченными записями,
+сроки которых истекают в течение spread секунд. processes процессов
+оплачивают их (enable_visitor), пока основной процесс в цикле
+освобождает истекшие удержания
+(release_expired_holds), а покупатели без удержания занимают
+освобожденные места. В конце visitors_count должен совпадать с числом
+записей, держащих место, не превышать seats, а каждая оплаченная
+запись - держать место. При нарушении скрипт завершается с ошибкой,
+поэтому его можно запускать как проверку в CI.
+
+PostgreSQL берется из --postgres или BENCH_POSTGRES_URL
+(postgresql+psycopg://...). Все таблицы в этой базе удаляются, указывать
+нужно отдельную пустую базу.
+
+Запуск: python -m benchmarks.holds_race [--postgres URL] [--seats 1000]
+        [--spread 2] [--processes 4] [--threads 8]
+"""
+
+import argparse
+import functools
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from sqlalchemy import func
+from sqlalchemy.exc import OperationalError
+
+from benchmarks.storage_throughput import reset
+from src.classes.database import Database, Registration, Visitor
+
+
+def attempt(action: Callable[[], Any]) -> str:
+    """Повторяет действие, пока SQLite занят другим писателем"""
+    for _ in range(50):
+        try:
+            action()
+            return "ok"
+        except ValueError:
+            return "full"
+        except OperationalError:
+            time.sleep(0.01)
+    return "locked"
+
+
+def pay_many(
+    url: str, hash_codes: list[str], buyers: list[int], when: datetime, threads: int
+) -> list[str]:
+    """Оплаты и покупки без удержания одного процесса, threads потоков"""
+    logging.getLogger("database").setLevel(logging.WARNING)
+    db = Database(url=url)
+    tasks: list[Callable[[], Any]] = [
+        functools.partial(db.enable_visitor, hash_code=code) for code in hash_codes
+    ]
+    tasks += [functools.partial(db.reg_new_visitor, tg_id, when) for tg_id in buyers]
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        outcomes = list(pool.map(attempt, tasks))
+    db.engine.dispose()
+    return outcomes
+
+
+def run(label: str, url: str, args: argparse.Namespace) -> list[str]:
+    """Оплачивает истекающие удержания одного события, возвращает ошибки"""
+    db = reset(url)
+    event_date = date.today() + timedelta(days=1)
+    when = datetime.combine(event_date, datetime.min.time())
+    db.add_event(event_date, args.seats)
+    buyers = list(range(args.seats, args.seats * 2))
+
+    done = threading.Event()
+    released = 0
+
+    def releaser():
+        nonlocal released
+        while not done.is_set():
+            try:
+                released += len(db.release_expired_holds())
+            except OperationalError:
+                pass
+            time.sleep(0.001)
+
+    thread = threading.Thread(target=releaser)
+    # fork при работающем потоке освобождения унаследовал бы его блокировки
+    with ProcessPoolExecutor(
+        max_workers=args.processes, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        # Процессы запускаются заранее, чтобы оплаты шли вместе с истечением
+        list(pool.map(time.sleep, [0.5] * args.processes))
+        start = datetime.now()
+        hash_codes = [
+            db.reg_new_visitor(
+                i, when, False, start + timedelta(seconds=args.spread * i / args.seats)
+            )
+            for i in range(args.seats)
+        ]
+        thread.start()
+        try:
+            results = pool.map(
+                pay_many,
+                [url] * args.processes,
+                [hash_codes[i :: args.processes] for i in range(args.processes)],
+                [buyers[i :: args.processes] for i in range(args.processes)],
+                [when] * args.processes,
+                [args.threads] * args.processes,
+            )
+            outcomes = [outcome for chunk in results for outcome in chunk]
+        finally:
+            done.set()
+            thread.join()
+
+    with db.get_session() as session:
+        holders = (
+            session.query(func.count(Visitor.id)).filter(Visitor.holds_seat).scalar()
+        )
+        seatless = (
+            session.query(func.count(Visitor.id))
+            .filter(Visitor.is_active.is_(True), Visitor.holds_seat.is_(False))
+            .scalar()
+        )
+        counter = (
+            session.query(Registration.visitors_count)
+            .filter(Registration.date == event_date)
+            .scalar()
+        )
+    db.engine.dispose()
+
+    summary = {k: outcomes.count(k) for k in sorted(set(outcomes))}
+    print(
+        f"{label:<10} исходы: {summary}; освобождено {released}, занято {holders}, "
+        f"visitors_count {counter}, оплачено без места {seatless}"
+    )
+    errors = []
+    if counter != holders:
+        errors.append(f"visitors_count {counter} при {holders} занятых местах")
+    if counter > args.seats:
+        errors.append(f"овербукинг: {counter} из {args.seats}")
+    if seatless:
+        errors.append(f"оплаченных билетов без места: {seatless}")
+    return errors
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--postgres", default=os.getenv("BENCH_POSTGRES_URL"))
+    parser.add_argument("--seats", type=int, default=1000)
+    parser.add_argument(
+        "--spread", type=float, default=2, help="за сколько секунд истекают удержания"
+    )
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    logging.getLogger("database").setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        backends: list[tuple[str, Optional[str]]] = [
+            ("sqlite", f"sqlite:///{Path(tmp) / 'race.db'}"),
+            ("postgresql", args.postgres),
+        ]
+        failed = False
+        for label, url in backends:
+            if url is None:
+                print(f"{label:<10} пропущено: не задан --postgres")
+                continue
+            errors = run(label, url, args)
+            for error in errors:
+                print(f"{label:<10} {error}")
+            failed = bool(errors) or failed
+    if failed:
+        print("Места посчитаны неверно")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,333 @@
+"""Нагрузочный прогон CustomClient: ажиотаж на продаже билетов
+
+Настоящий CustomClient со всеми обработчиками, базой, пулом QR и
+трекером платежей работает без сети:
+- FakeTelegram подменяет методы Telegram API (send_message, send_photo,
+  edit_message_text, ...), отвечая с задержкой rtt, так что Message и
+  CallbackQuery pyrogram ходят в память вместо MTProto;
+- обновления разбираются как в Dispatcher pyrogram: очередь и WORKERS
+  воркеров, фильтры команд и зарегистрированные обработчики;
+- FakeAcquirer из benchmarks.fake_acquirer принимает Init/GetState и
+  присылает подписанные уведомления на встроенный приемник.
+
+Каждый пользователь проходит /start -> «Купить билеты» -> выбор даты ->
+оплату -> получение QR, затем админ проверяет билет через /check.
+В отчете пропускная способность, p50/p99 по шагам, ошибки блокировки
+базы и проверка отсутствия овербукинга.
+
+Запуск: python -m benchmarks.load_test [users] [seats] [rtt_ms] [pay_delay] [ramp]
+Переменная LOAD_TEST_POLL=1 отключает уведомления (только опрос).
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Optional
+
+ADMIN_ID = 900_000_001
+os.environ.setdefault("ADMIN_IDS", str(ADMIN_ID))
+os.environ.setdefault("TINKOFF_TERMINAL_KEY", "FakeTerminal")
+os.environ.setdefault("TINKOFF_SECRET_KEY", "fake-secret")
+
+from pyrogram.enums import ChatType  # noqa: E402
+from pyrogram.handlers import CallbackQueryHandler, MessageHandler  # noqa: E402
+from pyrogram.types import CallbackQuery, Chat, Photo, User  # noqa: E402
+from pyrogram.types import Message as PyrogramMessage  # noqa: E402
+
+from benchmarks.fake_acquirer import SECRET, FakeAcquirer  # noqa: E402
+from src.classes.callback_router import pack  # noqa: E402
+from src.classes.client import CustomClient  # noqa: E402
+from src.classes.customtinkoffacquiringapclient import (  # noqa: E402
+    PaymentNotificationServer,
+)
+from src.classes.database import Database, Registration, Visitor  # noqa: E402
+from src.classes.message.Message import CustomMessage  # noqa: E402
+
+
+class FakeTelegram(CustomClient):
+    """CustomClient, у которого вызовы Telegram API обслуживаются в памяти"""
+
+    def __init__(self, db: Database, rtt: float):
+        super().__init__("loadtest", 1, "0" * 32, "1:fake", db=db)
+        self.rtt = rtt
+        self.me = User(id=1, is_bot=True, first_name="Load", username="loadtest_bot")
+        self.api_calls: Counter[str] = Counter()
+        self.answers: Counter[str] = Counter()
+        self.errors: list[Exception] = []
+        self.photo_waiters: dict[int, asyncio.Future[str]] = {}
+        self._ids = itertools.count(1)
+
+    async def _api(self, method: str) -> None:
+        self.api_calls[method] += 1
+        await asyncio.sleep(self.rtt * random.uniform(0.5, 1.5))
+
+    def _message(self, chat_id: int | str, text: Optional[str] = None, **kw: Any):
+        return PyrogramMessage(
+            client=self,
+            id=next(self._ids),
+            chat=Chat(id=int(chat_id), type=ChatType.PRIVATE, client=self),
+            from_user=self.me,
+            date=datetime.now(),
+            text=text,
+            **kw,
+        )
+
+    async def send_message(self, chat_id, text, *_, **kwargs):
+        await self._api("send_message")
+        return self._message(chat_id, text, reply_markup=kwargs.get("reply_markup"))
+
+    async def send_photo(self, chat_id, photo, *_, caption=None, **__):
+        await self._api("send_photo")
+        sent = self._message(
+            chat_id,
+            caption=caption,
+            photo=Photo(
+                client=self,
+                file_id=f"photo{next(self._ids)}",
+                file_unique_id="u",
+                width=512,
+                height=512,
+                file_size=1,
+                date=datetime.now(),
+            ),
+        )
+        waiter = self.photo_waiters.get(int(chat_id))
+        if waiter is not None and not waiter.done():
+            waiter.set_result(caption or "")
+        return sent
+
+    async def send_media_group(self, chat_id, media, *_, **__):
+        await self._api("send_media_group")
+        return [self._message(chat_id) for _ in media]
+
+    async def edit_message_text(self, chat_id, message_id, text, *_, **kwargs):
+        await self._api("edit_message_text")
+        return self._message(chat_id, text, reply_markup=kwargs.get("reply_markup"))
+
+    async def edit_message_reply_markup(self, chat_id, message_id, reply_markup=None, *_, **__):
+        await self._api("edit_message_reply_markup")
+        return self._message(chat_id, reply_markup=reply_markup)
+
+    async def delete_messages(self, chat_id, message_ids, *_, **__):
+        await self._api("delete_messages")
+        return 1
+
+    async def answer_callback_query(self, callback_query_id, text=None, *_, **__):
+        await self._api("answer_callback_query")
+        if text:
+            self.answers[text] += 1
+        return True
+
+    async def _report_error(self, error: Exception, context: str = ""):
+        self.errors.append(error)
+
+    async def feed(self, update: Any) -> None:
+        """Обрабатывает обновление как Dispatcher pyrogram"""
+        handler_type = (
+            CallbackQueryHandler if isinstance(update, CallbackQuery) else MessageHandler
+        )
+        for group in self.dispatcher.groups.values():
+            for handler in group:
+                if isinstance(handler, handler_type) and await handler.check(
+                    self, update
+                ):
+                    await handler.callback(self, update)
+                    return
+
+
+class LoadTest:
+    """Сценарий нагрузки и сбор результатов"""
+
+    def __init__(self, client: FakeTelegram, event_date: date, ramp: float):
+        self.client = client
+        self.event_date = event_date
+        self.ramp = ramp
+        self.latency: dict[str, list[float]] = defaultdict(list)
+        self.outcomes: Counter[str] = Counter()
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._ids = itertools.count(1)
+
+    async def worker(self) -> None:
+        while True:
+            step, update, done = await self.queue.get()
+            start = time.perf_counter()
+            try:
+                await self.client.feed(update)
+            finally:
+                # Время с момента отправки: очередь к воркерам + обработка
+                self.latency[step].append(time.perf_counter() - done[1])
+                self.latency[f"{step} (обработчик)"].append(time.perf_counter() - start)
+                done[0].set_result(None)
+
+    async def send(self, step: str, update: Any) -> None:
+        done = (asyncio.get_running_loop().create_future(), time.perf_counter())
+        await self.queue.put((step, update, done))
+        await done[0]
+
+    def _user(self, uid: int) -> User:
+        return User(id=uid, is_bot=False, first_name=f"user{uid}", client=self.client)
+
+    def command(self, uid: int, text: str) -> CustomMessage:
+        return CustomMessage(
+            client=self.client,
+            id=next(self._ids),
+            chat=Chat(id=uid, type=ChatType.PRIVATE, client=self.client),
+            from_user=self._user(uid),
+            date=datetime.now(),
+            text=text,
+        )
+
+    def callback(self, uid: int, data: str) -> CallbackQuery:
+        message = CustomMessage(
+            client=self.client,
+            id=next(self._ids),
+            chat=Chat(id=uid, type=ChatType.PRIVATE, client=self.client),
+            from_user=self.client.me,
+            date=datetime.now(),
+            text="menu",
+        )
+        return CallbackQuery(
+            client=self.client,
+            id=str(next(self._ids)),
+            from_user=self._user(uid),
+            chat_instance="load",
+            message=message,
+            data=data,
+        )
+
+    async def user(self, uid: int, pay_timeout: float) -> Optional[int]:
+        await asyncio.sleep(random.uniform(0, self.ramp))
+        start = time.perf_counter()
+        photo = asyncio.get_running_loop().create_future()
+        self.client.photo_waiters[uid] = photo
+        await self.send("/start", self.command(uid, "/start"))
+        await self.send("buy", self.callback(uid, pack("buy")))
+        await self.send("reg", self.callback(uid, pack("reg", self.event_date)))
+        if not await self.client.db.check_registration_by_tgid(
+            uid, self.event_date, False
+        ):
+            # Мест не осталось, платеж не создавался
+            self.outcomes["мест нет"] += 1
+            return None
+        try:
+            await asyncio.wait_for(photo, pay_timeout)
+        except asyncio.TimeoutError:
+            self.outcomes["без билета"] += 1
+            return None
+        finally:
+            self.client.photo_waiters.pop(uid, None)
+        self.latency["покупка целиком"].append(time.perf_counter() - start)
+        self.outcomes["билет получен"] += 1
+        return uid
+
+    async def check(self, uid: int) -> None:
+        hash_code = await self.client.db.get_user_hashcode(uid, self.event_date)
+        await self.send("/check", self.command(ADMIN_ID, f"/check {hash_code}"))
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run(users: int, seats: int, rtt_ms: float, pay_delay: float, ramp: float):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(str(Path(tmp) / "load"))
+        client = FakeTelegram(db, rtt_ms / 1000)
+        await client.db.setup(backups=False)
+        event_date = date.today() + timedelta(days=1)
+        await client.db.add_event(event_date, seats)
+
+        fake = FakeAcquirer(SECRET, pay_delay)
+        await fake.start()
+        fake.attach(client.tb)
+        receiver = None
+        if not os.getenv("LOAD_TEST_POLL"):
+            receiver = PaymentNotificationServer(client.tb, "127.0.0.1", 0)
+            port = await receiver.start()
+            client.tb.notification_url = f"http://127.0.0.1:{port}{receiver.path}"
+        await client.qr_renderer.start()
+        await client.payment_tracker.start()
+        # add_handler регистрирует обработчики отдельной задачей
+        await asyncio.sleep(0.1)
+
+        test = LoadTest(client, event_date, ramp)
+        workers = [asyncio.create_task(test.worker()) for _ in range(client.workers)]
+        start = time.perf_counter()
+        buyers = await asyncio.gather(
+            *(test.user(10_000 + i, pay_delay + 120) for i in range(users))
+        )
+        sale_time = time.perf_counter() - start
+        await asyncio.gather(*(test.check(uid) for uid in buyers if uid))
+        total_time = time.perf_counter() - start
+
+        with client.db.db.get_session() as session:
+            holders = (
+                session.query(Visitor)
+                .filter(Visitor.to_datetime == event_date, Visitor.holds_seat)
+                .count()
+            )
+            used = session.query(Visitor).filter(Visitor.is_used).count()
+            counter = (
+                session.query(Registration.visitors_count)
+                .filter(Registration.date == event_date)
+                .scalar()
+            )
+
+        for task in workers:
+            task.cancel()
+        await client.payment_tracker.stop()
+        if receiver:
+            await receiver.stop()
+        await client.tb.close()
+        await fake.stop()
+        client.qr_renderer.close()
+        client.db.close()
+
+    updates = sum(len(v) for k, v in test.latency.items() if "(" not in k and " " not in k)
+    print(
+        f"{users} пользователей, {seats} мест, WORKERS={client.workers}, "
+        f"rtt {rtt_ms:g} мс, оплата {pay_delay:g} с, "
+        f"{'опрос' if receiver is None else 'уведомления'}"
+    )
+    print(
+        f"продажа: {sale_time:.1f} с, всего {total_time:.1f} с, "
+        f"{updates / total_time:.0f} обновлений/с, "
+        f"{test.outcomes['билет получен'] / sale_time:.1f} билетов/с"
+    )
+    print(f"{'шаг':<28}{'шт':>7}{'p50, мс':>10}{'p99, мс':>10}")
+    for step, values in test.latency.items():
+        print(
+            f"{step:<28}{len(values):>7}{percentile(values, 0.5) * 1000:>10.1f}"
+            f"{percentile(values, 0.99) * 1000:>10.1f}"
+        )
+    locked = [e for e in client.errors if "locked" in str(e)]
+    print(f"исходы: {dict(test.outcomes)}; ответы: {dict(client.answers)}")
+    print(
+        f"ошибки обработчиков: {len(client.errors)}, из них блокировок базы "
+        f"{len(locked)}; запросов к эквайрингу {fake.requests}"
+    )
+    oversold = max(0, holders - seats)
+    print(
+        f"мест занято {holders} из {seats} (visitors_count {counter}), "
+        f"погашено /check {used}, овербукинг {oversold}"
+    )
+    if oversold or holders != counter:
+        raise SystemExit("Обнаружен овербукинг или рассинхронизация счетчика")
+
+
+if __name__ == "__main__":
+    for name in ("database", "payments", "pyrobot", "qr_renderer", "callbacks"):
+        logging.getLogger(name).setLevel(logging.ERROR)
+    logging.getLogger("tinkoff_acquiring.client").setLevel(logging.ERROR)
+    args = [float(x) for x in sys.argv[1:]]
+    users, seats, rtt_ms, pay_delay, ramp = args + [2000, 1500, 30, 1.0, 5.0][len(args) :]
+    asyncio.run(run(int(users), int(seats), rtt_ms, pay_delay, ramp))
@@ -0,0 +1,97 @@
+"""Стоимость логирования в потоке вызова: синхронные файлы против очереди
+
+Пишет records записей в формате Database (INFO с аргументами) тремя
+способами и замеряет время вызова logger.info в вызывающем потоке:
+- sync: RotatingFileHandler прямо в потоке вызова, как раньше;
+- queue: LazyQueueHandler и фоновый поток записи со сжатием архивов;
+- queue+sampling: то же с SamplingFilter(0.1) на логгере.
+Файлы маленькие, чтобы ротации происходили во время замера: максимум
+показывает, насколько вызов ждет ротацию.
+
+Запуск: python -m benchmarks.logging_overhead [records]
+"""
+
+import logging
+import queue
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from src.logger import (
+    LOG_FORMAT,
+    BlockingStopQueueListener,
+    CompressingRotatingFileHandler,
+    LazyQueueHandler,
+    SamplingFilter,
+)
+
+MAX_BYTES = 1024 * 1024
+
+
+def measure(logger: logging.Logger, records: int) -> list[float]:
+    today = date.today()
+    times = []
+    for i in range(records):
+        start = time.perf_counter()
+        logger.info(
+            "Проверка регистрации по tg_id=%s, to_datetime=%s, is_active=%s",
+            i,
+            today,
+            True,
+        )
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def run(mode: str, records: int, logs_dir: Path) -> None:
+    logger = logging.getLogger(f"bench.{mode}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    formatter = logging.Formatter(LOG_FORMAT)
+    listener = None
+    if mode == "sync":
+        handler: logging.Handler = RotatingFileHandler(
+            logs_dir / f"{mode}.log", maxBytes=MAX_BYTES, backupCount=3
+        )
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+    else:
+        handler = CompressingRotatingFileHandler(
+            logs_dir / f"{mode}.log", maxBytes=MAX_BYTES, backupCount=3
+        )
+        handler.setFormatter(formatter)
+        log_queue: queue.Queue[logging.LogRecord] = queue.Queue(10_000)
+        logger.addHandler(LazyQueueHandler(log_queue))
+        listener = BlockingStopQueueListener(log_queue, handler)
+        listener.start()
+        if mode == "queue+sampling":
+            logger.addFilter(SamplingFilter(0.1))
+
+    start = time.perf_counter()
+    times = measure(logger, records)
+    caller = time.perf_counter() - start
+    if listener is not None:
+        listener.stop()
+    total = time.perf_counter() - start
+    handler.close()
+    archives = sorted(p.name for p in logs_dir.glob(f"{mode}.log.*"))
+    print(
+        f"{mode:<16} среднее {statistics.mean(times) * 1e6:6.2f} мкс, "
+        f"p99 {sorted(times)[int(len(times) * 0.99)] * 1e6:6.2f} мкс, "
+        f"max {max(times) * 1e3:7.2f} мс; в потоке вызова {caller:.2f} с, "
+        f"до записи на диск {total:.2f} с; архивы: {', '.join(archives)}"
+    )
+
+
+def main(records: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("sync", "queue", "queue+sampling"):
+            run(mode, records, Path(tmp))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,51 @@
+"""Проверка стабильности ресурсов при многократной отрисовке меню покупки
+
+Рендерит клавиатуру «Купить билеты» заданное число раз и проверяет, что
+число потоков, движков и соединений в пуле не растёт.
+
+Запуск: python -m benchmarks.menu_renders [renders]
+"""
+
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from src.classes.buttons_menu import ButtonsMenu
+from src.classes.database import Database, get_engine
+
+
+def snapshot(db: Database) -> tuple[int, int, int]:
+    """Возвращает (потоки, движки, соединения в пуле)"""
+    return (
+        threading.active_count(),
+        get_engine.cache_info().currsize,
+        db.engine.pool.checkedin() + db.engine.pool.checkedout(),
+    )
+
+
+def main(renders: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(str(Path(tmp) / "bench"))
+        db.setup(backups=False)
+        for days in range(1, 6):
+            db.add_event(date.today() + timedelta(days=days), 100)
+
+        ButtonsMenu.get_buy_markup(db, 1)
+        before = snapshot(db)
+        start = time.perf_counter()
+        for i in range(renders):
+            ButtonsMenu.get_buy_markup(db, i)
+        elapsed = time.perf_counter() - start
+        after = snapshot(db)
+
+        print(f"{renders} отрисовок за {elapsed:.2f} с")
+        print(f"потоки/движки/соединения до: {before}, после: {after}")
+        if after != before:
+            raise SystemExit("Число ресурсов выросло")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
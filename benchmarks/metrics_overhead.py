@@ -0,0 +1,87 @@
+"""Стоимость записи метрик и проверка их выдачи
+
+Замеряет время inc/observe/timer на вызов и обработчика CustomClient с
+метриками против голого вызова, затем поднимает MetricsServer и читает
+/metrics в формате Prometheus.
+
+Запуск: python -m benchmarks.metrics_overhead [iterations]
+"""
+
+import asyncio
+import sys
+import time
+
+import httpx
+
+from src.metrics import Metrics, MetricsServer, update_queries
+
+
+def per_call_ns(func, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e9
+
+
+async def handler_overhead(registry: Metrics, iterations: int) -> tuple[float, float]:
+    """Голый обработчик против обертки с метриками, как в CustomClient"""
+
+    async def handler():
+        return None
+
+    async def wrapped():
+        queries = [0]
+        token = update_queries.set(queries)
+        start = time.perf_counter()
+        try:
+            return await handler()
+        finally:
+            registry.observe(
+                "handler_seconds", time.perf_counter() - start, handler="handle_start"
+            )
+            registry.observe("db_queries_per_update", queries[0], handler="handle_start")
+            update_queries.reset(token)
+
+    results = []
+    for func in (handler, wrapped):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await func()
+        results.append((time.perf_counter() - start) / iterations * 1e9)
+    return results[0], results[1]
+
+
+async def main(iterations: int):
+    registry = Metrics()
+    inc = per_call_ns(lambda: registry.inc("calls_total", method="SendMessage"), iterations)
+    observe = per_call_ns(
+        lambda: registry.observe("call_seconds", 0.003, method="SendMessage"), iterations
+    )
+
+    def timed():
+        with registry.timer("block_seconds", kind="single"):
+            pass
+
+    timer = per_call_ns(timed, iterations)
+    bare, wrapped = await handler_overhead(registry, iterations)
+    print(f"inc:      {inc:6.0f} нс")
+    print(f"observe:  {observe:6.0f} нс")
+    print(f"timer:    {timer:6.0f} нс")
+    print(f"обработчик: {bare:6.0f} нс без метрик, {wrapped:6.0f} нс с метриками")
+
+    registry.gauge("queue_depth", lambda: 3)
+    server = MetricsServer(registry, "127.0.0.1", 0)
+    port = await server.start()
+    async with httpx.AsyncClient() as http:
+        response = await http.get(f"http://127.0.0.1:{port}/metrics")
+    await server.stop()
+    body = response.text
+    assert response.status_code == 200
+    assert 'call_seconds_bucket{method="SendMessage",le="+Inf"}' in body
+    assert "queue_depth 3" in body
+    print(f"/metrics: {len(body.splitlines())} строк, {response.headers['content-type']}")
+    print(registry.summary())
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000))
@@ -0,0 +1,128 @@
+"""Бенчмарк рассылки на фейковом клиенте Telegram
+
+FakeClient отвечает с задержкой сети, выдает FloodWait при превышении
+лимита сообщений в секунду и считает часть пользователей заблокировавшими
+бота. Сравнивается прежняя последовательная отправка и Newsletter, затем
+рассылка прерывается и продолжается с сохраненного курсора.
+
+Запуск: python -m benchmarks.newsletter [users] [latency_ms] [limit]
+"""
+
+import asyncio
+import logging
+import sys
+import tempfile
+import time
+from collections import Counter, deque
+from pathlib import Path
+
+from pyrogram.errors import FloodWait, UserIsBlocked
+
+from src.classes.database import AsyncDatabase, Database, User
+from src.classes.newsletter import Newsletter
+
+
+class FakeClient:
+    """Фейковый клиент с лимитом limit сообщений за скользящую секунду"""
+
+    def __init__(self, latency: float, limit: int):
+        self.latency = latency
+        self.limit = limit
+        self.received: Counter[str] = Counter()
+        self.flood_waits = 0
+        self.edits = 0
+        self._window: deque[float] = deque()
+
+    async def send_message(self, chat_id: str, text: str):
+        await asyncio.sleep(self.latency)
+        now = time.monotonic()
+        while self._window and now - self._window[0] > 1:
+            self._window.popleft()
+        if len(self._window) >= self.limit:
+            self.flood_waits += 1
+            raise FloodWait(value=1)
+        self._window.append(now)
+        if int(chat_id) % 50 == 0:
+            raise UserIsBlocked()
+        self.received[chat_id] += 1
+
+    async def edit_message_text(self, chat_id: int, message_id: int, text: str):
+        self.edits += 1
+
+
+async def sequential(client: FakeClient, db: AsyncDatabase, text: str) -> int:
+    """Прежняя рассылка: по одному сообщению без учета FloodWait"""
+    failed = 0
+    for user in await db.get_all_users():
+        try:
+            await client.send_message(str(user.tg_id), text)
+        except Exception:
+            failed += 1
+    return failed
+
+
+async def main(users: int, latency_ms: float, limit: int):
+    logging.getLogger("database").setLevel(logging.WARNING)
+    logging.getLogger("newsletter").setLevel(logging.ERROR)
+    latency = latency_ms / 1000
+    with tempfile.TemporaryDirectory() as tmp:
+        db = AsyncDatabase(Database(str(Path(tmp) / "newsletter")))
+        await db.setup(backups=False)
+        with db.db.get_session() as session:
+            session.add_all(
+                User(tg_id=str(1000 + i), first_name=f"user{i}") for i in range(users)
+            )
+            session.commit()
+        blocked = sum(1 for i in range(users) if (1000 + i) % 50 == 0)
+
+        client = FakeClient(latency, limit)
+        start = time.perf_counter()
+        failed = await sequential(client, db, "test")
+        print(
+            f"последовательно: {time.perf_counter() - start:6.2f} с, "
+            f"доставлено {sum(client.received.values())}, ошибок {failed} "
+            f"(из них FloodWait {client.flood_waits})"
+        )
+
+        client = FakeClient(latency, limit)
+        newsletter = Newsletter(client, db, rate=limit * 0.8, progress_interval=0.5)
+        start = time.perf_counter()
+        broadcast = await newsletter.start(1, "test", 1, 1)
+        await newsletter.wait()
+        print(
+            f"Newsletter:      {time.perf_counter() - start:6.2f} с, "
+            f"доставлено {sum(client.received.values())}, "
+            f"FloodWait {client.flood_waits}, правок прогресса {client.edits}"
+        )
+        assert len(client.received) == users - blocked
+        assert max(client.received.values()) == 1
+
+        # Прерываем рассылку посередине и продолжаем новым экземпляром
+        client = FakeClient(latency, limit)
+        newsletter = Newsletter(client, db, rate=limit * 0.8, progress_interval=0.5)
+        broadcast = await newsletter.start(1, "test", 1, 1)
+        await asyncio.sleep(users / limit / 2)
+        await newsletter.stop()
+        before = sum(client.received.values())
+        newsletter = Newsletter(client, db, rate=limit * 0.8, progress_interval=0.5)
+        await newsletter.resume()
+        await newsletter.wait()
+        duplicates = sum(n - 1 for n in client.received.values())
+        print(
+            f"прерывание после {before} сообщений: после продолжения доставлено "
+            f"{len(client.received)} из {users - blocked}, повторов {duplicates}"
+        )
+        assert len(client.received) == users - blocked
+        assert not await db.get_unfinished_broadcasts(), broadcast.id
+        db.close()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    asyncio.run(
+        main(
+            int(args[0]) if len(args) > 0 else 1000,
+            float(args[1]) if len(args) > 1 else 40,
+            int(args[2]) if len(args) > 2 else 100,
+        )
+    )
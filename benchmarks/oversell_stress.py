@@ -0,0 +1,78 @@
+"""Стресс-проверка отсутствия овербукинга
+
+Несколько потоков одновременно регистрируют больше покупателей, чем мест
+на событии, часть из них отменяет регистрацию. В конце число посетителей,
+занимающих места, должно совпадать с visitors_count и не превышать
+max_visitors.
+
+Запуск: python -m benchmarks.oversell_stress [buyers] [seats] [threads]
+"""
+
+import logging
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy.exc import OperationalError
+
+from src.classes.database import Database, Registration, Visitor
+
+
+def buy(db: Database, tg_id: int, event_date: date) -> str:
+    """Покупка билета; каждый третий покупатель сразу отменяет её"""
+    when = datetime.combine(event_date, datetime.min.time())
+    for _ in range(20):
+        try:
+            db.reg_new_visitor(tg_id, when, tg_id % 2 == 0)
+            if tg_id % 3 == 0:
+                db.delete_visitor(tg_id, event_date)
+                return "cancelled"
+            return "sold"
+        except ValueError:
+            return "full"
+        except OperationalError:
+            time.sleep(0.01)
+    return "locked"
+
+
+def main(buyers: int, seats: int, threads: int):
+    logging.getLogger("database").setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(str(Path(tmp) / "stress"))
+        db.setup(backups=False)
+        event_date = date.today() + timedelta(days=1)
+        db.add_event(event_date, seats)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            outcomes = list(
+                pool.map(lambda i: buy(db, i, event_date), range(buyers))
+            )
+        elapsed = time.perf_counter() - start
+
+        with db.get_session() as session:
+            holders = (
+                session.query(Visitor)
+                .filter(Visitor.to_datetime == event_date, Visitor.holds_seat)
+                .count()
+            )
+            counter = (
+                session.query(Registration.visitors_count)
+                .filter(Registration.date == event_date)
+                .scalar()
+            )
+
+        summary = {k: outcomes.count(k) for k in sorted(set(outcomes))}
+        print(f"{buyers} покупателей, {seats} мест, {threads} потоков: {elapsed:.2f} с")
+        print(f"исходы: {summary}; занято мест {holders}, visitors_count {counter}")
+        if holders != counter or holders > seats:
+            raise SystemExit("Обнаружен овербукинг или рассинхронизация счётчика")
+        print("овербукинга нет")
+
+
+if __name__ == "__main__":
+    args = [int(x) for x in sys.argv[1:]]
+    main(*(args + [2000, 500, 32][len(args) :]))
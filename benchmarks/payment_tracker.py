@@ -0,0 +1,99 @@
+"""Проверка фонового трекера платежей на фейковом эквайринге
+
+Замеряет, сколько обработчик колбэка тратит на постановку платежа в
+трекер, сколько запросов GetState уходит на подтверждение пачки платежей
+только опросом, и что ожидающие платежи переживают перезапуск трекера.
+
+Запуск: python -m benchmarks.payment_tracker [payments] [pay_delay]
+"""
+
+import asyncio
+import logging
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+from benchmarks.fake_acquirer import SECRET, TERMINAL_KEY, FakeAcquirer
+from src.classes.customtinkoffacquiringapclient import CustomTinkoffAcquiringAPIClient
+from src.classes.database import AsyncDatabase, Database, PendingPayment
+from src.classes.payment_tracker import PaymentTracker
+
+
+async def run(db: AsyncDatabase, fake: FakeAcquirer, payments: int, pay_delay: float):
+    tb = CustomTinkoffAcquiringAPIClient(TERMINAL_KEY, SECRET)
+    fake.attach(tb)
+    confirmed: dict[str, float] = {}
+
+    async def fulfill(payment: PendingPayment):
+        confirmed[str(payment.payment_id)] = time.perf_counter()
+
+    tracker = PaymentTracker(db, tb, fulfill, 5, 0.2, 1.0, 60)
+    await tracker.start()
+
+    # Платежи оплачиваются через pay_delay, подтверждение только опросом
+    fake.pay_delay = pay_delay
+    handler_times = []
+    for i in range(payments):
+        payment = await tb.init_payment(250, f"order{i}", "Бенчмарк")
+        start = time.perf_counter()
+        await tracker.track(payment["PaymentId"], f"hash{i}", i, i, 10, date.today())
+        handler_times.append(time.perf_counter() - start)
+    while len(confirmed) < payments:
+        await asyncio.sleep(0.05)
+    lags = [confirmed[pid] - fake.payments[pid]["paid_at"] for pid in confirmed]
+    print(
+        f"track(): p50 {statistics.median(handler_times) * 1000:.2f} мс, "
+        f"max {max(handler_times) * 1000:.2f} мс"
+    )
+    print(
+        f"{payments} платежей подтверждены опросом: запросов GetState "
+        f"{tracker.checks}, задержка p50 {statistics.median(lags) * 1000:.0f} мс"
+    )
+
+    # Перезапуск: неоплаченные платежи должны подхватиться из базы
+    fake.pay_delay = None
+    before = len(confirmed)
+    ids = []
+    for i in range(payments, payments * 2):
+        payment = await tb.init_payment(250, f"order{i}", "Бенчмарк")
+        await tracker.track(payment["PaymentId"], f"hash{i}", i, i, 10, date.today())
+        ids.append(payment["PaymentId"])
+    await tracker.stop()
+    restored = PaymentTracker(db, tb, fulfill, 5, 0.2, 1.0, 60)
+    await restored.start()
+    await asyncio.gather(*(fake.pay(pid) for pid in ids))
+    while len(confirmed) < before + len(ids):
+        await asyncio.sleep(0.05)
+    await restored.stop()
+    await tb.close()
+    left = len(await db.get_pending_payments())
+    print(f"после перезапуска подтверждено {len(confirmed) - before}, в базе осталось {left}")
+    if left:
+        raise SystemExit("Ожидающие платежи не удалены из базы")
+
+
+async def main(payments: int, pay_delay: float):
+    logging.getLogger("tinkoff_acquiring.client").setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = AsyncDatabase(Database(str(Path(tmp) / "payments")))
+        await db.setup(backups=False)
+        fake = FakeAcquirer()
+        await fake.start()
+        try:
+            await run(db, fake, payments, pay_delay)
+        finally:
+            await fake.stop()
+            db.close()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    asyncio.run(
+        main(
+            int(args[0]) if len(args) > 0 else 50,
+            float(args[1]) if len(args) > 1 else 2.0,
+        )
+    )
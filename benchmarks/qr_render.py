@@ -0,0 +1,80 @@
+"""Бенчмарк генерации QR-кодов: разовый пул процессов против QRRenderer
+
+Старый путь создавал ProcessPoolExecutor на каждый QR-код. Замеряется
+задержка одиночного QR-кода и пропускная способность при конкурентной
+генерации.
+
+Запуск: python -m benchmarks.qr_render [count] [workers] [style]
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.classes.qr_renderer import QRRenderer
+from src.utils import Utils
+
+SAMPLES = 10
+
+
+async def legacy_gen_qr_code(data: str, style: str | None, workers: int):
+    """Прежняя реализация Utils.gen_qr_code"""
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return await loop.run_in_executor(executor, Utils.create_qr, data, style)
+
+
+async def latency(render) -> float:
+    """Медианная задержка одного QR-кода в миллисекундах"""
+    timings = []
+    for i in range(SAMPLES):
+        start = time.perf_counter()
+        await render(Utils.QR_URL("bench_bot", f"latency{i}"))
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+async def throughput(render, count: int) -> float:
+    """QR-кодов в секунду при конкурентной генерации count штук"""
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(render(Utils.QR_URL("bench_bot", f"throughput{i}")) for i in range(count))
+    )
+    return count / (time.perf_counter() - start)
+
+
+async def main(count: int, workers: int, style: str | None):
+    async def legacy(data: str):
+        return await legacy_gen_qr_code(data, style, workers)
+
+    print(
+        f"legacy:   p50 {await latency(legacy):8.1f} мс, "
+        f"{await throughput(legacy, count):6.1f} QR/с"
+    )
+
+    renderer = QRRenderer(workers)
+    start = time.perf_counter()
+    await renderer.start()
+    print(f"запуск пула: {(time.perf_counter() - start) * 1000:.0f} мс")
+
+    async def pooled(data: str):
+        return await renderer.render(data, style)
+
+    print(
+        f"renderer: p50 {await latency(pooled):8.1f} мс, "
+        f"{await throughput(pooled, count):6.1f} QR/с"
+    )
+    renderer.close()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    asyncio.run(
+        main(
+            int(args[0]) if len(args) > 0 else 100,
+            int(args[1]) if len(args) > 1 else 4,
+            args[2] if len(args) > 2 else "rounded",
+        )
+    )
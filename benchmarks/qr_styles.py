@@ -0,0 +1,66 @@
+"""Бенчмарк Utils.create_qr по стилям
+
+Для каждого стиля печатает медианное время генерации, а для стиля по
+умолчанию дополнительно прежний вариант с ImageColorMask, который
+декодировал и масштабировал image.png и красил пиксели в цикле.
+
+Запуск: python -m benchmarks.qr_styles [samples]
+"""
+
+import functools
+import statistics
+import sys
+import time
+
+import qrcode
+from qrcode.image.styledpil import StyledPilImage
+from qrcode.image.styles.colormasks import ImageColorMask
+from qrcode.image.styles.moduledrawers.pil import RoundedModuleDrawer
+
+from src.utils import QR_STYLES, Utils
+
+DATA = Utils.QR_URL("bench_bot", "0" * 64)
+
+
+def legacy_default(data: str):
+    """Прежняя ветка стиля по умолчанию из Utils.create_qr"""
+    version, error_correction, box_size, border = Utils.get_qr_settings()
+    qr = qrcode.QRCode(
+        version=version,
+        error_correction=error_correction,
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.make_image(
+        image_factory=StyledPilImage,
+        module_drawer=RoundedModuleDrawer(),
+        color_mask=ImageColorMask((128, 128, 128), color_mask_path="image.png"),
+    ).get_image()
+
+
+def measure(func, samples: int) -> float:
+    """Медианное время вызова в миллисекундах"""
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main(samples: int):
+    for style in (*QR_STYLES, None):
+        print(
+            f"{style or 'default':<16} "
+            f"{measure(functools.partial(Utils.create_qr, DATA, style), samples):9.1f} мс"
+        )
+    print(
+        f"{'legacy default':<16} "
+        f"{measure(lambda: legacy_default(DATA), max(1, samples // 10)):9.1f} мс"
+    )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
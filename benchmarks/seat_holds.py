@@ -0,0 +1,184 @@
+"""Удержание мест при распродаже
+
+Покупатели приходят на событие с seats местами в течение DURATION секунд,
+каждый занимает место неоплаченной записью, половина бросает оплату,
+остальные платят через 0.2-0.5 с (enable_visitor). Сравнивает:
+- legacy: брошенная запись держит место бессрочно, как было;
+- holds: SeatHolds со сроком ttl, истекшие места возвращаются в продажу.
+Печатает проданные билеты, отказы «мест нет» и места, занятые брошенными
+записями к концу распродажи.
+
+После каждого этапа visitors_count каждого события сверяется с числом
+записей, держащих место, и проверяется, что каждый оплаченный билет
+держит место; при расхождении скрипт завершается с ошибкой.
+
+Затем holds удержаний со сроками в пределах двух секунд снимаются
+планировщиком, база опрашивается каждые 10 мс: задержка - на сколько
+позже срока место еще было занято. В конце - стоимость SeatHolds.add.
+
+Запуск: python -m benchmarks.seat_holds [buyers] [seats] [ttl] [holds]
+"""
+
+import asyncio
+import logging
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import func
+
+from src.classes.database import AsyncDatabase, Database, Registration, Visitor
+from src.classes.seat_holds import SeatHolds
+
+DURATION = 3.0
+
+
+def check_counters(db: Database) -> None:
+    """Завершает скрипт, если места посчитаны неверно
+
+    visitors_count должен совпадать с записями holds_seat, а каждая
+    оплаченная запись - держать место.
+    """
+    with db.get_session() as session:
+        holders = dict(
+            session.query(Visitor.to_datetime, func.count(Visitor.id))
+            .filter(Visitor.holds_seat)
+            .group_by(Visitor.to_datetime)
+            .all()
+        )
+        counters = dict(
+            session.query(Registration.date, Registration.visitors_count).all()
+        )
+        seatless = (
+            session.query(Visitor)
+            .filter(Visitor.is_active.is_(True), Visitor.holds_seat.is_(False))
+            .count()
+        )
+    drift = {
+        str(event_date): (count, holders.get(event_date, 0))
+        for event_date, count in counters.items()
+        if count != holders.get(event_date, 0)
+    }
+    if drift:
+        raise SystemExit(f"visitors_count разошелся с занятыми местами: {drift}")
+    if seatless:
+        raise SystemExit(f"Оплаченных билетов без места: {seatless}")
+
+
+async def sale(
+    db: AsyncDatabase, holds: Optional[SeatHolds], buyers: int, seats: int, tg_base: int
+) -> None:
+    event_day = date.today() + timedelta(days=tg_base // 1_000_000)
+    await db.add_event(event_day, seats)
+    when = datetime.combine(event_day, datetime.min.time())
+    outcomes: dict[str, int] = {"sold": 0, "abandoned": 0, "full": 0}
+    rng = random.Random(tg_base)
+
+    async def buyer(i: int):
+        await asyncio.sleep(DURATION * i / buyers)
+        hold_until = holds.deadline() if holds else None
+        try:
+            hash_code = await db.reg_new_visitor(tg_base + i, when, False, hold_until)
+        except ValueError:
+            outcomes["full"] += 1
+            return
+        if holds and hold_until:
+            holds.add(hash_code, hold_until)
+        if i % 2:
+            outcomes["abandoned"] += 1
+            return
+        await asyncio.sleep(rng.uniform(0.2, 0.5))
+        try:
+            await db.enable_visitor(hash_code=hash_code)
+        except ValueError:
+            outcomes["full"] += 1
+            return
+        if holds:
+            holds.discard(hash_code)
+        outcomes["sold"] += 1
+
+    await asyncio.gather(*(buyer(i) for i in range(buyers)))
+    held = seats - outcomes["sold"] - await db.get_available(event_day)
+    label = "holds" if holds else "legacy"
+    print(
+        f"{label:<7} продано {outcomes['sold']:>4} из {seats}, "
+        f"«мест нет» {outcomes['full']:>4}, брошено {outcomes['abandoned']:>4}, "
+        f"мест под брошенными записями в конце {held:>4}"
+    )
+
+
+async def release_lag(db: AsyncDatabase, count: int) -> None:
+    event_day = date.today() + timedelta(days=30)
+    await db.add_event(event_day, count)
+    when = datetime.combine(event_day, datetime.min.time())
+    holds = SeatHolds(db, ttl=60, sweep_interval=60)
+    await holds.start()
+    start = datetime.now() + timedelta(seconds=2)
+    for i in range(count):
+        expires_at = start + timedelta(seconds=2 * i / count)
+        hash_code = await db.reg_new_visitor(-1 - i, when, False, expires_at)
+        holds.add(hash_code, expires_at)
+
+    worst = 0.0
+    while True:
+        now = datetime.now()
+        remaining = await db.get_seat_holds()
+        overdue = [
+            (now - expires_at).total_seconds()
+            for _, expires_at in remaining
+            if expires_at is not None and expires_at < now
+        ]
+        worst = max([worst, *overdue])
+        if not remaining:
+            break
+        await asyncio.sleep(0.01)
+    await holds.stop()
+    available = await db.get_available(event_day)
+    print(
+        f"{count} удержаний: max задержка освобождения {worst * 1000:.0f} мс, "
+        f"свободно после {available} из {count}"
+    )
+
+
+def add_cost(count: int) -> None:
+    holds = SeatHolds.__new__(SeatHolds)
+    holds._due, holds._heap, holds._wakeup = {}, [], asyncio.Event()
+    base = datetime.now()
+    deadlines = [base + timedelta(seconds=random.random() * 300) for _ in range(count)]
+    start = time.perf_counter()
+    for i, expires_at in enumerate(deadlines):
+        holds.add(str(i), expires_at)
+    elapsed = time.perf_counter() - start
+    print(f"SeatHolds.add: {elapsed / count * 1e6:.2f} мкс на удержание ({count} шт.)")
+
+
+async def main(buyers: int, seats: int, ttl: float, count: int):
+    logging.getLogger("database").setLevel(logging.WARNING)
+    logging.getLogger("seat_holds").setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        sync_db = Database(str(Path(tmp) / "holds"))
+        sync_db.setup(backups=False)
+        db = AsyncDatabase(sync_db)
+        print(f"{buyers} покупателей за {DURATION:.0f} с, {seats} мест, срок {ttl} с")
+        await sale(db, None, buyers, seats, 1_000_000)
+        check_counters(sync_db)
+        holds = SeatHolds(db, ttl=ttl, sweep_interval=60)
+        await holds.start()
+        await sale(db, holds, buyers, seats, 2_000_000)
+        await holds.stop()
+        check_counters(sync_db)
+        await release_lag(db, count)
+        check_counters(sync_db)
+        db.close()
+        sync_db.engine.dispose()
+    add_cost(100_000)
+
+
+if __name__ == "__main__":
+    args = [float(x) for x in sys.argv[1:]]
+    buyers, seats, ttl, count = args + [2000, 300, 1.0, 1000][len(args) :]
+    asyncio.run(main(int(buyers), int(seats), ttl, int(count)))
@@ -0,0 +1,137 @@
+"""Пропускная способность продаж на SQLite и PostgreSQL
+
+processes процессов по threads потоков покупают места на events
+событий по seats мест (buy из oversell_stress: часть покупок сразу
+отменяется). При --events 1 все конкурируют за одну строку
+registrations, при нескольких событиях PostgreSQL блокирует разные
+строки, а SQLite по-прежнему пишет по одному. Для каждого хранилища
+печатает покупки в секунду и проверяет, что ни на одном событии мест
+не занято больше seats и счетчик visitors_count совпадает с
+посетителями - при нарушении скрипт завершается с ошибкой, поэтому
+его можно запускать как проверку в CI.
+
+PostgreSQL берется из --postgres или BENCH_POSTGRES_URL
+(postgresql+psycopg://...). Все таблицы в этой базе удаляются, указывать
+нужно отдельную пустую базу.
+
+Запуск: python -m benchmarks.storage_throughput [--postgres URL]
+        [--buyers 4000] [--events 8] [--seats 250] [--processes 4] [--threads 8]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import func, text
+
+from benchmarks.oversell_stress import buy
+from src.classes.database import Base, Database, Registration, Visitor
+
+
+def buy_many(
+    url: str, tg_ids: list[int], dates: list[date], threads: int
+) -> list[str]:
+    """Покупки одного процесса, threads потоков на общем движке"""
+    logging.getLogger("database").setLevel(logging.WARNING)
+    db = Database(url=url)
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        outcomes = list(
+            pool.map(lambda i: buy(db, i, dates[i % len(dates)]), tg_ids)
+        )
+    db.engine.dispose()
+    return outcomes
+
+
+def reset(url: str) -> Database:
+    """Создает схему с нуля"""
+    db = Database(url=url)
+    Base.metadata.drop_all(db.engine)
+    with db.engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS alembic_version"))
+    db.setup(backups=False)
+    return db
+
+
+def run(label: str, url: str, args: argparse.Namespace) -> bool:
+    db = reset(url)
+    dates = [date.today() + timedelta(days=i + 1) for i in range(args.events)]
+    for event_date in dates:
+        db.add_event(event_date, args.seats)
+    chunks = [list(range(i, args.buyers, args.processes)) for i in range(args.processes)]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.processes) as pool:
+        results = pool.map(
+            buy_many,
+            [url] * args.processes,
+            chunks,
+            [dates] * args.processes,
+            [args.threads] * args.processes,
+        )
+        outcomes = [outcome for chunk in results for outcome in chunk]
+    elapsed = time.perf_counter() - start
+
+    with db.get_session() as session:
+        holders = dict(
+            session.query(Visitor.to_datetime, func.count(Visitor.id))
+            .filter(Visitor.holds_seat)
+            .group_by(Visitor.to_datetime)
+            .all()
+        )
+        counters = dict(
+            session.query(Registration.date, Registration.visitors_count).all()
+        )
+    db.engine.dispose()
+
+    summary = {k: outcomes.count(k) for k in sorted(set(outcomes))}
+    print(
+        f"{label:<10} {args.buyers / elapsed:7.0f} покупок/с ({elapsed:.2f} с); "
+        f"исходы: {summary}; занято {sum(holders.values())}, "
+        f"visitors_count {sum(counters.values())}"
+    )
+    return all(
+        holders.get(event_date, 0) == counters[event_date] <= args.seats
+        for event_date in dates
+    )
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--postgres", default=os.getenv("BENCH_POSTGRES_URL"))
+    parser.add_argument("--buyers", type=int, default=4000)
+    parser.add_argument("--events", type=int, default=8)
+    parser.add_argument("--seats", type=int, default=250, help="мест на событие")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    print(
+        f"{args.buyers} покупателей, {args.events} событий по {args.seats} мест, "
+        f"{args.processes} процессов по {args.threads} потоков"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        backends: list[tuple[str, Optional[str]]] = [
+            ("sqlite", f"sqlite:///{Path(tmp) / 'throughput.db'}"),
+            ("postgresql", args.postgres),
+        ]
+        ok = True
+        for label, url in backends:
+            if url is None:
+                print(f"{label:<10} пропущено: не задан --postgres")
+                continue
+            ok = run(label, url, args) and ok
+    if not ok:
+        print("Обнаружен овербукинг или рассинхронизация счётчика")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,314 @@
+"""Набор микробенчмарков горячих функций Database и Utils
+
+Замеряет Utils.create_qr для каждого стиля, Utils.generate_hash,
+TicketToken.verify, ButtonsMenu.get_buy_markup и методы Database (reg_new_visitor,
+get_available, use_hash, get_all_visitors) на синтетической базе из
+rows посетителей. Каждая функция вызывается number раз в repeat
+раундах, в результат идут медиана и минимум времени одного вызова.
+
+Результаты пишутся в JSON и сравниваются с сохраненным базовым
+замером по минимуму раундов (он меньше всего зависит от фоновой
+нагрузки). По умолчанию сравнение только печатается: на общей машине
+отдельные замеры с базы SQLite гуляют на десятки процентов между
+запусками одного и того же кода.
+
+С флагом --check скрипт завершается с кодом 1, если время выросло
+больше чем на threshold, поэтому его можно ставить перед деплоем.
+Подозрительные замеры перед этим повторяются, и регрессией считается
+только рост, который держится по минимуму обоих прогонов. Базовый
+замер в репозитории сделан на машине из его meta и годится только для
+нее: на машине, где запускается --check, базу нужно сначала записать
+флагом --update-baseline на чистом дереве (коммит замера попадает в
+meta, незакоммиченные изменения помечаются -dirty).
+
+Запуск: python -m benchmarks.suite [--rows N] [--repeat R] [--output путь]
+        [--baseline путь] [--check] [--threshold 0.5] [--update-baseline]
+        [--only имя]
+"""
+
+import argparse
+import gc
+import itertools
+import json
+import logging
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from benchmarks.visitor_lookups import DAYS, populate
+from src.classes.buttons_menu import ButtonsMenu
+from src.classes.database import Database
+from src.classes.ticket_token import TicketToken
+from src.utils import QR_STYLES, Utils
+
+BASELINE = Path(__file__).with_name("baseline.json")
+OUTPUT = Path("bench_results.json")
+
+
+class Case:
+    """Замеряемая функция и генератор аргументов для каждого вызова"""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[..., Any],
+        args: Iterator[tuple[Any, ...]],
+        number: int,
+    ):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.number = number
+
+    def measure(self, repeat: int) -> dict[str, Any]:
+        """Время одного вызова по раундам, мкс"""
+        func = self.func
+        # Прогрев: кеши движка, шаблоны QR, первый импорт
+        func(*next(self.args))
+        rounds = []
+        for _ in range(repeat):
+            calls = list(itertools.islice(self.args, self.number))
+            gc.collect()
+            start = time.perf_counter()
+            for args in calls:
+                func(*args)
+            rounds.append((time.perf_counter() - start) / len(calls) * 1e6)
+        return {
+            "median_us": round(statistics.median(rounds), 1),
+            "min_us": round(min(rounds), 1),
+            "number": self.number,
+            "repeat": repeat,
+        }
+
+
+def cases(db: Database, rows: int, dates: list[date]) -> list[Case]:
+    """Набор замеров для базы из rows посетителей"""
+    rnd = random.Random(rows)
+    now = datetime.now()
+    # Активные и еще не погашенные посетители из populate (i % 4 != 0)
+    active = (f"h{i}" for i in itertools.count(1) if i % 4 != 0)
+    new_ids = itertools.count(rows)
+    result = [
+        Case(
+            f"create_qr[{style or 'default'}]",
+            Utils.create_qr,
+            ((Utils.generate_hash(i, now), style) for i in itertools.count()),
+            10,
+        )
+        for style in (*QR_STYLES, None)
+    ]
+    result += [
+        Case(
+            "generate_hash",
+            Utils.generate_hash,
+            ((i, now) for i in itertools.count()),
+            10_000,
+        ),
+        Case(
+            "verify_ticket",
+            TicketToken.verify,
+            (
+                (TicketToken(i, dates[0]).sign(b"bench"), (b"bench",))
+                for i in itertools.count()
+            ),
+            10_000,
+        ),
+        Case(
+            "get_buy_markup",
+            ButtonsMenu.get_buy_markup,
+            ((db, rnd.randrange(rows)) for _ in itertools.count()),
+            200,
+        ),
+        Case(
+            "reg_new_visitor",
+            db.reg_new_visitor,
+            (
+                (next(new_ids), datetime.combine(dates[0], datetime.min.time()))
+                for _ in itertools.count()
+            ),
+            200,
+        ),
+        Case(
+            "get_available",
+            db.get_available,
+            ((dates[rnd.randrange(DAYS)],) for _ in itertools.count()),
+            500,
+        ),
+        Case("use_hash", db.use_hash, ((code,) for code in active), 200),
+        Case(
+            "get_all_visitors[tg_id]",
+            db.get_all_visitors,
+            ((rnd.randrange(rows),) for _ in itertools.count()),
+            500,
+        ),
+        Case(
+            "get_all_visitors[hash_code]",
+            db.get_all_visitors,
+            ((f"h{rnd.randrange(rows)}",) for _ in itertools.count()),
+            500,
+        ),
+    ]
+    return result
+
+
+def environment(rows: int) -> dict[str, Any]:
+    """Описание прогона, чтобы сравнивать сопоставимые замеры"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=BASELINE.parent,
+        ).stdout.strip()
+        # Замер на незакоммиченном коде не относится к HEAD
+        changed = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no", "--", ":/",
+             f":(exclude){BASELINE}"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=BASELINE.parent,
+        ).stdout.strip()
+        if changed:
+            commit += "-dirty"
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "rows": rows,
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} {platform.processor()}",
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def compare(
+    results: dict[str, dict[str, Any]],
+    baseline: dict[str, Any],
+    threshold: float,
+) -> list[str]:
+    """Печатает сравнение с базовым замером и возвращает регрессии"""
+    base_results = baseline.get("results", {})
+    regressions = []
+    print(f"\n{'замер':<30}{'база, мкс':>12}{'сейчас, мкс':>14}{'изм.':>9}")
+    for name, current in results.items():
+        base = base_results.get(name)
+        if base is None:
+            print(f"{name:<30}{'-':>12}{current['min_us']:>14.1f}{'new':>9}")
+            continue
+        ratio = current["min_us"] / base["min_us"]
+        mark = ""
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            mark = "  <- регрессия"
+        print(
+            f"{name:<30}{base['min_us']:>12.1f}{current['min_us']:>14.1f}"
+            f"{(ratio - 1) * 100:>+8.0f}%{mark}"
+        )
+    return regressions
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--rows", type=int, default=100_000, help="посетителей в синтетической базе"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="число раундов")
+    parser.add_argument("--output", type=Path, default=OUTPUT, help="файл результатов")
+    parser.add_argument(
+        "--baseline", type=Path, default=BASELINE, help="файл базового замера"
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="завершаться с кодом 1 при регрессии",
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=0.5, help="допустимый рост, доля"
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="сохранить результаты как базовый замер",
+    )
+    parser.add_argument(
+        "--only",
+        action="append",
+        default=[],
+        help="только замеры, имя которых содержит подстроку (можно повторять)",
+    )
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if not args.update_baseline and args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+        if baseline["meta"].get("rows") != args.rows:
+            print(
+                f"Внимание: базовый замер сделан на {baseline['meta'].get('rows')} "
+                f"строках, сейчас {args.rows}"
+            )
+
+    logging.getLogger("database").setLevel(logging.WARNING)
+    results: dict[str, dict[str, Any]] = {}
+    regressions: list[str] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(str(Path(tmp) / "bench"))
+        db.setup(backups=False)
+        dates = populate(db, args.rows)
+        measured = {}
+        for case in cases(db, args.rows, dates):
+            if args.only and not any(part in case.name for part in args.only):
+                continue
+            measured[case.name] = case
+            results[case.name] = case.measure(args.repeat)
+            print(
+                f"{case.name:<30}{results[case.name]['median_us']:>12.1f} мкс"
+                f" (min {results[case.name]['min_us']:.1f})",
+                flush=True,
+            )
+        if baseline is not None:
+            regressions = compare(results, baseline, args.threshold)
+        if args.check and regressions:
+            # Разовый выброс от фоновой нагрузки второй прогон не повторит
+            print(f"\nПовторный замер: {', '.join(regressions)}")
+            for name in regressions:
+                again = measured[name].measure(args.repeat)
+                results[name]["min_us"] = min(results[name]["min_us"], again["min_us"])
+            regressions = compare(
+                {name: results[name] for name in regressions}, baseline, args.threshold
+            )
+        db.engine.dispose()
+
+    report = {"meta": environment(args.rows), "results": results}
+    args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n")
+    print(f"Результаты записаны в {args.output}")
+
+    if args.update_baseline:
+        args.baseline.write_text(
+            json.dumps(report, indent=2, ensure_ascii=False) + "\n"
+        )
+        print(f"Базовый замер обновлен: {args.baseline}")
+        return 0
+    if baseline is None:
+        print(f"Базового замера {args.baseline} нет, сравнение пропущено")
+        return 0
+    if not regressions:
+        print("Регрессий нет")
+        return 0
+    print(f"Регрессии больше {args.threshold:.0%}: {', '.join(regressions)}")
+    if not args.check:
+        print("Код выхода не меняется без --check")
+        return 0
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
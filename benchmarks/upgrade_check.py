@@ -0,0 +1,163 @@
+"""Проверка обновления базы со схемы до миграций Alembic
+
+Создает таблицы такими, какими их создавала исходная версия бота (без
+alembic_version), заполняет их и запускает Database.setup. Схема должна
+дойти до последней ревизии, получить все таблицы и колонки моделей, а
+visitors_count - пересчитаться по посетителям. При расхождении скрипт
+завершается с ошибкой, поэтому его можно запускать как проверку в CI.
+
+PostgreSQL берется из --postgres или BENCH_POSTGRES_URL
+(postgresql+psycopg://...). Все таблицы в этой базе удаляются, указывать
+нужно отдельную пустую базу.
+
+Запуск: python -m benchmarks.upgrade_check [--postgres URL]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Optional
+
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Date,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    create_engine,
+    inspect,
+    text,
+)
+
+from src.classes.database import Base, Database, Registration
+
+# Модели исходной версии бота, таблицы создавались create_all
+baseline = MetaData()
+Table(
+    "visitors",
+    baseline,
+    Column("id", Integer, primary_key=True),
+    Column("tg_id", String, nullable=False),
+    Column("to_datetime", Date, nullable=False),
+    Column("hash_code", String, nullable=False, unique=True),
+    Column("is_active", Boolean),
+    Column("is_used", Boolean),
+)
+Table(
+    "users",
+    baseline,
+    Column("id", Integer, primary_key=True),
+    Column("tg_id", String, nullable=False, unique=True),
+    Column("username", String),
+    Column("first_name", String, nullable=False),
+    Column("full_name", String),
+)
+Table(
+    "registrations",
+    baseline,
+    Column("id", Integer, primary_key=True),
+    Column("date", Date, nullable=False, unique=True),
+    Column("max_visitors", Integer, nullable=False),
+    Column("visitors_count", Integer),
+    Column("cost", Integer),
+)
+
+
+def create_baseline(url: str, event_date: date) -> None:
+    """Создает с нуля базу исходной версии с одним событием и двумя посетителями"""
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS alembic_version"))
+    baseline.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            baseline.tables["registrations"].insert(),
+            [{"date": event_date, "max_visitors": 10, "visitors_count": 0, "cost": 250}],
+        )
+        conn.execute(
+            baseline.tables["visitors"].insert(),
+            [
+                {"tg_id": "1", "to_datetime": event_date, "hash_code": "paid",
+                 "is_active": True, "is_used": False},
+                {"tg_id": "2", "to_datetime": event_date, "hash_code": "unpaid",
+                 "is_active": False, "is_used": False},
+            ],
+        )
+    engine.dispose()
+
+
+def run(label: str, url: str) -> list[str]:
+    """Обновляет базу исходной версии через Database.setup, возвращает ошибки"""
+    event_date = date.today() + timedelta(days=1)
+    create_baseline(url, event_date)
+    db = Database(url=url)
+    db.setup(backups=False)
+
+    errors = []
+    head = ScriptDirectory.from_config(
+        Config(os.getenv("ALEMBIC_CONFIG", "alembic.ini"))
+    ).get_current_head()
+    inspector = inspect(db.engine)
+    with db.engine.connect() as conn:
+        current = MigrationContext.configure(conn).get_current_revision()
+    if current != head:
+        errors.append(f"ревизия {current}, ожидалась {head}")
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            errors.append(f"нет таблицы {table.name}")
+            continue
+        present = {column["name"] for column in inspector.get_columns(table.name)}
+        errors.extend(
+            f"нет колонки {table.name}.{column.name}"
+            for column in table.columns
+            if column.name not in present
+        )
+    with db.get_session() as session:
+        counter = (
+            session.query(Registration.visitors_count)
+            .filter(Registration.date == event_date)
+            .scalar()
+        )
+    if counter != 2:
+        errors.append(f"visitors_count {counter}, ожидалось 2")
+    db.engine.dispose()
+
+    print(f"{label:<10} {'ок' if not errors else '; '.join(errors)}")
+    return errors
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--postgres", default=os.getenv("BENCH_POSTGRES_URL"))
+    args = parser.parse_args(argv)
+
+    logging.getLogger("database").setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        backends: list[tuple[str, Optional[str]]] = [
+            ("sqlite", f"sqlite:///{Path(tmp) / 'upgrade.db'}"),
+            ("postgresql", args.postgres),
+        ]
+        failed = False
+        for label, url in backends:
+            if url is None:
+                print(f"{label:<10} пропущено: не задан --postgres")
+                continue
+            failed = bool(run(label, url)) or failed
+    if failed:
+        print("База исходной версии не обновляется до актуальной схемы")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
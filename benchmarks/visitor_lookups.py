@@ -0,0 +1,103 @@
+"""Бенчмарк поиска посетителей на больших таблицах
+
+Заполняет visitors синтетическими строками (по умолчанию 100k и 1M),
+замеряет среднее время check_registration_by_tgid, reg_new_visitor,
+delete_visitor и get_available с индексами и без них и печатает план
+запроса SQLite.
+
+Запуск: python -m benchmarks.visitor_lookups [rows ...]
+"""
+
+import logging
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from src.classes.database import Database, Visitor
+
+CALLS = 200
+DAYS = 365
+
+
+def populate(db: Database, rows: int) -> list[date]:
+    """Заполняет таблицы событиями и rows посетителями"""
+    dates = [date.today() + timedelta(days=i) for i in range(DAYS)]
+    for event_date in dates:
+        db.add_event(event_date, rows)
+    with sqlite3.connect(db.db_name) as conn:
+        conn.executemany(
+            "INSERT INTO visitors (tg_id, to_datetime, hash_code, is_active, is_used)"
+            " VALUES (?, ?, ?, ?, 0)",
+            (
+                (str(i), dates[i % DAYS].isoformat(), f"h{i}", i % 4 != 0)
+                for i in range(rows)
+            ),
+        )
+    return dates
+
+
+def timed(func, args_list) -> float:
+    """Среднее время вызова func в микросекундах"""
+    start = time.perf_counter()
+    for args in args_list:
+        func(*args)
+    return (time.perf_counter() - start) / len(args_list) * 1e6
+
+
+def run_suite(db: Database, rows: int, dates: list[date], label: str):
+    rnd = random.Random(rows)
+    lookups = [(rnd.randrange(rows), dates[rnd.randrange(DAYS)]) for _ in range(CALLS)]
+    new_ids = [rows + i for i in range(CALLS)]
+    results = {
+        "check_registration_by_tgid": timed(
+            db.check_registration_by_tgid, [(tg_id, d) for tg_id, d in lookups]
+        ),
+        "reg_new_visitor": timed(
+            db.reg_new_visitor,
+            [
+                (tg_id, datetime.combine(dates[0], datetime.min.time()))
+                for tg_id in new_ids
+            ],
+        ),
+        "delete_visitor": timed(
+            db.delete_visitor, [(tg_id, dates[0]) for tg_id in new_ids]
+        ),
+        "get_available": timed(db.get_available, [(d,) for _, d in lookups]),
+    }
+    for name, micros in results.items():
+        print(f"{rows:>9} {label:>10} {name:<28} {micros:>10.1f} мкс")
+
+
+def explain(db: Database):
+    with sqlite3.connect(db.db_name) as conn:
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM visitors"
+            " WHERE tg_id = ? AND to_datetime = ? AND is_active = 1",
+            ("1", date.today().isoformat()),
+        ).fetchall()
+    print("   план:", "; ".join(row[-1] for row in plan))
+
+
+def main(sizes: list[int]):
+    logging.getLogger("database").setLevel(logging.WARNING)
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(str(Path(tmp) / "bench"))
+            db.setup(backups=False)
+            dates = populate(db, rows)
+
+            run_suite(db, rows, dates, "indexed")
+            explain(db)
+            for index in Visitor.__table__.indexes:
+                index.drop(db.engine)
+            run_suite(db, rows, dates, "no index")
+            explain(db)
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or [100_000, 1_000_000])
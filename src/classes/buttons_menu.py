@@ -1,22 +1,35 @@
 """Модуль кнопок меню с использованием SQLAlchemy"""
 
-import os
-from datetime import datetime
-from typing import List, Union
+import functools
+from datetime import date
+from typing import List, NamedTuple, Optional, Union
 
-from dotenv import load_dotenv
 from pyrogram.types import (
     InlineKeyboardButton,
     InlineKeyboardButtonBuy,
     InlineKeyboardMarkup,
 )
 
-from src.classes.database import Database
-from src.utils import Utils
+from src.classes.callback_router import pack
+from src.classes.database import AvailabilitySnapshot, Database
+from src.config import config
+
+
+class _EventButtons(NamedTuple):
+    """Кнопки событий снимка: (дата, без регистрации, с регистрацией)"""
+
+    snapshot: AvailabilitySnapshot
+    buttons: List[tuple[date, InlineKeyboardButton, InlineKeyboardButton]]
+    markup: InlineKeyboardMarkup
 
 
 class ButtonsMenu:
-    """Класс для генерации интерактивных кнопок меню"""
+    """Класс для генерации интерактивных кнопок меню
+
+    Постоянные клавиатуры создаются один раз и переиспользуются.
+    """
+
+    _event_buttons: Optional[_EventButtons] = None
 
     @staticmethod
     def _decline_tickets(number: int) -> str:
@@ -28,51 +41,80 @@ class ButtonsMenu:
         return "билетов"
 
     @classmethod
-    def get_buy_markup(cls, tg_id: Union[int, str]) -> InlineKeyboardMarkup:
-        """Генерирует клавиатуру для покупки билетов"""
-        with Database().get_session():
-            db = Database()
-            buttons: List[InlineKeyboardButton] = []
-
-            # Получаем доступные события
-            events = db.get_events(show_all=True, show_old=False)
-
-            for event in events:
-                # Ensure we're working with actual integer values
-                available = db.get_available(event.date)
-                date_obj = datetime.strptime(str(event.date), Utils.DATE_FORMAT)
-
-                # Проверяем регистрацию пользователя
-                is_registered = db.check_registration_by_tgid(tg_id, date_obj.date())
-
-                # Формируем текст кнопки
-                button_text = (
-                    f"{date_obj.strftime('%d.%m.%Y')} "
-                    f"({available} {cls._decline_tickets(available)})"
-                    f"{' ✅' if is_registered else ''}"
-                )
-
-                # Определяем callback данные
-                if is_registered:
-                    callback_data = "reg_error_already_registrate"
-                elif available <= 0:
-                    callback_data = "reg_error_not_available"
-                else:
-                    callback_data = f"reg_user_to_{event.date}"
-
-                buttons.append(
-                    InlineKeyboardButton(button_text, callback_data=callback_data)
-                )
-
-            # Добавляем кнопку меню
-            buttons.append(cls._get_menu_button())
-
-            # Группируем кнопки по 1 в ряд
-            keyboard: List[List[InlineKeyboardButton | InlineKeyboardButtonBuy]] = [
-                [button] for button in buttons
-            ]
+    def _get_event_button(
+        cls, event_date: date, available: int, is_registered: bool
+    ) -> InlineKeyboardButton:
+        """Кнопка события в меню покупки"""
+        # Формируем текст кнопки
+        button_text = (
+            f"{event_date.strftime('%d.%m.%Y')} "
+            f"({available} {cls._decline_tickets(available)})"
+            f"{' ✅' if is_registered else ''}"
+        )
+
+        # Определяем callback данные
+        if is_registered:
+            callback_data = pack("reg_taken")
+        elif available <= 0:
+            callback_data = pack("reg_full")
+        else:
+            callback_data = pack("reg", event_date)
+
+        return InlineKeyboardButton(button_text, callback_data=callback_data)
 
-            return InlineKeyboardMarkup(keyboard)
+    @classmethod
+    def _get_event_buttons(cls, snapshot: AvailabilitySnapshot) -> _EventButtons:
+        """Кнопки событий снимка, строятся один раз на снимок"""
+        cached = cls._event_buttons
+        if cached is not None and cached.snapshot is snapshot:
+            return cached
+        buttons = [
+            (
+                event_date,
+                cls._get_event_button(event_date, available, False),
+                cls._get_event_button(event_date, available, True),
+            )
+            for event_date, available in snapshot.events
+        ]
+        cached = _EventButtons(
+            snapshot, buttons, cls._get_buy_keyboard([free for _, free, _ in buttons])
+        )
+        cls._event_buttons = cached
+        return cached
+
+    @classmethod
+    def _get_buy_keyboard(
+        cls, buttons: List[InlineKeyboardButton]
+    ) -> InlineKeyboardMarkup:
+        """Клавиатура из кнопок событий и кнопки меню"""
+        # Группируем кнопки по 1 в ряд
+        keyboard: List[List[InlineKeyboardButton | InlineKeyboardButtonBuy]] = [
+            [button] for button in buttons
+        ]
+        # Добавляем кнопку меню
+        keyboard.append([cls._get_menu_button()])
+        return InlineKeyboardMarkup(keyboard)
+
+    @classmethod
+    def get_buy_markup(
+        cls, db: Database, tg_id: Union[int, str]
+    ) -> InlineKeyboardMarkup:
+        """Генерирует клавиатуру для покупки билетов
+
+        Рисуется по снимку Database.get_availability из готовых кнопок:
+        пользователю без регистраций отдается общая клавиатура снимка.
+        """
+        snapshot = db.get_availability()
+        cached = cls._get_event_buttons(snapshot)
+        registered = snapshot.registrations.get(str(tg_id))
+        if not registered:
+            return cached.markup
+        return cls._get_buy_keyboard(
+            [
+                taken if event_date in registered else free
+                for event_date, free, taken in cached.buttons
+            ]
+        )
 
     @staticmethod
     def get_newsletter_markup(tg_id: Union[int, str]) -> InlineKeyboardMarkup:
@@ -80,21 +122,22 @@ class ButtonsMenu:
         return InlineKeyboardMarkup(
             [
                 [
-                    InlineKeyboardButton("Отправить", callback_data=f"send_{tg_id}"),
-                    InlineKeyboardButton("Отмена", callback_data="send_cancel"),
+                    InlineKeyboardButton("Отправить", callback_data=pack("send", int(tg_id))),
+                    InlineKeyboardButton("Отмена", callback_data=pack("send_cancel")),
                 ]
             ]
         )
 
     @staticmethod
+    @functools.cache
     def get_start_markup() -> InlineKeyboardMarkup:
-        """Генерирует стартовую клавиатуру"""
+        """Возвращает стартовую клавиатуру (общий экземпляр)"""
         return InlineKeyboardMarkup(
             [
-                [InlineKeyboardButton("Купить билеты", callback_data="buytickets")],
+                [InlineKeyboardButton("Купить билеты", callback_data=pack("buy"))],
                 [
                     InlineKeyboardButton(
-                        "📝 Пользовательское соглашение", callback_data="useragreement"
+                        "📝 Пользовательское соглашение", callback_data=pack("agreement")
                     )
                 ],
             ]
@@ -103,9 +146,7 @@ class ButtonsMenu:
     @classmethod
     def get_payment_markup(cls, payment_url: str, cost: int | str) -> InlineKeyboardMarkup:
         """Генерирует клавиатуру для оплаты"""
-        load_dotenv(override=True)
-        print(os.environ)
-        cost = os.getenv("COST", cost)
+        cost = config.get().cost or cost
         return InlineKeyboardMarkup(
             [
                 [InlineKeyboardButton(f"Оплатить {cost} ₽", url=payment_url)],
@@ -113,11 +154,13 @@ class ButtonsMenu:
         )
 
     @staticmethod
+    @functools.cache
     def _get_menu_button() -> InlineKeyboardButton:
         """Возвращает кнопку возврата в меню"""
-        return InlineKeyboardButton("🗄 В меню", callback_data="menu")
+        return InlineKeyboardButton("🗄 В меню", callback_data=pack("menu"))
 
     @staticmethod
+    @functools.cache
     def get_menu_markup() -> InlineKeyboardMarkup:
-        """Генерирует минимальную клавиатуру с кнопкой меню"""
+        """Возвращает минимальную клавиатуру с кнопкой меню (общий экземпляр)"""
         return InlineKeyboardMarkup([[ButtonsMenu._get_menu_button()]])
@@ -0,0 +1,163 @@
+"""Модуль маршрутизации callback-запросов"""
+
+import logging
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Awaitable, Callable, Optional
+
+from pyrogram.types import CallbackQuery
+
+from src.metrics import metrics
+from src.utils import Utils
+
+# Версия формата: при несовместимом изменении старые кнопки распознаются
+CALLBACK_VERSION = "1"
+SEPARATOR = ":"
+# Ограничение Telegram на callback_data
+MAX_CALLBACK_BYTES = 64
+STALE_CALLBACK = "Кнопка устарела, откройте меню заново: /start"
+
+CallbackArg = int | str | date
+Handler = Callable[..., Awaitable[Any]]
+
+
+def _to_base36(value: int) -> str:
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    sign, value = ("-", -value) if value < 0 else ("", value)
+    result = ""
+    while True:
+        value, rest = divmod(value, 36)
+        result = digits[rest] + result
+        if not value:
+            return sign + result
+
+
+def _encode_arg(arg: CallbackArg) -> str:
+    if isinstance(arg, date):
+        return _to_base36(arg.toordinal())
+    if isinstance(arg, int):
+        return _to_base36(arg)
+    if SEPARATOR in arg:
+        raise ValueError(f"Аргумент колбэка содержит '{SEPARATOR}': {arg}")
+    return arg
+
+
+_DECODERS: dict[type, Callable[[str], Any]] = {
+    int: lambda value: int(value, 36),
+    date: lambda value: date.fromordinal(int(value, 36)),
+    str: str,
+}
+
+
+def pack(route: str, *args: CallbackArg) -> str:
+    """Кодирует маршрут и аргументы в callback_data
+
+    Числа и даты записываются в base36 (дата - как номер дня), поэтому
+    «reg_user_to_2025-06-01» превращается в «1reg:fuiz».
+    """
+    data = SEPARATOR.join((CALLBACK_VERSION + route, *map(_encode_arg, args)))
+    if len(data.encode()) > MAX_CALLBACK_BYTES:
+        raise ValueError(f"callback_data длиннее {MAX_CALLBACK_BYTES} байт: {data}")
+    return data
+
+
+def unpack(data: str) -> Optional[tuple[str, list[str]]]:
+    """Разбирает callback_data, None для чужой версии формата"""
+    if not data.startswith(CALLBACK_VERSION):
+        return None
+    route, *args = data[len(CALLBACK_VERSION) :].split(SEPARATOR)
+    return route, args
+
+
+@dataclass(frozen=True)
+class CallbackRoute:
+    """Описание маршрута: имя, типы аргументов и доступ только для админов"""
+
+    name: str
+    types: tuple[type, ...] = ()
+    admin: bool = False
+
+
+@dataclass
+class RouteStats:
+    """Счетчики вызовов и времени обработки маршрута"""
+
+    calls: int = 0
+    errors: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+
+    @property
+    def avg_ms(self) -> float:
+        return self.total_time / self.calls * 1000 if self.calls else 0.0
+
+
+def callback(
+    name: str, *types: type, admin: bool = False
+) -> Callable[[Handler], Handler]:
+    """Помечает метод клиента как обработчик маршрута name
+
+    Аргументы из callback_data приводятся к types и передаются после query.
+    Помеченные методы регистрирует CustomClient._setup_callbacks, так же
+    как обработчики команд handle_*.
+    """
+    for arg_type in types:
+        if arg_type not in _DECODERS:
+            raise TypeError(f"Неподдерживаемый тип аргумента колбэка: {arg_type}")
+
+    def decorator(func: Handler) -> Handler:
+        func.callback_route = CallbackRoute(name, types, admin)
+        return func
+
+    return decorator
+
+
+class CallbackRouter:
+    """Таблица маршрутов callback-запросов с поиском за O(1)"""
+
+    def __init__(self):
+        self.logger = logging.getLogger("callbacks")
+        self.routes: dict[str, tuple[CallbackRoute, Handler]] = {}
+        self.stats: dict[str, RouteStats] = {}
+
+    def add(self, route: CallbackRoute, handler: Handler) -> None:
+        """Регистрирует обработчик маршрута"""
+        if route.name in self.routes:
+            raise ValueError(f"Маршрут {route.name} уже зарегистрирован")
+        self.routes[route.name] = (route, handler)
+        self.stats[route.name] = RouteStats()
+
+    async def dispatch(self, _: Any, query: CallbackQuery) -> None:
+        """Находит маршрут по callback_data и вызывает обработчик"""
+        unpacked = unpack(str(query.data))
+        entry = self.routes.get(unpacked[0]) if unpacked else None
+        if unpacked is None or entry is None:
+            await query.answer(STALE_CALLBACK)
+            return
+        route, handler = entry
+        raw_args = unpacked[1]
+        try:
+            if len(raw_args) != len(route.types):
+                raise ValueError(raw_args)
+            args = [_DECODERS[t](raw) for t, raw in zip(route.types, raw_args, strict=True)]
+        except ValueError:
+            self.logger.warning("Некорректные данные колбэка: %s", query.data)
+            await query.answer(STALE_CALLBACK)
+            return
+        if route.admin and not Utils.is_admin(query.from_user.id):
+            return
+
+        stats = self.stats[route.name]
+        start = time.perf_counter()
+        try:
+            await handler(query, *args)
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            stats.calls += 1
+            stats.total_time += elapsed
+            stats.max_time = max(stats.max_time, elapsed)
+            metrics.observe("callback_seconds", elapsed, route=route.name)
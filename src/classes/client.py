@@ -1,5 +1,6 @@
 """Модуль кастомного клиента с использованием SQLAlchemy"""
 
+import asyncio
 import datetime
 import inspect
 import io
@@ -13,16 +14,36 @@ from typing import Any, Awaitable, Callable, Optional, TypeVar
 from pyrogram import filters
 from pyrogram.client import Client
 from pyrogram.handlers import CallbackQueryHandler, MessageHandler
-from pyrogram.types import CallbackQuery, User
+from pyrogram.types import CallbackQuery, InputMediaPhoto
+from pyrogram.errors import BadRequest, FloodWait
 from pyrogram.errors.exceptions.forbidden_403 import MessageDeleteForbidden
 from src.classes.buttons_menu import ButtonsMenu
-from src.classes.customtinkoffacquiringapclient import CustomTinkoffAcquiringAPIClient
-from src.classes.database import Database
+from src.classes.callback_router import CallbackRouter, callback
+from src.classes.customtinkoffacquiringapclient import (
+    CustomTinkoffAcquiringAPIClient,
+    PaymentNotificationServer,
+)
+from src.classes.database import AsyncDatabase, Database, PendingPayment
+from src.classes.newsletter import Newsletter
+from src.classes.payment_tracker import PaymentTracker, RefundRequired
+from src.classes.seat_holds import SeatHolds
 from src.classes.message.Message import CustomMessage as Message
+from src.classes.qr_cache import QRCache
+from src.classes.qr_renderer import QRRenderer
+from src.classes.ticket_index import ScanResult, TicketIndex
+from src.config import config
+from src.metrics import MetricsServer, metrics, update_queries
 from src.utils import Utils
 
 ClientVar = TypeVar("ClientVar")
 
+CHECK_IN_REPLIES = {
+    ScanResult.OK: Utils.TRUE_CODE,
+    ScanResult.USED: Utils.FALSE_CODE_ALREADY_USED,
+    ScanResult.INVALID: Utils.FALSE_CODE,
+    ScanResult.WRONG_DATE: Utils.FALSE_CODE_WRONG_DATE,
+}
+
 
 class CustomClient(Client):
     """Кастомный клиент с интеграцией SQLAlchemy и очередями"""
@@ -33,12 +54,35 @@ class CustomClient(Client):
         api_id: Optional[str | int] = None,
         api_hash: Optional[str] = None,
         bot_token: Optional[str] = None,
+        db: Optional[Database] = None,
     ):
         self.logger = logging.getLogger("pyrobot")
-        self.db = Database()
+        self.db = AsyncDatabase(db or Database())
+        self.qr_renderer = QRRenderer()
+        self.qr_cache = QRCache()
         self.tb = CustomTinkoffAcquiringAPIClient(
             os.getenv("TINKOFF_TERMINAL_KEY"), os.getenv("TINKOFF_SECRET_KEY")
         )
+        self.payment_notifications = (
+            PaymentNotificationServer(self.tb) if self.tb.notification_url else None
+        )
+        self.payment_tracker = PaymentTracker(
+            self.db,
+            self.tb,
+            self._fulfill_payment,
+            on_cancelled=lambda payment: self.seat_holds.release(str(payment.hash_code)),
+            on_extended=lambda payment: self.seat_holds.extend(str(payment.hash_code)),
+            on_refund=self._refund_payment,
+        )
+        self.seat_holds = SeatHolds(self.db, min_ttl=self.payment_tracker.ttl)
+        self.newsletter = Newsletter(self, self.db)
+        self.ticket_index = TicketIndex(self.db)
+        self.callbacks = CallbackRouter()
+        self.metrics_server = (
+            MetricsServer(metrics) if os.getenv("METRICS_PORT") else None
+        )
+        metrics.gauge("qr_cache_hit_rate", lambda: self.qr_cache.stats()["hit_rate"])
+        metrics.gauge("qr_cache_bytes", lambda: self.qr_cache.stats()["bytes"])
         self.messages: dict[str, str] = {}
 
         self._validate_credentials(api_id, api_hash, name, bot_token)
@@ -57,6 +101,36 @@ class CustomClient(Client):
         self._setup_callbacks()
         self.logger.info("Инициализация клиента завершена")
 
+    async def start(self):
+        """Запуск клиента с подготовкой базы данных и пула рендеринга QR"""
+        await self.db.setup()
+        await self.qr_renderer.start()
+        if self.payment_notifications:
+            await self.payment_notifications.start()
+        if self.metrics_server:
+            await self.metrics_server.start()
+        result = await super().start()
+        # Сохраненные платежи подхватываются до первого освобождения мест
+        await self.payment_tracker.start()
+        await self.seat_holds.start()
+        await self.newsletter.resume()
+        return result
+
+    async def stop(self, block: bool = True):
+        """Остановка клиента с освобождением пулов базы данных и рендеринга"""
+        await self.payment_tracker.stop()
+        await self.seat_holds.stop()
+        await self.newsletter.stop()
+        result = await super().stop(block)
+        if self.payment_notifications:
+            await self.payment_notifications.stop()
+        if self.metrics_server:
+            await self.metrics_server.stop()
+        await self.tb.close()
+        self.qr_renderer.close()
+        self.db.close()
+        return result
+
     def _validate_credentials(self, *args: Any):
         """Проверка учетных данных"""
         required = {
@@ -86,18 +160,27 @@ class CustomClient(Client):
             method = getattr(self, name)
             if inspect.iscoroutinefunction(method):
                 commands = name[7:].split("_")
-                handler = self._wrap_handler(method, commands)
+                handler = self._wrap_handler(method, commands, name)
                 if "admin" in commands:
                     commands.remove("admin")
                 self.add_handler(MessageHandler(handler, filters.command(commands)))
 
     def _setup_callbacks(self):
-        """Регистрация обработчиков колбэков"""
-        wrapped_callback = self._error_handler_wrapper(self._process_callback)
+        """Регистрация обработчиков колбэков, помеченных @callback"""
+        for name in dir(self):
+            method = getattr(self, name)
+            if route := getattr(method, "callback_route", None):
+                self.callbacks.add(route, method)
+        wrapped_callback = self._error_handler_wrapper(
+            self.callbacks.dispatch, "callbacks"
+        )
         self.add_handler(CallbackQueryHandler(wrapped_callback))
 
     def _wrap_handler(
-        self, handler: Callable[..., Awaitable[Message]], commands: list[str]
+        self,
+        handler: Callable[..., Awaitable[Message]],
+        commands: list[str],
+        name: str,
     ) -> Callable[..., Awaitable[Message]]:
         """Обертка для обработчиков с проверкой прав"""
 
@@ -105,26 +188,53 @@ class CustomClient(Client):
             original_handler = handler
 
             async def admin_handler(client: Client, message: Message) -> Message | None:
-                if message.from_user and message.from_user.id in Utils.ADMIN_IDS:
+                if message.from_user and Utils.is_admin(message.from_user.id):
                     return await original_handler(client, message)
 
             handler = admin_handler
-        return self._error_handler_wrapper(handler)
+        return self._error_handler_wrapper(handler, name)
 
     def _error_handler_wrapper(
-        self, func: Callable[..., Awaitable[Message | CallbackQuery]]
+        self,
+        func: Callable[..., Awaitable[Message | CallbackQuery]],
+        name: Optional[str] = None,
     ) -> Callable[..., Awaitable[Message]]:
-        """Декоратор для обработки ошибок"""
+        """Декоратор для обработки ошибок и сбора метрик обработчика"""
+        name = name or func.__name__
 
         async def wrapper(client: Client, message: Message) -> Callable[..., Message]:
+            queries = [0]
+            token = update_queries.set(queries)
+            start = time.perf_counter()
             try:
                 return await func(client, message)
 
             except Exception as e:
-                await self._report_error(e, func.__name__)
+                metrics.inc("handler_errors_total", handler=name)
+                await self._report_error(e, name)
+            finally:
+                metrics.observe(
+                    "handler_seconds", time.perf_counter() - start, handler=name
+                )
+                metrics.observe("db_queries_per_update", queries[0], handler=name)
+                update_queries.reset(token)
 
         return wrapper
 
+    async def invoke(self, query: Any, *args: Any, **kwargs: Any) -> Any:
+        """Вызов Telegram API с замером длительности"""
+        method = type(query).__name__
+        start = time.perf_counter()
+        try:
+            return await super().invoke(query, *args, **kwargs)
+        except FloodWait:
+            metrics.inc("telegram_flood_waits_total", method=method)
+            raise
+        finally:
+            metrics.observe(
+                "telegram_call_seconds", time.perf_counter() - start, method=method
+            )
+
     async def _report_error(self, error: Exception, context: str = ""):
         """Отправка отчета об ошибке"""
         error_msg = (
@@ -134,47 +244,107 @@ class CustomClient(Client):
             f"```python {traceback.format_exc()[:3000]}\n```"
         )
 
-        for admin_id in Utils.ADMIN_IDS:
+        for admin_id in config.get().admin_ids:
             try:
                 await self.send_message(admin_id, error_msg)
             except Exception as e:
-                self.logger.error(f"Ошибка отправки сообщения: {e}")
-
-    # async def handle_genqrtest_admin(self, _, message: Message):
-    #     """Генерация n QR-кодов одновременно с измерением памяти"""
-    #     args = message.command[1:]
-    #     if not args or not args[0].isdigit():
-    #         await message.reply("Укажите количество QR-кодов для генерации.")
-    #         return
-    #     start_time = time.time()
-    #     count = int(args[0])
-
-    #     tracemalloc.start()
-    #     message = await message.reply(f"Генерация {count} QR-кодов...")
-    #     load_dotenv(override=True)
-    #     executor = ProcessPoolExecutor(max_workers=int(os.getenv("generation_workers", 1)))
-
-    #     async def generate_qr(index: int):
-    #         # Здесь напрямую вызываем функцию генерации QR-кода в отдельном процессе.
-    #         loop = asyncio.get_running_loop()
-    #         qr_image = await loop.run_in_executor(
-    #             executor, Utils.create_qr, str(hash(index)), None
-    #         )
-    #         if index % 50 == 0:
-    #             await message.edit_text(f"Сгенерировано {index} куаркодов")
-    #         return qr_image
-
-    #     tasks = [generate_qr(i) for i in range(count)]
-    #     qr_images = await asyncio.gather(*tasks)
-
-    #     current, peak = tracemalloc.get_traced_memory()
-    #     tracemalloc.stop()
-
-    #     await message.edit_text(
-    #         f"Генерация завершена. Сгенерировано {len(qr_images)} QR-кодов за {time.time() - start_time:.2f} секунд.\n"
-    #         f"Использование памяти: {current / 1024 / 1024:.2f} MB (пик: {peak / 1024 / 1024:.2f} MB)"
-    #     )
-    #     executor.shutdown()
+                self.logger.error("Ошибка отправки сообщения: %s", e)
+
+    async def _send_ticket_qr(
+        self,
+        chat_id: int | str,
+        hash_code: str,
+        caption: str,
+        style: Optional[str] = None,
+    ) -> Optional[Message]:
+        """Отправляет QR-код билета, переиспользуя уже загруженное фото
+
+        file_id сохраняется в базе вместе с хешем параметров генерации,
+        поэтому повторная отправка не рендерит и не загружает изображение.
+        """
+        data = Utils.QR_URL(self.me.username if self.me else "", hash_code)
+        style_name = style or "default"
+        qr_key = QRCache.make_key(Utils.qr_cache_key(data, style))
+
+        if file_id := await self.db.get_ticket_file_id(hash_code, style_name, qr_key):
+            try:
+                return await self.send_photo(chat_id, file_id, caption=caption)
+            except BadRequest as e:
+                self.logger.info("file_id для %s недействителен: %s", hash_code, e)
+
+        qr_png = await Utils.gen_qr_code(data, style, self.qr_renderer, self.qr_cache)
+        with io.BytesIO(qr_png) as buffer:
+            sent = await self.send_photo(chat_id, buffer, caption=caption)
+        if sent and sent.photo:
+            await self.db.save_ticket_file_id(
+                hash_code, style_name, qr_key, sent.photo.file_id
+            )
+        return sent
+
+    async def _send_ticket_qrs(
+        self,
+        message: Message,
+        tickets: list[tuple[str, str]],
+        style: Optional[str] = None,
+    ):
+        """Отправляет QR-коды нескольких билетов одной медиагруппой
+
+        Args:
+            tickets (list[tuple[str, str]]): Пары (hash_code, подпись), до 10 штук.
+        """
+        if len(tickets) == 1:
+            await self._send_ticket_qr(message.chat.id, *tickets[0], style)
+            return
+
+        style_name = style or "default"
+        username = self.me.username if self.me else ""
+        payloads = [Utils.QR_URL(username, hash_code) for hash_code, _ in tickets]
+        qr_keys = [
+            QRCache.make_key(Utils.qr_cache_key(data, style)) for data in payloads
+        ]
+        known = await self.db.get_ticket_file_ids(
+            [hash_code for hash_code, _ in tickets], style_name
+        )
+        file_ids: list[Optional[str]] = []
+        for (hash_code, _), qr_key in zip(tickets, qr_keys, strict=True):
+            stored = known.get(hash_code)
+            file_ids.append(stored[1] if stored and stored[0] == qr_key else None)
+
+        for attempt in range(2):
+            missing = [i for i, file_id in enumerate(file_ids) if file_id is None]
+            rendered = dict(
+                zip(
+                    missing,
+                    await Utils.gen_qr_codes(
+                        [payloads[i] for i in missing],
+                        style,
+                        self.qr_renderer,
+                        self.qr_cache,
+                    ),
+                    strict=True,
+                )
+            )
+            media = [
+                InputMediaPhoto(
+                    file_ids[i] or io.BytesIO(rendered[i]), caption=caption
+                )
+                for i, (_, caption) in enumerate(tickets)
+            ]
+            try:
+                sent = await message.reply_media_group(media)
+                break
+            except BadRequest as e:
+                if attempt or len(missing) == len(tickets):
+                    raise
+                # Сохранённые file_id устарели, загружаем все фото заново
+                self.logger.info("Повторная загрузка медиагруппы: %s", e)
+                file_ids = [None] * len(tickets)
+
+        for i in missing:
+            if sent[i].photo:
+                await self.db.save_ticket_file_id(
+                    tickets[i][0], style_name, qr_keys[i], sent[i].photo.file_id
+                )
 
     async def handle_genqr_admin(self, _, message: Message):
         """Функция для генерации QR кода"""
@@ -182,30 +352,37 @@ class CustomClient(Client):
             style = message.command[3]
         else:
             style = "plain"
-        qr_image = await Utils.gen_qr_code(
-            Utils.QR_URL(self.me.username if self.me else "", message.command[1]), style
+        await self._send_ticket_qr(
+            message.chat.id,
+            message.command[1],
+            Utils.TRUE_PROMPT.format(message.command[2], message.command[1]),
+            style,
         )
 
-        with io.BytesIO() as buffer:
-            qr_image.save(buffer, format="PNG")
-            buffer.seek(0)
-            await message.reply_photo(
-                buffer,
-                caption=Utils.TRUE_PROMPT.format(
-                    message.command[2], message.command[1]
-                ),
-            )
-
     async def handle_check_admin(self, _, message: Message):
-        """Проверка регистрации по хэш-коду (админ)"""
-        if hash_code := message.command[1]:
-            visitor = self.db.check_registration_by_hash(hash_code)
-            if visitor:
-                if bool(visitor.is_active):
-                    await message.reply(Utils.TRUE_CODE)
-                    self.db.use_hash(hash_code)
-            else:
-                await message.reply(Utils.FALSE_CODE)
+        """Проверка и погашение билетов по хэш-кодам (админ)
+
+        Можно передать несколько кодов через пробел или с новой строки.
+        """
+        if hash_codes := message.command[1:]:
+            await self._reply_check_in(message, hash_codes)
+        else:
+            await message.reply("Использование: /check <код> [<код> ...]")
+
+    async def _reply_check_in(self, message: Message, hash_codes: list[str]):
+        """Гасит билеты через индекс дня и отвечает админу"""
+        results = await self.ticket_index.check_in_many(hash_codes)
+        if len(results) == 1:
+            await message.reply(CHECK_IN_REPLIES[results[0][1]])
+            return
+        passed = sum(result is ScanResult.OK for _, result in results)
+        lines = [f"✅ Пропущено {passed} из {len(results)}"]
+        lines += [
+            f"{CHECK_IN_REPLIES[result]} {hash_code}"
+            for hash_code, result in results
+            if result is not ScanResult.OK
+        ]
+        await message.reply("\n".join(lines))
 
     async def handle_sendall_admin(self, _, message: Message):
         """Рассылка сообщений (админ)"""
@@ -221,7 +398,7 @@ class CustomClient(Client):
         """Функция для генерации QR кода личного для пользователя"""
         if len(message.command[1:]) > 0:
             args = message.command[1:]
-            if message.from_user.id in Utils.ADMIN_IDS:
+            if Utils.is_admin(message.from_user.id):
                 user_id = args[0]
             else:
                 user_id = message.from_user.id
@@ -229,25 +406,20 @@ class CustomClient(Client):
             user_id = message.from_user.id
         users = [
             event
-            for event in self.db.get_all_visitors(user_id)
+            for event in await self.db.get_all_visitors(user_id)
             if bool(event.to_datetime >= datetime.datetime.now().date())
         ]
-        for user in users:
-            qr_image = await Utils.gen_qr_code(
-                Utils.QR_URL(self.me.username if self.me else "", user.hash_code)
-            )
-
-            with io.BytesIO() as buffer:
-                qr_image.save(buffer, format="PNG")
-                buffer.seek(0)
-                await message.reply_photo(
-                    buffer,
-                    caption=Utils.TRUE_PROMPT.format(user.to_datetime, user.hash_code),
-                )
+        tickets = [
+            (user.hash_code, Utils.TRUE_PROMPT.format(user.to_datetime, user.hash_code))
+            for user in users
+        ]
+        # Telegram принимает не больше 10 фото в одной медиагруппе
+        for i in range(0, len(tickets), 10):
+            await self._send_ticket_qrs(message, tickets[i : i + 10])
 
     async def handle_main_start(self, _: Client, message: Message):
         """Обработка команд /main и /start"""
-        self.db.add_user(message.from_user)
+        await self.db.add_user(message.from_user)
         if len(message.command) > 1:
             hash_code = message.command[1]
             if hash_code.startswith("activate"):
@@ -271,21 +443,30 @@ class CustomClient(Client):
                 #         )
                 #     return
             else:
-                if message.from_user.id in Utils.ADMIN_IDS:
-                    if self.db.check_registration_by_hash(hash_code):
-                        try:
-                            self.db.use_hash(hash_code)
-                            await message.reply(Utils.TRUE_CODE)
-                        except ValueError:
-                            await message.reply(Utils.FALSE_CODE_ALREADY_USED)
-                    else:
-                        await message.reply(Utils.FALSE_CODE)
+                if Utils.is_admin(message.from_user.id):
+                    await self._reply_check_in(message, [hash_code])
                     return
 
         await message.reply(
             Utils.START_MESSAGE, reply_markup=ButtonsMenu.get_start_markup()
         )
 
+    async def handle_reload_admin(self, _, message: Message):
+        """Принудительная перезагрузка .env и текстов (админ)"""
+        await asyncio.to_thread(config.reload, True)
+        if config.last_error is not None:
+            await message.reply(
+                f"❌ Конфигурация не загружена, осталась прежняя: {config.last_error}"
+            )
+            return
+        await message.reply("✅ Конфигурация перезагружена")
+
+    async def handle_stats_admin(self, _, message: Message):
+        """Сводка метрик бота (админ)"""
+        summary = await asyncio.to_thread(metrics.summary)
+        # Ограничение Telegram на длину сообщения
+        await message.reply(summary[:4096])
+
     async def handle_addevent_admin(self, _, message: Message):
         """Добавление нового события (админ)"""
         answer = await message.ask(f"Введите дату в формате {Utils.DATE_FORMAT}")
@@ -296,63 +477,59 @@ class CustomClient(Client):
         )
         max_visitors = int(answer.text) if answer.text.isdigit() else 250
 
-        self.db.add_event(event_date, max_visitors)
+        await self.db.add_event(event_date, max_visitors)
         self.logger.info(
-            f"Добавлено событие на {event_date} " f"(макс. участников: {max_visitors})"
+            "Добавлено событие на %s (макс. участников: %s)", event_date, max_visitors
         )
 
-    async def _process_callback(self, _: Client, query: CallbackQuery) -> None:
-        """Обработка callback-запросов"""
-        data = str(query.data)
-        message = query.message
+    @callback("reg_taken")
+    async def _answer_already_registered(self, query: CallbackQuery):
+        """Кнопка события, на которое пользователь уже зарегистрирован"""
+        await query.answer(Utils.CALLBACK_USER_ALREADY_REGISTRATE)
 
-        if data.startswith("useragreement"):
-            await self._show_user_agreement(message)
-        elif data.startswith("reg_error"):
-            await self._process_registration_errors(query, message)
-        elif data.startswith("reg_user_to"):
-            await self._process_registration(query, message)
-        elif data.startswith("buytickets"):
-            await self._show_payment_options(message, query.from_user)
-        elif data.startswith("menu"):
-            await self._show_main_menu(message)
-        elif data.startswith("send"):
-            await self._process_newsletter(data, message)
-
-    async def _process_registration_errors(self, query: CallbackQuery, _: Message):
-        match query.data:
-            case "reg_error_already_registrate":
-                await query.answer(Utils.CALLBACK_USER_ALREADY_REGISTRATE)
-            case "reg_error":
-                await query.answer(Utils.CALLBACK_USER_NOT_AVAILABLE)
-            case _:
-                await query.answer("Произошла неизвестная ошибка")
-
-    async def _process_registration(self, query: CallbackQuery, message: Message):
-        """Обработка регистрации на событие"""
-        to_datetime = datetime.datetime.strptime(
-            str(query.data).rsplit("_", maxsplit=1)[-1], Utils.DATE_FORMAT
-        ).date()
+    @callback("reg_full")
+    async def _answer_not_available(self, query: CallbackQuery):
+        """Кнопка события без свободных мест"""
+        await query.answer(Utils.CALLBACK_USER_NOT_AVAILABLE)
 
-        if self.db.check_registration_by_tgid(query.from_user.id, to_datetime, True):
+    @callback("reg", datetime.date)
+    async def _process_registration(
+        self, query: CallbackQuery, to_datetime: datetime.date
+    ):
+        """Обработка регистрации на событие"""
+        message = query.message
+        if await self.db.check_registration_by_tgid(
+            query.from_user.id, to_datetime, True
+        ):
             await query.answer(Utils.CALLBACK_USER_ALREADY_REGISTRATE)
             return
-        if self.db.check_registration_by_tgid(query.from_user.id, to_datetime, False):
-            self.db.delete_visitor(query.from_user.id, to_datetime)
+        if await self.db.check_registration_by_tgid(
+            query.from_user.id, to_datetime, False
+        ):
+            for hash_code in await self.db.delete_visitor(
+                query.from_user.id, to_datetime
+            ):
+                self.ticket_index.discard(hash_code)
             self.logger.info("Неактивный хеш уже существует! Удаление для пересоздания")
-        if self.db.is_event_full(to_datetime):
+        if await self.db.is_event_full(to_datetime):
             await query.answer("❌ Нет свободных мест!")
             return
+        hold_until = self.seat_holds.deadline()
         try:
-            hash_code = self.db.reg_new_visitor(
+            hash_code = await self.db.reg_new_visitor(
                 query.from_user.id,
                 datetime.datetime.combine(to_datetime, datetime.time()),
                 False,
+                hold_until,
             )
         except AttributeError:
             await query.answer(Utils.CALLBACK_USER_ALREADY_REGISTRATE)
             return
-        event = self.db.get_event(to_datetime)
+        except ValueError:
+            await query.answer("❌ Нет свободных мест!")
+            return
+        self.seat_holds.add(hash_code, hold_until)
+        event = await self.db.get_event(to_datetime)
         payment = await self.tb.init_payment(
             event.cost,
             f"{query.from_user.id}_{to_datetime}_{time.time()}",
@@ -368,77 +545,123 @@ class CustomClient(Client):
             ),
         )
 
-        if await self.tb.await_payment(payment["PaymentId"]):
+        await self.payment_tracker.track(
+            payment["PaymentId"],
+            hash_code,
+            query.from_user.id,
+            message.chat.id,
+            message.id,
+            to_datetime,
+        )
+
+    async def _fulfill_payment(self, payment: PendingPayment):
+        """Выдача билета после подтверждения оплаты (вызывается PaymentTracker)"""
+        hash_code = str(payment.hash_code)
+        try:
+            for i in range(5):
+                msg_id = int(payment.message_id) - i
+                try:
+                    await self.delete_messages(payment.chat_id, [msg_id])
+                except Exception as e:
+                    self.logger.error("Ошибка при удалении сообщения %s: %s", msg_id, e)
             try:
-                for i in range(5):
-                    msg_id = message.id - i
-                    try:
-                        await self.delete_messages(message.chat.id, [msg_id])
-                    except Exception as e:
-                        self.logger.error(f"Ошибка при удалении сообщения {msg_id}: {e}")
-                self.db.enable_visitor(hash_code=hash_code)
-            except MessageDeleteForbidden:
-                pass
+                await self.db.enable_visitor(hash_code=hash_code)
             except sqlite3.Error:
-                hash_code = self.db.enable_visitor(
-                    tg_id=query.from_user.id, to_datetime=to_datetime
+                hash_code = await self.db.enable_visitor(
+                    tg_id=payment.tg_id, to_datetime=payment.to_datetime
                 )
-            msg = await message.reply("Подождите, идёт генерация вашего куаркода")
-            qr_image = await Utils.gen_qr_code(
-                Utils.QR_URL(self.me.username if self.me else "", hash_code)
+        except MessageDeleteForbidden:
+            pass
+        except ValueError as e:
+            # Удержание истекло, и место заняли, пока шла оплата
+            raise RefundRequired(str(e)) from e
+        self.seat_holds.discard(hash_code)
+        self.ticket_index.add(hash_code, payment.to_datetime)
+        try:
+            msg = await self.send_message(
+                payment.chat_id, "Подождите, идёт генерация вашего куаркода"
             )
+            await self._send_ticket_qr(
+                payment.chat_id,
+                hash_code,
+                Utils.TRUE_PROMPT.format(payment.to_datetime, hash_code),
+            )
+            await msg.delete()
+        except Exception as e:
+            # Билет уже активен, пользователь получит QR через /getmyqr
+            self.logger.error("Ошибка отправки билета %s: %s", hash_code, e)
 
-            with io.BytesIO() as buffer:
-                qr_image.save(buffer, format="PNG")
-                buffer.seek(0)
-                await message.reply_photo(
-                    buffer, caption=Utils.TRUE_PROMPT.format(to_datetime, hash_code)
+    async def _refund_payment(self, payment: PendingPayment):
+        """Сообщает покупателю и администраторам о платеже к возврату"""
+        await self.seat_holds.release(str(payment.hash_code))
+        try:
+            await self.send_message(
+                payment.chat_id,
+                f"❌ Оплата получена, но выдать билет на {payment.to_datetime} "
+                "не удалось: места закончились. Деньги будут возвращены, "
+                "администраторы уже уведомлены.",
+            )
+        except Exception as e:
+            self.logger.error(
+                "Ошибка уведомления о возврате %s: %s", payment.payment_id, e
+            )
+        for admin_id in config.get().admin_ids:
+            try:
+                await self.send_message(
+                    admin_id,
+                    f"⚠️ **Требуется возврат** ⚠️\n\n"
+                    f"**Платеж:** `{payment.payment_id}`\n"
+                    f"**Покупатель:** `{payment.tg_id}`\n"
+                    f"**Событие:** `{payment.to_datetime}`",
                 )
-            await msg.delete()
-            return
-        else:
-            pass
+            except Exception as e:
+                self.logger.error("Ошибка отправки сообщения: %s", e)
 
-    async def _show_user_agreement(self, message: Message):
+    @callback("agreement")
+    async def _show_user_agreement(self, query: CallbackQuery):
         """Отображение пользовательского соглашения"""
-        await message.edit_text(
-            open(
-                "USER_AGREEMENT.txt", encoding="utf-8"
-            ).read(),  # Полный текст соглашения
+        await query.message.edit_text(
+            config.get().user_agreement,  # Полный текст соглашения
             reply_markup=ButtonsMenu.get_menu_markup(),
         )
 
-    async def _show_payment_options(self, message: Message, user: User):
+    @callback("buy")
+    async def _show_payment_options(self, query: CallbackQuery):
         """Отображение вариантов оплаты"""
-        markup = ButtonsMenu.get_buy_markup(user.id)
+        message = query.message
+        markup = await self.db.run(
+            ButtonsMenu.get_buy_markup, self.db.db, query.from_user.id
+        )
         if message.reply_markup != markup:
             await message.edit_reply_markup(markup)
         else:
             pass
 
-    async def _show_main_menu(self, message: Message):
+    @callback("menu")
+    async def _show_main_menu(self, query: CallbackQuery):
         """Отображение главного меню"""
-        await message.edit_text(
+        await query.message.edit_text(
             Utils.START_MESSAGE, reply_markup=ButtonsMenu.get_start_markup()
         )
 
-    async def _process_newsletter(self, data: str, message: Message):
+    @callback("send_cancel", admin=True)
+    async def _cancel_newsletter(self, query: CallbackQuery):
+        """Отмена рассылки из предпросмотра"""
+        self.messages.pop(str(query.from_user.id), None)
+        await query.message.delete()
+
+    @callback("send", int, admin=True)
+    async def _process_newsletter(self, query: CallbackQuery, author_id: int):
         """Обработка рассылки сообщений"""
-        user_id = data.split("_")[1]
-        if user_id == "cancel":
-            await message.delete()
+        message = query.message
+        # Текст хранится по автору рассылки, а не по получателю
+        text = self.messages.pop(str(author_id), None)
+        if text is None:
+            await message.edit_text("Текст рассылки не найден, повторите /sendall")
             return
-
-        users = [user.tg_id for user in self.db.get_all_users()]
-        progress = await message.reply(f"Рассылка для {len(users)} пользователей...")
-
-        for user_id in users:
-            try:
-                await self.send_message(
-                    str(user_id), str(self.messages.__getitem__(str(user_id)))
-                )
-            except Exception as e:
-                self.logger.error(f"Ошибка отправки для {user_id}: {e}")
-
-        await progress.edit_text(f"Рассылка завершена ({len(users)} пользователей)")
+        progress = await message.reply("Рассылка запущена...")
+        broadcast = await self.newsletter.start(
+            author_id, text, progress.chat.id, progress.id
+        )
+        await progress.edit_text(f"Рассылка для {broadcast.total} пользователей...")
         await message.delete()
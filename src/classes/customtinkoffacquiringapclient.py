@@ -1,10 +1,20 @@
 """Модуль кастомного класса клиента тинькоффа"""
 
 import asyncio
+import hashlib
+import hmac
+import logging
+import os
 import time
+from typing import Any, Callable, Optional
 
+import httpx
 from tinkoff_acquiring.client import TinkoffAcquiringAPIClient, TinkoffAPIException
 
+# Статусы, после которых платеж уже не будет подтвержден
+FAILED_STATES = ("REJECTED", "CANCELED", "DEADLINE_EXPIRED", "AUTH_FAIL")
+MAX_EARLY_NOTIFICATIONS = 10_000
+
 
 class CustomTinkoffAcquiringAPIClient(TinkoffAcquiringAPIClient):
     """Класс кастомного класса клиента тинькоффа"""
@@ -15,31 +25,178 @@ class CustomTinkoffAcquiringAPIClient(TinkoffAcquiringAPIClient):
             raise ValueError("terminal_key и secret не могут быть пустыми")
         super().__init__(terminal_key, secret)
         self.terminal_key: str | None
+        self.notification_url = os.getenv("PAYMENT_NOTIFICATION_URL")
+        # Без уведомлений опрос остается основным способом, с ними - запасным
+        self.poll_interval = float(
+            os.getenv("PAYMENT_POLL_INTERVAL", 60 if self.notification_url else 10)
+        )
+        self._waiters: dict[str, asyncio.Future[str]] = {}
+        # Подписчики на финальные статусы, например PaymentTracker
+        self.notification_handlers: list[Callable[[str, str], None]] = []
+        # Общий HTTP-клиент: базовый класс создает новый на каждый запрос,
+        # и загрузка сертификатов для TLS обходится в ~80 мс CPU
+        self._http: Optional[httpx.AsyncClient] = None
+
+    async def send_request(self, endpoint: str, params: dict[str, Any]) -> Any:
+        """Запрос к API через общий HTTP-клиент
+
+        Добавляет NotificationURL в Init, если приемник уведомлений настроен.
+        """
+        if endpoint == "Init" and self.notification_url:
+            params["NotificationURL"] = self.notification_url
+        if self._http is None:
+            self._http = httpx.AsyncClient()
+        params["TerminalKey"] = self.terminal_key
+        params["Token"] = self.generate_token(params)
+        response = await self._http.post(self.API_ENDPOINT + endpoint, json=params)
+        response_data = response.json()
+        self.logger.info("Response data: %s", response_data)
+        if response.status_code != 200 or not response_data.get("Success"):
+            error_message = response_data.get("Message", "Unknown error")
+            self.logger.error("API request failed: %s", error_message)
+            raise TinkoffAPIException(error_message)
+        return response_data
+
+    async def close(self) -> None:
+        """Закрывает соединения HTTP-клиента"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    @staticmethod
+    def sign(params: dict[str, Any], secret: str) -> str:
+        """Подпись по правилам эквайринга: скалярные поля, сортировка по ключу"""
+        values = {
+            key: value
+            for key, value in params.items()
+            if key != "Token" and not isinstance(value, (dict, list))
+        }
+        values["Password"] = secret
+        token_str = "".join(
+            str(value).lower() if isinstance(value, bool) else str(value)
+            for _, value in sorted(values.items())
+        )
+        return hashlib.sha256(token_str.encode("utf-8")).hexdigest()
+
+    def verify_notification(self, data: dict[str, Any]) -> bool:
+        """Проверяет терминал и подпись уведомления"""
+        token = data.get("Token")
+        if not isinstance(token, str) or data.get("TerminalKey") != self.terminal_key:
+            return False
+        return hmac.compare_digest(token, self.sign(data, str(self.secret)))
+
+    def notify(self, payment_id: str | int, state: str) -> None:
+        """Будит ожидающий await_payment при финальном статусе платежа"""
+        if state != "CONFIRMED" and state not in FAILED_STATES:
+            return
+        for handler in self.notification_handlers:
+            handler(str(payment_id), state)
+        waiter = self._waiters.get(str(payment_id))
+        if (
+            waiter is None
+            and not self.notification_handlers
+            and len(self._waiters) < MAX_EARLY_NOTIFICATIONS
+        ):
+            # Уведомление может прийти раньше, чем начнется await_payment
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters[str(payment_id)] = waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(state)
 
     async def await_payment(self, order_id: str, timeout: float = 240.0) -> bool:
         """
-        Ждем подтверждения оплаты в течение заданного времени (timeout, по умолчанию 60 секунд).
+        Ждем подтверждения оплаты в течение заданного времени (timeout, по умолчанию 240 секунд).
+        Уведомление эквайринга будит ожидание сразу, а опрос get_payment_state
+        раз в poll_interval секунд остается запасным вариантом.
         Возвращает True если оплата подтверждена, иначе False.
         Завершает цикл, если бот выключается.
         """
         state = ""
         start = time.monotonic()
+        waiter = self._waiters.setdefault(
+            str(order_id), asyncio.get_running_loop().create_future()
+        )
 
-        while time.monotonic() - start < timeout:
-            try:
-                result = await self.get_payment_state(order_id)
-                state = result["Status"]
-                if state:
-                    if state == "CONFIRMED":
-                        return True
-                    if state == "FORM_SHOWED":
-                        timeout += 5
-                    if state == "REJECTED":
-                        return False
-            except TinkoffAPIException:
-                pass
-            except asyncio.CancelledError:
-                break
-
-            await asyncio.sleep(10)
+        try:
+            while time.monotonic() - start < timeout:
+                try:
+                    state = await asyncio.wait_for(
+                        asyncio.shield(waiter), self.poll_interval
+                    )
+                except asyncio.TimeoutError:
+                    try:
+                        result = await self.get_payment_state(order_id)
+                        state = result["Status"]
+                    except TinkoffAPIException:
+                        state = ""
+                if state == "CONFIRMED":
+                    return True
+                if state == "FORM_SHOWED":
+                    timeout += 5
+                if state in FAILED_STATES:
+                    return False
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._waiters.pop(str(order_id), None)
         return False
+
+
+class PaymentNotificationServer:
+    """Встроенный HTTP-приемник уведомлений эквайринга (NotificationURL)"""
+
+    def __init__(
+        self,
+        tb: CustomTinkoffAcquiringAPIClient,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        path: Optional[str] = None,
+    ):
+        self.tb = tb
+        self.host = host or os.getenv("PAYMENT_NOTIFICATION_HOST", "127.0.0.1")
+        self.port = port if port is not None else int(
+            os.getenv("PAYMENT_NOTIFICATION_PORT", 8080)
+        )
+        self.path = path or os.getenv(
+            "PAYMENT_NOTIFICATION_PATH", "/tinkoff/notification"
+        )
+        self.logger = logging.getLogger("payments")
+        self._runner: Optional[Any] = None
+
+    async def start(self) -> int:
+        """Запускает приемник и возвращает фактический порт"""
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        self.logger.info(
+            "Приемник уведомлений: %s:%s%s", self.host, self.port, self.path
+        )
+        return self.port
+
+    async def stop(self) -> None:
+        """Останавливает приемник"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def handle(self, request: Any) -> Any:
+        """Проверяет подпись уведомления и передает статус ожидающим"""
+        from aiohttp import web
+
+        try:
+            data = await request.json()
+        except ValueError:
+            return web.Response(status=400, text="BAD REQUEST")
+        if not isinstance(data, dict) or not self.tb.verify_notification(data):
+            self.logger.warning("Отклонено уведомление с неверной подписью")
+            return web.Response(status=403, text="FORBIDDEN")
+
+        self.tb.notify(data.get("PaymentId", ""), str(data.get("Status", "")))
+        # Эквайринг ждет ровно "OK", иначе повторяет уведомление
+        return web.Response(text="OK")
@@ -0,0 +1,229 @@
+"""Модуль рассылки сообщений всем пользователям"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Optional
+
+from pyrogram.errors import BadRequest, FloodWait, Forbidden
+
+from src.classes.database import AsyncDatabase, Broadcast
+from src.metrics import metrics
+
+
+class TokenBucket:
+    """Ограничитель частоты «корзина токенов»
+
+    Токены пополняются со скоростью rate в секунду до capacity, каждый
+    вызов acquire() забирает один токен. pause() останавливает выдачу для
+    всех ожидающих, например на время FloodWait.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        """Запрещает выдачу токенов на seconds секунд"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.updated = self.paused_until
+        self.tokens = 0
+
+    async def acquire(self) -> None:
+        """Дожидается и забирает один токен"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class Newsletter:
+    """Движок рассылок с ограничением параллельности и частоты
+
+    Получатели обходятся по возрастанию User.id, в базе хранится курсор -
+    все пользователи до него уже обработаны. Прерванная рассылка
+    продолжается с курсора при следующем запуске бота.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        db: AsyncDatabase,
+        concurrency: Optional[int] = None,
+        rate: Optional[float] = None,
+        progress_interval: Optional[float] = None,
+    ):
+        self.logger = logging.getLogger("newsletter")
+        self.client = client
+        self.db = db
+        self.concurrency = concurrency or int(
+            os.getenv("NEWSLETTER_CONCURRENCY", 10)
+        )
+        # Telegram допускает около 30 сообщений в секунду от бота
+        self.rate = rate or float(os.getenv("NEWSLETTER_RATE", 25))
+        self.progress_interval = progress_interval or float(
+            os.getenv("NEWSLETTER_PROGRESS_INTERVAL", 5)
+        )
+        self.max_retries = int(os.getenv("NEWSLETTER_MAX_RETRIES", 3))
+        self.page_size = 500
+        # Небольшая корзина, чтобы старт рассылки не превышал лимит всплеском
+        self.bucket = TokenBucket(self.rate, self.concurrency)
+        self._tasks: dict[int, asyncio.Task] = {}
+
+    async def start(
+        self, author_id: int, text: str, chat_id: int, message_id: int
+    ) -> Broadcast:
+        """Создает рассылку и запускает ее в фоне"""
+        broadcast = await self.db.create_broadcast(author_id, text, chat_id, message_id)
+        self._spawn(broadcast)
+        return broadcast
+
+    async def resume(self) -> None:
+        """Продолжает рассылки, прерванные остановкой бота"""
+        for broadcast in await self.db.get_unfinished_broadcasts():
+            if broadcast.id not in self._tasks:
+                self.logger.info(
+                    "Продолжение рассылки %s после пользователя %s",
+                    broadcast.id,
+                    broadcast.cursor,
+                )
+                self._spawn(broadcast)
+
+    async def stop(self) -> None:
+        """Останавливает рассылки, сохраняя контрольные точки"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def wait(self) -> None:
+        """Дожидается окончания всех запущенных рассылок"""
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    def _spawn(self, broadcast: Broadcast) -> None:
+        broadcast_id = int(broadcast.id)
+        task = asyncio.create_task(self._run(broadcast))
+        self._tasks[broadcast_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(broadcast_id, None))
+
+    async def _run(self, broadcast: Broadcast) -> None:
+        broadcast_id = int(broadcast.id)
+        text = str(broadcast.text)
+        total = int(broadcast.total)
+        state = {
+            "cursor": int(broadcast.cursor),
+            "sent": int(broadcast.sent),
+            "failed": int(broadcast.failed),
+        }
+        # Выданные воркерам id в порядке выдачи и уже обработанные из них
+        issued: deque[int] = deque()
+        finished: set[int] = set()
+        queue: asyncio.Queue[tuple[int, str]] = asyncio.Queue(self.concurrency * 2)
+
+        async def worker():
+            while True:
+                user_id, tg_id = await queue.get()
+                try:
+                    ok = await self._send(tg_id, text)
+                    state["sent" if ok else "failed"] += 1
+                    metrics.inc(
+                        "newsletter_messages_total", result="sent" if ok else "failed"
+                    )
+                    finished.add(user_id)
+                    while issued and issued[0] in finished:
+                        finished.discard(issued[0])
+                        state["cursor"] = issued.popleft()
+                finally:
+                    queue.task_done()
+
+        async def save(is_done: bool = False):
+            await self.db.save_broadcast_progress(
+                broadcast_id, state["cursor"], state["sent"], state["failed"], is_done
+            )
+
+        async def report():
+            while True:
+                await asyncio.sleep(self.progress_interval)
+                await save()
+                await self._edit_progress(
+                    broadcast,
+                    f"Рассылка: {state['sent'] + state['failed']} из {total}, "
+                    f"ошибок {state['failed']}",
+                )
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        reporter = asyncio.create_task(report())
+        try:
+            cursor = state["cursor"]
+            while page := await self.db.get_users_after(
+                cursor, int(broadcast.last_user_id), self.page_size
+            ):
+                for user_id, tg_id in page:
+                    issued.append(user_id)
+                    await queue.put((user_id, tg_id))
+                cursor = page[-1][0]
+            await queue.join()
+        except asyncio.CancelledError:
+            await save()
+            raise
+        finally:
+            for task in (*workers, reporter):
+                task.cancel()
+            await asyncio.gather(*workers, reporter, return_exceptions=True)
+
+        await save(is_done=True)
+        self.logger.info(
+            "Рассылка %s завершена: отправлено %s, ошибок %s",
+            broadcast_id,
+            state["sent"],
+            state["failed"],
+        )
+        await self._edit_progress(
+            broadcast,
+            f"Рассылка завершена ({state['sent']} из {total} пользователей, "
+            f"ошибок {state['failed']})",
+        )
+
+    async def _send(self, tg_id: str, text: str) -> bool:
+        """Отправляет одно сообщение, повторяя его после FloodWait"""
+        for _ in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            try:
+                await self.client.send_message(str(tg_id), text)
+                return True
+            except FloodWait as e:
+                wait = float(e.value) if isinstance(e.value, (int, str)) else 1.0
+                self.logger.warning("FloodWait %s с, рассылка приостановлена", wait)
+                self.bucket.pause(wait)
+            except (BadRequest, Forbidden) as e:
+                # Бот заблокирован, аккаунт удален и т.п. - повтор не поможет
+                self.logger.info("Пользователь %s недоступен: %s", tg_id, e)
+                return False
+            except Exception as e:
+                self.logger.error("Ошибка отправки для %s: %s", tg_id, e)
+                return False
+        return False
+
+    async def _edit_progress(self, broadcast: Broadcast, text: str) -> None:
+        try:
+            await self.client.edit_message_text(
+                broadcast.chat_id, broadcast.message_id, text
+            )
+        except Exception as e:
+            self.logger.debug("Не удалось обновить прогресс рассылки: %s", e)
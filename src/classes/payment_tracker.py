@@ -0,0 +1,293 @@
+"""Модуль фонового отслеживания платежей"""
+
+import asyncio
+import heapq
+import logging
+import os
+import random
+import time
+from datetime import date, datetime
+from typing import Any, Awaitable, Callable, Optional
+
+from src.classes.customtinkoffacquiringapclient import (
+    FAILED_STATES,
+    MAX_EARLY_NOTIFICATIONS,
+    CustomTinkoffAcquiringAPIClient,
+)
+from src.classes.database import AsyncDatabase, PendingPayment
+from src.metrics import metrics
+
+
+class RefundRequired(Exception):
+    """Оплата прошла, но билет выдать нельзя - платеж нужно вернуть"""
+
+
+class PaymentTracker:
+    """Единый фоновый трекер ожидающих оплаты платежей
+
+    Обработчик колбэка только сохраняет платеж через track() и сразу
+    освобождает воркер pyrogram. Трекер держит очередь проверок по времени,
+    опрашивает GetState с ограниченной параллельностью и растущим
+    интервалом, а уведомления эквайринга ставят платеж в начало очереди.
+    Ожидающие платежи хранятся в базе и подхватываются после перезапуска.
+    on_cancelled вызывается для неуспешных и истекших платежей,
+    on_extended - при каждом продлении ожидания, пока покупатель на форме
+    оплаты. Если on_confirmed бросает RefundRequired или выдача билета не
+    удается confirm_attempts раз либо дольше confirm_ttl, платеж
+    помечается к возврату и передается в on_refund.
+    """
+
+    def __init__(
+        self,
+        db: AsyncDatabase,
+        tb: CustomTinkoffAcquiringAPIClient,
+        on_confirmed: Callable[[PendingPayment], Awaitable[None]],
+        concurrency: Optional[int] = None,
+        min_interval: Optional[float] = None,
+        max_interval: Optional[float] = None,
+        ttl: Optional[float] = None,
+        on_cancelled: Optional[Callable[[PendingPayment], Awaitable[Any]]] = None,
+        on_extended: Optional[Callable[[PendingPayment], Awaitable[Any]]] = None,
+        on_refund: Optional[Callable[[PendingPayment], Awaitable[Any]]] = None,
+        confirm_attempts: Optional[int] = None,
+        confirm_ttl: Optional[float] = None,
+    ):
+        self.logger = logging.getLogger("payments")
+        self.db = db
+        self.tb = tb
+        self.on_confirmed = on_confirmed
+        self.on_cancelled = on_cancelled
+        self.on_extended = on_extended
+        self.on_refund = on_refund
+        self.concurrency = concurrency or int(
+            os.getenv("PAYMENT_TRACKER_CONCURRENCY", 5)
+        )
+        self.min_interval = min_interval or float(
+            os.getenv("PAYMENT_TRACKER_MIN_INTERVAL", 5)
+        )
+        self.max_interval = max_interval or float(
+            os.getenv("PAYMENT_TRACKER_MAX_INTERVAL", tb.poll_interval)
+        )
+        # Сколько ждать оплату с момента создания платежа
+        self.ttl = ttl or float(os.getenv("PAYMENT_TRACKER_TTL", 240))
+        # Сколько раз и как долго повторять выдачу билета по оплаченному платежу
+        self.confirm_attempts = confirm_attempts or int(
+            os.getenv("PAYMENT_TRACKER_CONFIRM_ATTEMPTS", 10)
+        )
+        self.confirm_ttl = confirm_ttl or float(
+            os.getenv("PAYMENT_TRACKER_CONFIRM_TTL", 3600)
+        )
+        self.checks = 0
+        self._pending: dict[str, PendingPayment] = {}
+        self._deadlines: dict[str, float] = {}
+        self._attempts: dict[str, int] = {}
+        self._due: dict[str, float] = {}
+        self._states: dict[str, str] = {}
+        self._confirm_failures: dict[str, int] = {}
+        self._confirm_deadlines: dict[str, float] = {}
+        self._heap: list[tuple[float, str]] = []
+        self._inflight: set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._task: Optional[asyncio.Task] = None
+        metrics.gauge("payments_pending", lambda: len(self._pending))
+
+    async def start(self) -> None:
+        """Загружает сохраненные платежи и запускает цикл проверок"""
+        if self._task is not None:
+            return
+        self.tb.notification_handlers.append(self._on_notification)
+        for payment in await self.db.get_pending_payments():
+            # Разносим проверки, чтобы не опрашивать все платежи разом
+            self._add(payment, random.uniform(0, self.min_interval))
+        if self._pending:
+            self.logger.info("Восстановлено ожидающих платежей: %s", len(self._pending))
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает цикл, платежи остаются в базе до следующего запуска"""
+        if self._on_notification in self.tb.notification_handlers:
+            self.tb.notification_handlers.remove(self._on_notification)
+        tasks = [*self._inflight, *([self._task] if self._task else [])]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    async def track(
+        self,
+        payment_id: str | int,
+        hash_code: str,
+        tg_id: int,
+        chat_id: int,
+        message_id: int,
+        to_datetime: date,
+    ) -> None:
+        """Сохраняет платеж и ставит его в очередь проверок"""
+        await self.db.add_pending_payment(
+            payment_id, hash_code, tg_id, chat_id, message_id, to_datetime
+        )
+        payment = PendingPayment(
+            payment_id=str(payment_id),
+            hash_code=hash_code,
+            tg_id=tg_id,
+            chat_id=chat_id,
+            message_id=message_id,
+            to_datetime=to_datetime,
+            created_at=datetime.now(),
+        )
+        # Уведомление могло прийти раньше, чем платеж был сохранен
+        delay = 0 if str(payment_id) in self._states else self.min_interval
+        self._add(payment, delay * random.uniform(1, 1.2))
+
+    def _add(self, payment: PendingPayment, delay: float) -> None:
+        payment_id = str(payment.payment_id)
+        created = payment.created_at.timestamp() if payment.created_at else time.time()
+        self._pending[payment_id] = payment
+        self._deadlines[payment_id] = created + self.ttl
+        self._attempts.setdefault(payment_id, 0)
+        self._schedule(payment_id, delay)
+
+    def _schedule(self, payment_id: str, delay: float) -> None:
+        due = time.monotonic() + delay
+        self._due[payment_id] = due
+        heapq.heappush(self._heap, (due, payment_id))
+        self._wakeup.set()
+
+    def _on_notification(self, payment_id: str, state: str) -> None:
+        """Подписчик на уведомления эквайринга"""
+        if len(self._states) >= MAX_EARLY_NOTIFICATIONS:
+            self._states.pop(next(iter(self._states)))
+        self._states[payment_id] = state
+        if payment_id in self._pending and payment_id in self._due:
+            self._schedule(payment_id, 0)
+
+    def _backoff(self, payment_id: str) -> float:
+        self._attempts[payment_id] += 1
+        interval = self.min_interval * 1.5 ** self._attempts[payment_id]
+        return min(interval, self.max_interval) * random.uniform(0.9, 1.1)
+
+    async def _run(self) -> None:
+        while True:
+            now = time.monotonic()
+            while self._heap and self._heap[0][0] <= now:
+                due, payment_id = heapq.heappop(self._heap)
+                # Устаревшие записи остаются в куче после переноса проверки
+                if self._due.get(payment_id) != due:
+                    continue
+                del self._due[payment_id]
+                task = asyncio.create_task(self._check(payment_id))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+            self._wakeup.clear()
+            timer = None
+            if self._heap:
+                timer = asyncio.get_running_loop().call_later(
+                    self._heap[0][0] - now, self._wakeup.set
+                )
+            try:
+                await self._wakeup.wait()
+            finally:
+                if timer is not None:
+                    timer.cancel()
+
+    async def _check(self, payment_id: str) -> None:
+        async with self._semaphore:
+            state = self._states.pop(payment_id, None)
+            if state is None:
+                self.checks += 1
+                metrics.inc("payment_state_checks_total")
+                try:
+                    state = (await self.tb.get_payment_state(payment_id))["Status"]
+                except Exception as e:
+                    self.logger.warning(
+                        "Ошибка проверки платежа %s: %s", payment_id, e
+                    )
+                    state = ""
+
+        if state == "CONFIRMED":
+            await self._confirm(payment_id)
+        elif state in FAILED_STATES:
+            self.logger.info("Платеж %s не прошел: %s", payment_id, state)
+            await self._cancel(payment_id, "failed")
+        elif time.time() > self._deadlines[payment_id] and state != "FORM_SHOWED":
+            self.logger.info("Истекло время ожидания платежа %s", payment_id)
+            await self._cancel(payment_id, "expired")
+        else:
+            if state == "FORM_SHOWED":
+                # Покупатель на форме оплаты - продлеваем ожидание
+                self._deadlines[payment_id] = max(
+                    self._deadlines[payment_id], time.time() + self.min_interval
+                )
+                await self._notify(self.on_extended, payment_id)
+            # Уведомление могло прийти во время проверки
+            delay = 0 if payment_id in self._states else self._backoff(payment_id)
+            self._schedule(payment_id, delay)
+
+    async def _confirm(self, payment_id: str) -> None:
+        try:
+            await self.on_confirmed(self._pending[payment_id])
+        except RefundRequired as e:
+            self.logger.error("Билет по платежу %s не выдан: %s", payment_id, e)
+            await self._refund(payment_id)
+            return
+        except Exception as e:
+            self.logger.error("Ошибка выдачи билета по платежу %s: %s", payment_id, e)
+            failures = self._confirm_failures.get(payment_id, 0) + 1
+            self._confirm_failures[payment_id] = failures
+            deadline = self._confirm_deadlines.setdefault(
+                payment_id, time.time() + self.confirm_ttl
+            )
+            if failures >= self.confirm_attempts or time.time() > deadline:
+                await self._refund(payment_id)
+                return
+            # Оплата уже подтверждена, повторяем только выдачу
+            self._states[payment_id] = "CONFIRMED"
+            self._schedule(payment_id, self._backoff(payment_id))
+            return
+        self.logger.info("Платеж %s подтвержден", payment_id)
+        await self._forget(payment_id, "confirmed")
+
+    async def _refund(self, payment_id: str) -> None:
+        """Прекращает выдачу билета и оставляет платеж в базе к возврату"""
+        self.logger.error("Платеж %s помечен к возврату", payment_id)
+        await self.db.mark_payment_for_refund(payment_id)
+        await self._notify(self.on_refund, payment_id)
+        await self._forget(payment_id, "refund", keep=True)
+
+    async def _cancel(self, payment_id: str, result: str) -> None:
+        await self._notify(self.on_cancelled, payment_id)
+        await self._forget(payment_id, result)
+
+    async def _notify(
+        self,
+        handler: Optional[Callable[[PendingPayment], Awaitable[Any]]],
+        payment_id: str,
+    ) -> None:
+        if handler is None:
+            return
+        try:
+            await handler(self._pending[payment_id])
+        except Exception as e:
+            self.logger.error("Ошибка обработки платежа %s: %s", payment_id, e)
+
+    async def _forget(self, payment_id: str, result: str, keep: bool = False) -> None:
+        payment = self._pending.get(payment_id)
+        if payment is not None and payment.created_at:
+            metrics.observe(
+                "payment_wait_seconds",
+                time.time() - payment.created_at.timestamp(),
+                result=result,
+            )
+        metrics.inc("payments_total", result=result)
+        for pending in (
+            self._pending,
+            self._deadlines,
+            self._attempts,
+            self._states,
+            self._confirm_failures,
+            self._confirm_deadlines,
+        ):
+            pending.pop(payment_id, None)
+        if not keep:
+            await self.db.remove_pending_payment(payment_id)
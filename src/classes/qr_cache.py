@@ -0,0 +1,174 @@
+"""Модуль кеша готовых QR-кодов"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Hashable, Optional
+
+
+class QRCache:
+    """Кеш PNG-изображений QR-кодов с адресацией по содержимому
+
+    Ключ включает данные, стиль и все параметры генерации, поэтому
+    одинаковые билеты не рендерятся повторно. Память ограничена суммарным
+    размером PNG (вытесняются давно неиспользованные), опционально
+    изображения дублируются на диск и переживают перезапуск. Диск
+    ограничен max_disk_bytes: при превышении удаляются файлы, которые
+    дольше всех не читались (чтение обновляет mtime).
+    """
+
+    def __init__(
+        self,
+        max_bytes: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        max_disk_bytes: Optional[int] = None,
+    ):
+        self.logger = logging.getLogger("qr_cache")
+        self.max_bytes = max_bytes or int(
+            os.getenv("QR_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+        )
+        self.max_disk_bytes = max_disk_bytes or int(
+            os.getenv("QR_CACHE_DISK_MAX_BYTES", 512 * 1024 * 1024)
+        )
+        cache_dir = cache_dir or os.getenv("QR_CACHE_DIR")
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.disk_size = 0
+        self._disk_lock = threading.Lock()
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self.disk_size = sum(
+                path.stat().st_size for path in self.cache_dir.glob("*.png")
+            )
+        self._items: OrderedDict[str, bytes] = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(key: Hashable) -> str:
+        """Хеш содержимого ключа, используется и как имя файла на диске"""
+        return hashlib.sha256(repr(key).encode()).hexdigest()
+
+    async def get(self, key: Hashable) -> Optional[bytes]:
+        """Возвращает PNG из памяти или с диска, если он есть"""
+        digest = self.make_key(key)
+        if (png := self._items.get(digest)) is not None:
+            self._items.move_to_end(digest)
+            self.hits += 1
+            return png
+
+        if self.cache_dir and (png := await asyncio.to_thread(self._read, digest)):
+            self.disk_hits += 1
+            self._remember(digest, png)
+            return png
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: Hashable, png: bytes) -> None:
+        """Сохраняет PNG в память и, если включено, на диск"""
+        digest = self.make_key(key)
+        self._remember(digest, png)
+        if self.cache_dir:
+            await asyncio.to_thread(self._write, digest, png)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Удаляет запись из всех уровней кеша"""
+        digest = self.make_key(key)
+        if (png := self._items.pop(digest, None)) is not None:
+            self.size -= len(png)
+        if self.cache_dir:
+            path = self.cache_dir / f"{digest}.png"
+            with self._disk_lock:
+                try:
+                    file_size = path.stat().st_size
+                    path.unlink()
+                except FileNotFoundError:
+                    return
+                # Файл мог записать другой процесс, счетчик не уходит в минус
+                self.disk_size = max(self.disk_size - file_size, 0)
+
+    def stats(self) -> dict[str, Any]:
+        """Счетчики попаданий и промахов"""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "items": len(self._items),
+            "bytes": self.size,
+            "disk_bytes": self.disk_size,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+    def _remember(self, digest: str, png: bytes) -> None:
+        """Кладет запись в память, вытесняя старые при превышении лимита"""
+        if len(png) > self.max_bytes:
+            return
+        if (old := self._items.pop(digest, None)) is not None:
+            self.size -= len(old)
+        self._items[digest] = png
+        self.size += len(png)
+        while self.size > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.size -= len(evicted)
+
+    def _read(self, digest: str) -> Optional[bytes]:
+        path = self.cache_dir / f"{digest}.png" if self.cache_dir else None
+        try:
+            if path is None:
+                return None
+            png = path.read_bytes()
+            # mtime - время последнего использования для вытеснения
+            os.utime(path)
+            return png
+        except FileNotFoundError:
+            return None
+
+    def _write(self, digest: str, png: bytes) -> None:
+        if not self.cache_dir:
+            return
+        # У каждого писателя свой временный файл, rename атомарен
+        tmp = tempfile.NamedTemporaryFile(
+            dir=self.cache_dir, prefix=f"{digest}.", suffix=".tmp", delete=False
+        )
+        try:
+            with tmp:
+                tmp.write(png)
+            os.replace(tmp.name, self.cache_dir / f"{digest}.png")
+        except BaseException:
+            Path(tmp.name).unlink(missing_ok=True)
+            raise
+        with self._disk_lock:
+            self.disk_size += len(png)
+            if self.disk_size > self.max_disk_bytes:
+                self._evict_disk(self.cache_dir)
+
+    def _evict_disk(self, cache_dir: Path) -> None:
+        """Удаляет давно не читанные файлы, пока кеш не станет меньше 90% лимита
+
+        Размер пересчитывается по каталогу: учтенный в disk_size размер
+        не знает о перезаписях и файлах других процессов.
+        """
+        files = []
+        for path in cache_dir.glob("*.png"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        size = sum(file_size for _, file_size, _ in files)
+        target = self.max_disk_bytes * 0.9
+        for _, file_size, path in files:
+            if size <= target:
+                break
+            path.unlink(missing_ok=True)
+            size -= file_size
+        self.disk_size = size
@@ -0,0 +1,123 @@
+"""Модуль долгоживущего пула рендеринга QR-кодов"""
+
+import asyncio
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from src.metrics import metrics
+from src.utils import Utils
+
+
+class QRRenderer:
+    """Пул процессов для генерации QR-кодов
+
+    Создается один раз при старте клиента. Каждый воркер при запуске
+    импортирует PIL/qrcode и декодирует маску. Чтобы не копить память,
+    после max_tasks_per_child задач на воркер пул заменяется новым: старый
+    дорабатывает выданные задачи и завершается. Параметр
+    max_tasks_per_child самого ProcessPoolExecutor не используется - в
+    Python 3.11 пул зависает, когда воркер выходит под нагрузкой.
+    """
+
+    def __init__(
+        self, workers: Optional[int] = None, max_tasks_per_child: Optional[int] = None
+    ):
+        self.logger = logging.getLogger("qr_renderer")
+        self.workers = workers or int(
+            os.getenv("generation_workers", os.cpu_count() or 1)
+        )
+        self.max_tasks_per_child = max_tasks_per_child or int(
+            os.getenv("generation_max_tasks", 500)
+        )
+        self.chunk_size = int(os.getenv("generation_chunk_size", 4))
+        self.executor: Optional[ProcessPoolExecutor] = None
+        # Задачи, отправленные в текущий пул
+        self.submitted = 0
+        # Изображения, отправленные в пул и еще не готовые
+        self.pending = 0
+        metrics.gauge("qr_queue_depth", lambda: self.pending)
+
+    async def start(self) -> None:
+        """Запускает воркеры и дожидается их инициализации"""
+        if self.executor is not None:
+            return
+        self.logger.info("Запуск пула рендеринга QR: %s воркеров", self.workers)
+        self.executor = self._create_executor()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *(
+                loop.run_in_executor(self.executor, os.getpid)
+                for _ in range(self.workers)
+            )
+        )
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        self.submitted = 0
+        return ProcessPoolExecutor(
+            max_workers=self.workers, initializer=Utils.init_qr_worker
+        )
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Текущий пул с учетом задачи; исчерпанный пул заменяется новым"""
+        if self.executor is None:
+            raise RuntimeError("Пул рендеринга QR не запущен")
+        if self.submitted >= self.max_tasks_per_child * self.workers:
+            self.logger.info("Перезапуск пула рендеринга QR")
+            retired, self.executor = self.executor, self._create_executor()
+            retired.shutdown(wait=False)
+        self.submitted += 1
+        return self.executor
+
+    async def render(self, data: str | list[str], style: Optional[str] = None) -> bytes:
+        """Генерирует PNG QR-кода в одном из воркеров"""
+        executor = self._get_executor()
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        try:
+            with metrics.timer("qr_render_seconds", kind="single"):
+                return await loop.run_in_executor(
+                    executor, Utils.render_qr_png, data, style
+                )
+        finally:
+            self.pending -= 1
+
+    async def render_many(
+        self, payloads: list[str | list[str]], style: Optional[str] = None
+    ) -> list[bytes]:
+        """Генерирует пачку PNG, распределяя её по воркерам частями
+
+        Размер части не больше chunk_size и подбирается так, чтобы
+        загрузить все воркеры.
+        """
+        if self.executor is None:
+            raise RuntimeError("Пул рендеринга QR не запущен")
+        if not payloads:
+            return []
+        size = max(1, min(self.chunk_size, math.ceil(len(payloads) / self.workers)))
+        loop = asyncio.get_running_loop()
+        self.pending += len(payloads)
+        try:
+            with metrics.timer("qr_render_seconds", kind="batch"):
+                chunks = await asyncio.gather(
+                    *(
+                        loop.run_in_executor(
+                            self._get_executor(),
+                            Utils.render_qr_pngs,
+                            payloads[i : i + size],
+                            style,
+                        )
+                        for i in range(0, len(payloads), size)
+                    )
+                )
+        finally:
+            self.pending -= len(payloads)
+        return [png for chunk in chunks for png in chunk]
+
+    def close(self) -> None:
+        """Останавливает воркеры, отменяя ожидающие задачи"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,140 @@
+"""Модуль удержания мест на время оплаты"""
+
+import asyncio
+import heapq
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from src.classes.database import AsyncDatabase
+from src.metrics import metrics
+
+
+class SeatHolds:
+    """Планировщик истечения удержаний мест
+
+    Неоплаченная запись (reg_new_visitor с is_active=False) занимает место
+    до hold_expires_at. Сроки лежат в куче, цикл просыпается к ближайшему
+    и одним запросом освобождает все истекшие удержания
+    (Database.release_expired_holds), поэтому при распродаже брошенные
+    места возвращаются в продажу через секунды. Источник истины - база:
+    раз в sweep_interval освобождаются и удержания других процессов.
+    Срок не короче min_ttl (ожидания оплаты в PaymentTracker), а записи
+    с ожидающим платежом по истечении не освобождаются вовсе.
+    """
+
+    def __init__(
+        self,
+        db: AsyncDatabase,
+        ttl: Optional[float] = None,
+        sweep_interval: Optional[float] = None,
+        min_ttl: float = 0,
+    ):
+        self.logger = logging.getLogger("seat_holds")
+        self.db = db
+        self.ttl = max(ttl or float(os.getenv("SEAT_HOLD_TTL", 300)), min_ttl)
+        self.sweep_interval = sweep_interval or float(
+            os.getenv("SEAT_HOLD_SWEEP_INTERVAL", 60)
+        )
+        self._due: dict[str, float] = {}
+        self._heap: list[tuple[float, str]] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        metrics.gauge("seat_holds", lambda: len(self._due))
+
+    async def start(self) -> None:
+        """Загружает действующие удержания и запускает цикл"""
+        if self._task is not None:
+            return
+        untimed = []
+        for hash_code, expires_at in await self.db.get_seat_holds():
+            if expires_at is None:
+                untimed.append(hash_code)
+            else:
+                self._schedule(hash_code, expires_at.timestamp())
+        # Записи без срока (созданные в обход SeatHolds) получают обычный срок
+        for hash_code in untimed:
+            await self.extend(hash_code)
+        if self._due:
+            self.logger.info("Восстановлено удержаний мест: %s", len(self._due))
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает цикл, сроки остаются в базе"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def deadline(self) -> datetime:
+        """Срок удержания для новой записи"""
+        return datetime.now() + timedelta(seconds=self.ttl)
+
+    def add(self, hash_code: str, expires_at: datetime) -> None:
+        """Ставит в очередь удержание, уже записанное в базу"""
+        self._schedule(hash_code, expires_at.timestamp())
+
+    async def extend(self, hash_code: str) -> bool:
+        """Продлевает удержание на ttl от текущего момента
+
+        Возвращает False, если место уже освобождено.
+        """
+        expires_at = self.deadline()
+        if not await self.db.extend_seat_hold(hash_code, expires_at):
+            return False
+        self._schedule(hash_code, expires_at.timestamp())
+        return True
+
+    async def release(self, hash_code: str) -> None:
+        """Сразу освобождает место (платеж отменен или истек)"""
+        self.discard(hash_code)
+        if await self.db.release_seat_holds([hash_code]):
+            metrics.inc("seat_holds_released_total", reason="cancelled")
+
+    def discard(self, hash_code: str) -> None:
+        """Убирает удержание из очереди (запись оплачена или удалена)"""
+        self._due.pop(hash_code, None)
+
+    def _schedule(self, hash_code: str, due: float) -> None:
+        self._due[hash_code] = due
+        heapq.heappush(self._heap, (due, hash_code))
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        next_sweep = time.time() + self.sweep_interval
+        while True:
+            now = time.time()
+            expired = False
+            while self._heap and self._heap[0][0] <= now:
+                due, hash_code = heapq.heappop(self._heap)
+                # Устаревшие записи остаются в куче после продления
+                if self._due.get(hash_code) != due:
+                    continue
+                del self._due[hash_code]
+                expired = True
+            if expired or now >= next_sweep:
+                next_sweep = now + self.sweep_interval
+                try:
+                    released = await self.db.release_expired_holds()
+                except Exception as e:
+                    self.logger.error("Ошибка освобождения мест: %s", e)
+                else:
+                    for hash_code in released:
+                        self._due.pop(hash_code, None)
+                    if released:
+                        metrics.inc(
+                            "seat_holds_released_total", len(released), reason="expired"
+                        )
+                continue
+
+            self._wakeup.clear()
+            wake_at = min(self._heap[0][0], next_sweep) if self._heap else next_sweep
+            timer = asyncio.get_running_loop().call_later(
+                max(wake_at - now, 0), self._wakeup.set
+            )
+            try:
+                await self._wakeup.wait()
+            finally:
+                timer.cancel()
@@ -0,0 +1,124 @@
+"""Модуль индекса билетов для проверки на входе"""
+
+import asyncio
+import logging
+from datetime import date
+from enum import Enum
+from typing import Optional
+
+from src.classes.database import AsyncDatabase
+from src.classes.ticket_token import TicketToken, is_token
+from src.config import config
+from src.metrics import metrics
+
+
+class ScanResult(Enum):
+    """Итог проверки билета на входе"""
+
+    OK = "ok"
+    USED = "used"
+    INVALID = "invalid"
+    WRONG_DATE = "wrong_date"
+
+
+class TicketIndex:
+    """Индекс билетов дня события в памяти
+
+    Хранит активные коды текущего дня и признак погашения. Проверка и
+    отметка выполняются в цикле событий без await между ними, поэтому два
+    сканера не погасят один билет дважды. Отметка сразу записывается в
+    базу одним условным UPDATE (Database.check_in_hashes), повторные
+    сканы погашенного билета база не видит. Коды, которых нет в индексе
+    (билеты других дней, активированные в другом процессе), проверяет
+    база. Подписанные токены (TicketToken) с неверной подписью или на
+    другую дату отклоняются без обращения к базе и индексу.
+    """
+
+    def __init__(self, db: AsyncDatabase):
+        self.logger = logging.getLogger("tickets")
+        self.db = db
+        self.day: Optional[date] = None
+        self._used: dict[str, bool] = {}
+        self._lock = asyncio.Lock()
+        metrics.gauge("ticket_index_size", lambda: len(self._used))
+
+    async def load(self, day: Optional[date] = None) -> None:
+        """Загружает билеты на day (по умолчанию на сегодня)"""
+        day = day or date.today()
+        tickets = await self.db.get_active_tickets(day)
+        self._used = dict(tickets)
+        self.day = day
+        self.logger.info("Загружено билетов на %s: %s", day, len(tickets))
+
+    def add(self, hash_code: str, to_datetime: date) -> None:
+        """Добавляет только что активированный билет, если он на день индекса"""
+        if to_datetime == self.day:
+            self._used.setdefault(hash_code, False)
+
+    def discard(self, hash_code: str) -> None:
+        """Убирает отмененный билет из индекса"""
+        self._used.pop(hash_code, None)
+
+    async def check_in(self, hash_code: str) -> ScanResult:
+        """Проверяет билет и гасит его, если он действителен"""
+        return (await self.check_in_many([hash_code]))[0][1]
+
+    async def check_in_many(self, hash_codes: list[str]) -> list[tuple[str, ScanResult]]:
+        """Проверяет и гасит пачку билетов одной транзакцией
+
+        Повтор кода в пачке считается повторным сканом.
+        """
+        if self.day != date.today():
+            async with self._lock:
+                if self.day != date.today():
+                    await self.load()
+
+        # None - решает база (код погашен здесь в памяти или не в индексе)
+        results: list[tuple[str, Optional[ScanResult]]] = []
+        claimed: list[str] = []
+        pending: dict[str, None] = {}
+        secrets = config.get().ticket_secrets
+        for hash_code in hash_codes:
+            if is_token(hash_code):
+                token = TicketToken.verify(hash_code, secrets)
+                if token is None:
+                    results.append((hash_code, ScanResult.INVALID))
+                    continue
+                if token.event_date != self.day:
+                    results.append((hash_code, ScanResult.WRONG_DATE))
+                    continue
+            used = self._used.get(hash_code)
+            if used and hash_code not in pending:
+                results.append((hash_code, ScanResult.USED))
+                continue
+            if used is False:
+                self._used[hash_code] = True
+                claimed.append(hash_code)
+            pending[hash_code] = None
+            results.append((hash_code, None))
+
+        statuses: dict[str, Optional[bool]] = {}
+        if pending:
+            try:
+                statuses = await self.db.check_in_hashes(list(pending))
+            except Exception:
+                for hash_code in claimed:
+                    self._used[hash_code] = False
+                raise
+
+        checked = []
+        seen: set[str] = set()
+        for hash_code, result in results:
+            if result is None:
+                status = statuses.get(hash_code)
+                if status is None:
+                    self._used.pop(hash_code, None)
+                    result = ScanResult.INVALID
+                elif status and hash_code not in seen:
+                    result = ScanResult.OK
+                else:
+                    result = ScanResult.USED
+                seen.add(hash_code)
+            metrics.inc("ticket_scans_total", result=result.value)
+            checked.append((hash_code, result))
+        return checked
@@ -0,0 +1,67 @@
+"""Модуль подписанных токенов билетов"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import struct
+from datetime import date, timedelta
+from typing import NamedTuple, Optional
+
+# Префикс формата: в старых hash_code (hex SHA-256) заглавных букв нет
+TOKEN_PREFIX = "T"
+# Номер билета (uint32) и день события от EPOCH (uint16)
+_PAYLOAD = struct.Struct(">IH")
+SIGNATURE_BYTES = 10
+EPOCH = date(2020, 1, 1)
+TOKEN_LENGTH = len(TOKEN_PREFIX) + 22
+
+
+class TicketToken(NamedTuple):
+    """Билет, подписанный HMAC-SHA256
+
+    Токен - «T» и base64url от номера билета, даты события и первых
+    SIGNATURE_BYTES байт HMAC (23 символа, подходит для параметра
+    /start). Подделку и билет на другую дату сканер отсекает без базы.
+    """
+
+    ticket_id: int
+    event_date: date
+
+    def sign(self, secret: bytes) -> str:
+        """Кодирует и подписывает билет"""
+        payload = _PAYLOAD.pack(self.ticket_id, (self.event_date - EPOCH).days)
+        raw = payload + _signature(secret, payload)
+        return TOKEN_PREFIX + base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @classmethod
+    def verify(cls, token: str, secrets: tuple[bytes, ...]) -> Optional["TicketToken"]:
+        """Разбирает токен, None - если формат или подпись неверны
+
+        Подпись проверяется всеми secrets, чтобы после смены ключа старые
+        билеты оставались действительными.
+        """
+        if len(token) != TOKEN_LENGTH or not token.startswith(TOKEN_PREFIX):
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(token[len(TOKEN_PREFIX) :] + "==")
+        except (binascii.Error, ValueError):
+            return None
+        payload, signature = raw[: _PAYLOAD.size], raw[_PAYLOAD.size :]
+        if len(signature) != SIGNATURE_BYTES or not any(
+            hmac.compare_digest(signature, _signature(secret, payload))
+            for secret in secrets
+        ):
+            return None
+        ticket_id, days = _PAYLOAD.unpack(payload)
+        return cls(ticket_id, EPOCH + timedelta(days=days))
+
+
+def is_token(code: str) -> bool:
+    """Похож ли код на подписанный токен (а не на старый hash_code)"""
+    return code.startswith(TOKEN_PREFIX)
+
+
+def _signature(secret: bytes, payload: bytes) -> bytes:
+    digest = hmac.new(secret, TOKEN_PREFIX.encode() + payload, hashlib.sha256)
+    return digest.digest()[:SIGNATURE_BYTES]
@@ -0,0 +1,132 @@
+"""Модуль конфигурации бота"""
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional, cast
+
+from dotenv import dotenv_values
+
+
+@dataclass(frozen=True)
+class Config:
+    """Неизменяемый снимок настроек из .env и текстовых ресурсов"""
+
+    admin_ids: tuple[int | str, ...]
+    cost: Optional[int]
+    qr_version: Optional[int]
+    qr_error_correction: int
+    qr_box_size: int
+    qr_border: int
+    user_agreement: str
+    # Ключи подписи билетов: первым подписываются новые, остальные - старые
+    ticket_secrets: tuple[bytes, ...] = ()
+
+    @classmethod
+    def load(cls, env_path: str, agreement_path: str) -> "Config":
+        """Читает .env (он имеет приоритет над окружением) и ресурсы с диска"""
+        env = {
+            **os.environ,
+            **{k: v for k, v in dotenv_values(env_path).items() if v is not None},
+        }
+        try:
+            with open(agreement_path, encoding="utf-8") as file:
+                user_agreement = file.read()
+        except FileNotFoundError:
+            user_agreement = ""
+
+        version = env.get("version", "3")
+        return cls(
+            admin_ids=tuple(
+                int(x.strip()) if x.strip().isdigit() else x.strip()
+                for x in env.get("ADMIN_IDS", "5957115070,831985431").split(",")
+            ),
+            cost=int(env["COST"]) if env.get("COST") else None,
+            qr_version=int(version) if version else None,
+            qr_error_correction=int(env.get("error_correction", 1)),
+            qr_box_size=int(env.get("box_size", 15)),
+            qr_border=int(env.get("border", 2)),
+            user_agreement=user_agreement,
+            ticket_secrets=tuple(
+                x.strip().encode()
+                for x in env.get("TICKET_SECRET", "").split(",")
+                if x.strip()
+            ),
+        )
+
+
+class ConfigStore:
+    """Хранилище текущего снимка конфигурации
+
+    Снимок читается один раз и подменяется целиком, поэтому читатели
+    никогда не ждут перезагрузку. Файлы перечитываются, только если их
+    mtime изменился (проверка не чаще раза в check_interval секунд),
+    либо по явному reload(force=True). Если новые файлы не читаются,
+    остается прежний снимок, а ошибка пишется в лог и last_error.
+    """
+
+    def __init__(
+        self,
+        env_path: str = ".env",
+        agreement_path: str = "USER_AGREEMENT.txt",
+        check_interval: Optional[float] = None,
+    ):
+        self.logger = logging.getLogger("config")
+        self.env_path = env_path
+        self.agreement_path = agreement_path
+        if check_interval is None:
+            check_interval = float(os.getenv("CONFIG_CHECK_INTERVAL", 5))
+        self.check_interval = check_interval
+        self.last_error: Optional[Exception] = None
+        self._snapshot: Optional[Config] = None
+        self._mtimes: tuple[Optional[float], ...] = ()
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> Config:
+        """Возвращает текущий снимок конфигурации"""
+        snapshot = self._snapshot
+        if snapshot is None or time.monotonic() >= self._next_check:
+            snapshot = self.reload()
+        return snapshot
+
+    def reload(self, force: bool = False) -> Config:
+        """Перечитывает конфигурацию, если файлы изменились (или force)"""
+        # Пока другой поток перечитывает файлы, читатели получают старый снимок
+        if not self._lock.acquire(blocking=force or self._snapshot is None):
+            return cast(Config, self._snapshot)
+        try:
+            self._next_check = time.monotonic() + self.check_interval
+            mtimes = tuple(
+                self._mtime(path) for path in (self.env_path, self.agreement_path)
+            )
+            if force or self._snapshot is None or mtimes != self._mtimes:
+                # Ошибка в тех же файлах повторится, ждем их следующего изменения
+                self._mtimes = mtimes
+                try:
+                    self._snapshot = Config.load(self.env_path, self.agreement_path)
+                except (OSError, ValueError) as e:
+                    self.last_error = e
+                    if self._snapshot is None:
+                        raise
+                    self.logger.error(
+                        "Конфигурация не загружена, остается прежняя: %s", e
+                    )
+                else:
+                    self.last_error = None
+                    self.logger.info("Конфигурация загружена")
+            return self._snapshot
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def _mtime(path: str) -> Optional[float]:
+        try:
+            return os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+
+
+config = ConfigStore()
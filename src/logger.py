@@ -1,44 +1,246 @@
-"""Модуль логгера"""
+"""Модуль логгера
 
+Записи не пишутся в файлы в потоке вызова: корневой логгер кладет их в
+очередь, а фоновый поток QueueListener форматирует и пишет в файлы и
+консоль. Ротация выполняется там же, сжатие архивов - в отдельном
+потоке, поэтому обработчики бота не ждут диск.
+
+Настройки окружения:
+- LOG_QUEUE_SIZE - размер очереди (10000), при переполнении записи
+  отбрасываются и считаются в log_records_dropped_total;
+- LOG_SAMPLING - доля записей ниже WARNING, например «database=0.1»;
+- LOG_RATE_LIMIT - не больше N записей ниже WARNING в секунду,
+  например «database=50,payments=20»;
+- LOG_COMPRESS - сжимать ротированные файлы gzip (1 по умолчанию).
+"""
+
+import atexit
+import gzip
 import logging
-from logging.handlers import RotatingFileHandler
+import os
+import queue
+import random
+import shutil
+import threading
+import time
+from datetime import date
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from typing import Any, Optional
 
+from src.metrics import metrics
 
-def setup_logging():
-    """Метод для настройки логгера+"""
-    logging.info("Настройка логгирования приложения")
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Аргументы этих типов неизменяемы, их можно подставить позже в другом потоке
+LAZY_ARG_TYPES = (str, int, float, bool, type(None), date)
+
+_listener: Optional[QueueListener] = None
+
+
+class LazyQueueHandler(QueueHandler):
+    """QueueHandler без форматирования сообщения в потоке вызова
+
+    Стандартный prepare() подставляет аргументы в сообщение до постановки
+    в очередь. Здесь это делает поток записи, если аргументы неизменяемые;
+    остальные (например, модели SQLAlchemy) подставляются сразу, пока
+    объект еще связан с сессией.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if args and not (
+            isinstance(args, tuple)
+            and all(isinstance(arg, LAZY_ARG_TYPES) for arg in args)
+        ):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.inc("log_records_dropped_total")
+
+
+class BlockingStopQueueListener(QueueListener):
+    """QueueListener, который при остановке дожидается места в очереди"""
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+
+class SamplingFilter(logging.Filter):
+    """Прореживает записи ниже WARNING
+
+    Пропускает долю sample записей и не больше rate записей в секунду
+    (корзина токенов). Предупреждения и ошибки проходят всегда.
+    """
+
+    def __init__(self, sample: float = 1.0, rate: Optional[float] = None):
+        super().__init__()
+        self.sample = sample
+        self.rate = rate
+        self.allowance = rate or 0.0
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        if self.sample < 1 and random.random() >= self.sample:
+            metrics.inc("log_records_sampled_total", logger=record.name)
+            return False
+        if self.rate is not None:
+            with self._lock:
+                now = time.monotonic()
+                self.allowance = min(
+                    self.rate, self.allowance + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.allowance < 1:
+                    metrics.inc("log_records_sampled_total", logger=record.name)
+                    return False
+                self.allowance -= 1
+        return True
+
+
+class CompressingRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler, сжимающий архивы gzip в отдельном потоке
+
+    Архивы называются app.log.1.gz, app.log.2.gz и т.д. Перед следующей
+    ротацией обработчик дожидается сжатия предыдущего архива, иначе
+    сдвиг номеров пропустил бы недописанный файл.
+    """
+
+    def __init__(self, *args: Any, compress: bool = True, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._compressor: Optional[threading.Thread] = None
+        if compress:
+            self.namer = lambda name: f"{name}.gz"
+            self.rotator = self._rotate
+
+    def doRollover(self) -> None:
+        self._wait_compressor()
+        super().doRollover()
+
+    def close(self) -> None:
+        self._wait_compressor()
+        super().close()
+
+    def _wait_compressor(self) -> None:
+        if self._compressor is not None:
+            self._compressor.join()
+            self._compressor = None
+
+    def _rotate(self, source: str, dest: str) -> None:
+        uncompressed = dest.removesuffix(".gz")
+        os.replace(source, uncompressed)
+        self._compressor = threading.Thread(
+            target=_gzip_file,
+            args=(uncompressed, dest),
+            name="log-compress",
+            daemon=True,
+        )
+        self._compressor.start()
+
+
+def _gzip_file(source: str, dest: str) -> None:
+    """Сжимает source в dest и удаляет source"""
+    try:
+        with open(source, "rb") as src, gzip.open(f"{dest}.tmp", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(f"{dest}.tmp", dest)
+        os.remove(source)
+    except OSError as e:
+        logging.getLogger("logger").error("Не удалось сжать лог %s: %s", source, e)
+
+
+def _parse_spec(spec: str) -> dict[str, float]:
+    """Разбирает «logger=значение,logger=значение»"""
+    result = {}
+    for item in spec.split(","):
+        name, sep, value = item.partition("=")
+        if sep and name.strip():
+            result[name.strip()] = float(value)
+    return result
+
+
+def configure_sampling(
+    sampling: Optional[str] = None, rate_limit: Optional[str] = None
+) -> None:
+    """Ставит SamplingFilter на логгеры из LOG_SAMPLING и LOG_RATE_LIMIT"""
+    samples = _parse_spec(sampling or os.getenv("LOG_SAMPLING", ""))
+    rates = _parse_spec(rate_limit or os.getenv("LOG_RATE_LIMIT", ""))
+    for name in samples.keys() | rates.keys():
+        logger = logging.getLogger(name)
+        for old in [f for f in logger.filters if isinstance(f, SamplingFilter)]:
+            logger.removeFilter(old)
+        logger.addFilter(SamplingFilter(samples.get(name, 1.0), rates.get(name)))
+
+
+def setup_logging() -> QueueListener:
+    """Метод для настройки логгера
+
+    Обработчики, уже висящие на корневом логгере (например, от
+    basicConfig), тоже переносятся за очередь. Повторный вызов
+    возвращает уже запущенный поток записи.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
     # Создаем папку logs, если ее нет
     logs_dir = Path("logs")
     logs_dir.mkdir(exist_ok=True)
 
-    # Базовые настройки логирования
-    log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    formatter = logging.Formatter(log_format)
+    formatter = logging.Formatter(LOG_FORMAT)
+    compress = os.getenv("LOG_COMPRESS", "1") != "0"
 
     # Основной файловый обработчик с ротацией
-    log_file = logs_dir / "app.log"
-    file_handler = RotatingFileHandler(
-        log_file,
-        maxBytes=10 * 1024 * 1024,
+    file_handler = CompressingRotatingFileHandler(
+        logs_dir / "app.log",
+        maxBytes=10 * 1024 * 1024,  # 10 MB
         backupCount=5,
-        encoding="utf-8",  # 10 MB
+        encoding="utf-8",
+        compress=compress,
     )
     file_handler.setFormatter(formatter)
     file_handler.setLevel(logging.INFO)
 
-    # Настройка корневого логгера
-    root_logger = logging.getLogger()
-    root_logger.setLevel(logging.INFO)
-    root_logger.addHandler(file_handler)
-
-    # Дополнительно можно настроить логирование ошибок в отдельный файл
-    error_file_handler = RotatingFileHandler(
+    # Ошибки дополнительно пишутся в отдельный файл
+    error_file_handler = CompressingRotatingFileHandler(
         logs_dir / "errors.log",
         maxBytes=5 * 1024 * 1024,  # 5 MB
         backupCount=3,
         encoding="utf-8",
+        compress=compress,
     )
     error_file_handler.setFormatter(formatter)
     error_file_handler.setLevel(logging.ERROR)
-    root_logger.addHandler(error_file_handler)
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    handlers = list(root_logger.handlers) or [logging.StreamHandler()]
+    for handler in handlers:
+        root_logger.removeHandler(handler)
+        if handler.formatter is None:
+            handler.setFormatter(formatter)
+
+    log_queue: queue.Queue[logging.LogRecord] = queue.Queue(
+        int(os.getenv("LOG_QUEUE_SIZE", 10_000))
+    )
+    root_logger.addHandler(LazyQueueHandler(log_queue))
+    _listener = BlockingStopQueueListener(
+        log_queue,
+        *handlers,
+        file_handler,
+        error_file_handler,
+        respect_handler_level=True,
+    )
+    _listener.start()
+    atexit.register(_listener.stop)
+    metrics.gauge("log_queue_depth", log_queue.qsize)
+
+    configure_sampling()
+    logging.info("Настройка логгирования приложения")
+    return _listener
@@ -0,0 +1,281 @@
+"""Модуль метрик: счетчики, гистограммы и их выдача
+
+Метрики копятся в памяти процесса в общем реестре metrics. Запись -
+поиск по словарю и увеличение пары чисел под блокировкой, поэтому их
+можно не отключать в продакшене. Снимок доступен админам по /stats и,
+если задан METRICS_PORT, в текстовом формате Prometheus по HTTP.
+"""
+
+import bisect
+import contextvars
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from aiohttp import web
+
+# Границы корзин гистограмм длительности (секунды) и количеств
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    300.0,
+)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+Labels = tuple[tuple[str, str], ...]
+
+# Счетчик SQL-запросов текущего обновления Telegram (см. CustomClient)
+update_queries: contextvars.ContextVar[Optional[list[int]]] = contextvars.ContextVar(
+    "update_queries", default=None
+)
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами"""
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля по верхней границе корзины"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        # Последняя корзина - значения больше всех границ
+        bounds = (*self.buckets, float("inf"))
+        for bound, count in zip(bounds, self.counts, strict=True):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """Реестр метрик процесса"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.counters: dict[str, dict[Labels, float]] = {}
+        self.histograms: dict[str, dict[Labels, Histogram]] = {}
+        self.gauges: dict[str, dict[Labels, Callable[[], float]]] = {}
+        self.buckets: dict[str, tuple[float, ...]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, amount: float = 1, **labels: str) -> None:
+        """Увеличивает счетчик"""
+        key = _key(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Добавляет наблюдение в гистограмму"""
+        key = _key(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                default = LATENCY_BUCKETS if name.endswith("_seconds") else COUNT_BUCKETS
+                histogram = series[key] = Histogram(self.buckets.get(name, default))
+            histogram.observe(value)
+
+    def gauge(self, name: str, func: Callable[[], float], **labels: str) -> None:
+        """Регистрирует показатель, вычисляемый в момент снятия метрик"""
+        with self._lock:
+            self.gauges.setdefault(name, {})[_key(labels)] = func
+
+    def set_buckets(self, name: str, buckets: tuple[float, ...]) -> None:
+        """Задает корзины гистограммы name (до первого наблюдения)
+
+        По умолчанию для *_seconds берутся LATENCY_BUCKETS, иначе COUNT_BUCKETS.
+        """
+        self.buckets[name] = buckets
+
+    def timer(self, name: str, **labels: str) -> "Timer":
+        """Замеряет длительность блока with в гистограмму name"""
+        return Timer(self, name, labels)
+
+    def _snapshot(self):
+        with self._lock:
+            counters = {name: dict(s) for name, s in self.counters.items()}
+            histograms = {
+                name: {
+                    key: (
+                        h.buckets,
+                        list(h.counts),
+                        h.count,
+                        h.sum,
+                        h.quantile(0.5),
+                        h.quantile(0.95),
+                    )
+                    for key, h in s.items()
+                }
+                for name, s in self.histograms.items()
+            }
+            gauges = {name: dict(s) for name, s in self.gauges.items()}
+        values: dict[str, dict[Labels, float]] = {}
+        for name, series in gauges.items():
+            for key, func in series.items():
+                try:
+                    values.setdefault(name, {})[key] = float(func())
+                except Exception:
+                    continue
+        return counters, histograms, values
+
+    def render_prometheus(self) -> str:
+        """Текстовый формат экспозиции Prometheus"""
+        counters, histograms, gauges = self._snapshot()
+        lines: list[str] = []
+        for name, series in sorted(counters.items()):
+            lines.append(f"# TYPE {name} counter")
+            lines.extend(f"{name}{_labels(k)} {v:g}" for k, v in series.items())
+        for name, series in sorted(gauges.items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(f"{name}{_labels(k)} {v:g}" for k, v in series.items())
+        for name, series in sorted(histograms.items()):
+            lines.append(f"# TYPE {name} histogram")
+            for key, (buckets, counts, count, total, _, _) in series.items():
+                cumulative = 0
+                for bound, bucket_count in zip((*buckets, "+Inf"), counts, strict=True):
+                    cumulative += bucket_count
+                    le = bound if isinstance(bound, str) else f"{bound:g}"
+                    lines.append(
+                        f"{name}_bucket{_labels(key + (('le', le),))} {cumulative}"
+                    )
+                lines.append(f"{name}_sum{_labels(key)} {total:g}")
+                lines.append(f"{name}_count{_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """Краткая сводка для команды /stats"""
+        counters, histograms, gauges = self._snapshot()
+        uptime = int(time.time() - self.started)
+        lines = [f"Аптайм: {uptime // 3600} ч {uptime % 3600 // 60} мин"]
+        for name, series in sorted(gauges.items()):
+            for key, value in series.items():
+                lines.append(f"{name}{_labels(key)}: {value:g}")
+        for name, series in sorted(counters.items()):
+            for key, value in series.items():
+                lines.append(f"{name}{_labels(key)}: {value:g}")
+        for name, series in sorted(histograms.items()):
+            lines.append(f"\n{name}:")
+            for key, (_, _, count, total, p50, p95) in sorted(
+                series.items(), key=lambda item: -item[1][2]
+            ):
+                label = ", ".join(value for _, value in key) or "всего"
+                if name.endswith("_seconds"):
+                    lines.append(
+                        f"  {label}: {count} шт, ср {total / count * 1000:.1f} мс, "
+                        f"p50 ≤{p50 * 1000:g} мс, p95 ≤{p95 * 1000:g} мс"
+                    )
+                else:
+                    lines.append(
+                        f"  {label}: {count} шт, ср {total / count:.1f}, "
+                        f"p50 ≤{p50:g}, p95 ≤{p95:g}"
+                    )
+        return "\n".join(lines)
+
+
+class Timer:
+    """Контекстный менеджер замера длительности (дешевле генераторного)"""
+
+    __slots__ = ("registry", "name", "labels", "start")
+
+    def __init__(self, registry: Metrics, name: str, labels: dict[str, str]):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *_: Any) -> None:
+        self.registry.observe(
+            self.name, time.perf_counter() - self.start, **self.labels
+        )
+
+
+def _key(labels: dict[str, str]) -> Labels:
+    items = tuple(labels.items())
+    return items if len(items) < 2 else tuple(sorted(items))
+
+
+def _labels(key: Labels) -> str:
+    if not key:
+        return ""
+    escaped = (
+        (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in key
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class MetricsServer:
+    """HTTP-эндпоинт /metrics в формате Prometheus"""
+
+    def __init__(
+        self,
+        registry: "Metrics",
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+    ):
+        self.registry = registry
+        self.host = host or os.getenv("METRICS_HOST", "127.0.0.1")
+        self.port = port if port is not None else int(os.getenv("METRICS_PORT", 0))
+        self.logger = logging.getLogger("metrics")
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> int:
+        """Запускает сервер и возвращает фактический порт"""
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        self.logger.info(
+            "Метрики доступны на http://%s:%s/metrics", self.host, self.port
+        )
+        return self.port
+
+    async def stop(self) -> None:
+        """Останавливает сервер"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def handle(self, _: web.Request) -> web.Response:
+        return web.Response(
+            body=self.registry.render_prometheus().encode(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+
+metrics = Metrics()
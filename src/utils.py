@@ -2,32 +2,109 @@
 
 import asyncio
 import hashlib
+import io
 import os
+import threading
 from datetime import datetime
-from typing import Any, Callable, Optional, TypeVar, Union, cast, overload
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Optional,
+    TypeVar,
+    Union,
+    cast,
+    overload,
+)
 
 import qrcode
 from dotenv import load_dotenv
-from PIL import Image
+from PIL import Image, ImageOps
 from pyrogram.types import Message
 from qrcode.image.styledpil import StyledPilImage
-from qrcode.image.styles.colormasks import ImageColorMask
 from qrcode.image.styles.moduledrawers.pil import (
     RoundedModuleDrawer,
     CircleModuleDrawer,
 )
 
+from src.config import config
+
+if TYPE_CHECKING:
+    from src.classes.qr_cache import QRCache
+    from src.classes.qr_renderer import QRRenderer
+
 load_dotenv()
 T = TypeVar("T")
 
+# Фон стиля по умолчанию, модули QR-кода окрашиваются пикселями image.png
+MASK_BACK_COLOR = (128, 128, 128)
+QR_STYLES = ("plain", "reversed_plain", "rounded", "circle")
+
+# Кеши процесса: исходная маска и её копии под каждый размер QR-кода
+_COLOR_MASK: Optional[Image.Image] = None
+_SIZED_MASKS: dict[int, tuple[Image.Image, Image.Image]] = {}
+# Шаблоны стилей держат экземпляры отрисовщиков, поэтому у каждого потока свои
+_templates = threading.local()
+
+
+def _get_color_mask(size: Optional[int] = None) -> tuple[Image.Image, Image.Image]:
+    """Возвращает (маску, серый фон) для QR-кода размером size
+
+    image.png декодируется один раз на процесс, а масштабированная маска
+    вычисляется один раз на каждый размер.
+    """
+    global _COLOR_MASK
+    if _COLOR_MASK is None:
+        with Image.open("image.png") as mask:
+            _COLOR_MASK = mask.convert("RGB")
+    size = size or _COLOR_MASK.size[0]
+    if size not in _SIZED_MASKS:
+        _SIZED_MASKS[size] = (
+            _COLOR_MASK.resize((size, size)),
+            Image.new("RGB", (size, size), MASK_BACK_COLOR),
+        )
+    return _SIZED_MASKS[size]
+
+
+def _get_style_template(style: Optional[str]) -> dict[str, Any]:
+    """Возвращает готовые аргументы make_image для стиля"""
+    templates: Optional[dict[str, dict[str, Any]]] = getattr(
+        _templates, "styles", None
+    )
+    if templates is None:
+        templates = _templates.styles = {
+            "plain": {"fill_color": "black", "back_color": "white"},
+            "reversed_plain": {"fill_color": "white", "back_color": "black"},
+            "rounded": {
+                "image_factory": StyledPilImage,
+                "module_drawer": RoundedModuleDrawer(),
+            },
+            "circle": {
+                "image_factory": StyledPilImage,
+                "module_drawer": CircleModuleDrawer(),
+            },
+            # Маска накладывается отдельно в _apply_color_mask
+            "default": {
+                "image_factory": StyledPilImage,
+                "module_drawer": RoundedModuleDrawer(),
+            },
+        }
+    return templates[style if style in QR_STYLES else "default"]
+
+
+def _apply_color_mask(img: Image.Image) -> Image.Image:
+    """Окрашивает модули пикселями маски, фон делает серым
+
+    Эквивалент ImageColorMask.apply_mask, но одной операцией PIL вместо
+    попиксельного цикла: яркость черно-белого QR-кода служит альфа-каналом.
+    """
+    mask, back = _get_color_mask(img.size[0])
+    return Image.composite(mask, back, ImageOps.invert(img.convert("L")))
+
 
 def get_env_admin_ids() -> list[int | str]:
     """Получает список ID администраторов из переменной окружения ADMIN_IDS"""
-    load_dotenv(override=True)
-    ids_str = os.getenv("ADMIN_IDS", "5957115070,831985431")
-    return [
-        int(x.strip()) if x.strip().isdigit() else x.strip() for x in ids_str.split(",")
-    ]
+    return list(config.get().admin_ids)
 
 
 class Utils:
@@ -36,12 +113,12 @@ class Utils:
     START_MESSAGE: str = """**🔥 Добро пожаловать в бот дискотеки S.T.A.R! 🔥**"""
     DATE_FORMAT: str = "%Y-%m-%d"
     DATETIME_FORMAT: str = "%Y-%m-%d %H:%M:%S"
-    ADMIN_IDS: list[int | str] = get_env_admin_ids()
     TRUE_PROMPT = "Ваш QR-код на {0}:\n`{1}`"
     SUCCESS_URL = "https://t.me/{0}?start=activate{1}".format
     TRUE_CODE = "`✅ Код верный!`"
     FALSE_CODE = "`❌ Код неверный!`"
     FALSE_CODE_ALREADY_USED = "`❌ Код уже был использован!`"
+    FALSE_CODE_WRONG_DATE = "`❌ Билет на другую дату!`"
     CALLBACK_USER_ALREADY_REGISTRATE = "❌ Вы уже были зарегистрированы!"
     CALLBACK_USER_NOT_AVAILABLE = "❌ Места на это событие кончились!"
     QR_URL = "https://t.me/{0}?start={1}".format
@@ -53,10 +130,10 @@ class Utils:
         data = f"{tg_id}{dt.isoformat()}"
         return hashlib.sha256(data.encode()).hexdigest()
 
-    @classmethod
-    def update_admin_ids(cls) -> None:
-        """Обновляет список ADMIN_IDS из .env файла"""
-        cls.ADMIN_IDS = get_env_admin_ids()
+    @staticmethod
+    def is_admin(user_id: int | str) -> bool:
+        """Проверяет, входит ли пользователь в ADMIN_IDS"""
+        return user_id in config.get().admin_ids
 
     @staticmethod
     def event_exception_handler(func: Callable[..., T]) -> Callable[..., T]:
@@ -84,6 +161,17 @@ class Utils:
             return async_wrapper
         return sync_wrapper
 
+    @staticmethod
+    def get_qr_settings() -> tuple[Optional[int], int, int, int]:
+        """Возвращает (version, error_correction, box_size, border) из .env"""
+        settings = config.get()
+        return (
+            settings.qr_version,
+            settings.qr_error_correction,
+            settings.qr_box_size,
+            settings.qr_border,
+        )
+
     @overload
     @staticmethod
     def create_qr(data: Union[str, list[str]]) -> Image.Image: ...
@@ -108,57 +196,129 @@ class Utils:
         Returns:
             PIL.Image.Image: Сгенерированное изображение QR-кода.
         """
-        load_dotenv(override=True)
+        version, error_correction, box_size, border = Utils.get_qr_settings()
         qr = qrcode.QRCode(
-            version=os.getenv("version", 3),
-            error_correction=int(os.getenv("error_correction", 1)),
-            box_size=int(os.getenv("box_size", 15)),
-            border=int(os.getenv("border", 2)),
+            version=version,
+            error_correction=error_correction,
+            box_size=box_size,
+            border=border,
         )
         data_str = " ".join(data) if isinstance(data, list) else data
         qr.add_data(data_str)
         qr.make(fit=True)
-        match style:
-            case "plain":
-                img = qr.make_image(fill_color="black", back_color="white")
-            case "reversed_plain":
-                img = qr.make_image(fill_color="white", back_color="black")
-            case "rounded":
-                img = qr.make_image(
-                    image_factory=StyledPilImage,
-                    module_drawer=RoundedModuleDrawer(),
-                )
-            case "circle":
-                img = qr.make_image(
-                    image_factory=StyledPilImage,
-                    module_drawer=CircleModuleDrawer(),
-                )
-            case _:
-                img = qr.make_image(
-                    image_factory=StyledPilImage,
-                    module_drawer=RoundedModuleDrawer(),
-                    color_mask=ImageColorMask(
-                        (128, 128, 128), color_mask_path="image.png"
-                    ),
-                )
+        img = qr.make_image(**_get_style_template(style)).get_image()
+        if style not in QR_STYLES:
+            img = _apply_color_mask(img)
+        return img
 
-        return img.get_image()
+    @staticmethod
+    def init_qr_worker() -> None:
+        """Инициализатор процесса-воркера: прогревает модули, стили и маску"""
+        for style in (*QR_STYLES, None):
+            Utils.create_qr("warmup", style)
+
+    @classmethod
+    def render_qr_png(
+        cls, data: str | list[str], style: Optional[str] = None
+    ) -> bytes:
+        """Генерирует QR-код и кодирует его в PNG"""
+        with io.BytesIO() as buffer:
+            cls.create_qr(data, style).save(buffer, format="PNG")
+            return buffer.getvalue()
 
     @classmethod
-    async def gen_qr_code(cls, data: str | list[str], style: Optional[str] = None):
-        """Асинхронная генерация QR-кода через мультипроцессорное исполнение
+    def render_qr_pngs(
+        cls, payloads: list[str | list[str]], style: Optional[str] = None
+    ) -> list[bytes]:
+        """Генерирует пачку QR-кодов одного стиля (одна задача для воркера)"""
+        return [cls.render_qr_png(data, style) for data in payloads]
+
+    @classmethod
+    def qr_cache_key(
+        cls, data: str | list[str], style: Optional[str] = None
+    ) -> tuple[Any, ...]:
+        """Ключ QR-кода: данные, стиль и все параметры генерации"""
+        data_str = " ".join(data) if isinstance(data, list) else data
+        return (data_str, style, *cls.get_qr_settings())
+
+    @classmethod
+    async def gen_qr_code(
+        cls,
+        data: str | list[str],
+        style: Optional[str] = None,
+        renderer: Optional["QRRenderer"] = None,
+        cache: Optional["QRCache"] = None,
+    ) -> bytes:
+        """Асинхронная генерация QR-кода в пуле процессов
 
         Args:
             data (str | list[str]): Данные для генерации QR-кода. Если передается список,
                                       его элементы будут объединены в одну строку.
             style (Optional[str]): Стиль генерации QR-кода.
+            renderer (Optional[QRRenderer]): Пул рендеринга. Без него QR-код
+                                      генерируется в пуле потоков по умолчанию.
+            cache (Optional[QRCache]): Кеш готовых PNG, проверяется до рендеринга.
 
         Returns:
-            PIL.Image.Image: Сгенерированное изображение QR-кода.
+            bytes: PNG-изображение QR-кода.
         """
-        from concurrent.futures import ProcessPoolExecutor
+        key = None
+        if cache is not None:
+            key = cls.qr_cache_key(data, style)
+            if (png := await cache.get(key)) is not None:
+                return png
+
+        if renderer is not None:
+            png = await renderer.render(data, style)
+        else:
+            loop = asyncio.get_running_loop()
+            png = await loop.run_in_executor(None, cls.render_qr_png, data, style)
+
+        if cache is not None and key is not None:
+            await cache.put(key, png)
+        return png
+
+    @classmethod
+    async def gen_qr_codes(
+        cls,
+        payloads: list[str | list[str]],
+        style: Optional[str] = None,
+        renderer: Optional["QRRenderer"] = None,
+        cache: Optional["QRCache"] = None,
+    ) -> list[bytes]:
+        """Асинхронная генерация пачки QR-кодов одного стиля
+
+        Закешированные изображения берутся из кеша, остальные рендерятся
+        параллельно в пуле пачками, чтобы не платить за IPC на каждый код.
+
+        Args:
+            payloads (list[str | list[str]]): Данные для каждого QR-кода.
+            style (Optional[str]): Стиль генерации QR-кодов.
+            renderer (Optional[QRRenderer]): Пул рендеринга.
+            cache (Optional[QRCache]): Кеш готовых PNG.
+
+        Returns:
+            list[bytes]: PNG-изображения в порядке payloads.
+        """
+        results: list[Optional[bytes]] = [None] * len(payloads)
+        keys = [cls.qr_cache_key(data, style) for data in payloads]
+        if cache is not None:
+            for i, key in enumerate(keys):
+                results[i] = await cache.get(key)
+
+        missing = [i for i, png in enumerate(results) if png is None]
+        if missing:
+            todo = [payloads[i] for i in missing]
+            if renderer is not None:
+                rendered = await renderer.render_many(todo, style)
+            else:
+                loop = asyncio.get_running_loop()
+                rendered = await loop.run_in_executor(
+                    None, cls.render_qr_pngs, todo, style
+                )
+            for i, png in zip(missing, rendered, strict=True):
+                results[i] = png
+                if cache is not None:
+                    await cache.put(keys[i], png)
 
-        loop = asyncio.get_running_loop()
-        workers = int(os.getenv("generation_workers", 20))
-        with ProcessPoolExecutor(max_workers=workers) as executor:
-            return await loop.run_in_executor(executor, cls.create_qr, data, style)
+        return cast(list[bytes], results)
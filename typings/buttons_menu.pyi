@@ -1,8 +1,9 @@
 from pyrogram.types import InlineKeyboardButtonBuy as InlineKeyboardButtonBuy, InlineKeyboardMarkup
+from .database import Database
 
 class ButtonsMenu:
     @classmethod
-    def get_buy_markup(cls, tg_id: int | str) -> InlineKeyboardMarkup: ...
+    def get_buy_markup(cls, db: Database, tg_id: int | str) -> InlineKeyboardMarkup: ...
     @staticmethod
     def get_newsletter_markup(tg_id: int | str) -> InlineKeyboardMarkup: ...
     @staticmethod
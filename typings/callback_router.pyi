@@ -0,0 +1,50 @@
+from datetime import date
+from logging import Logger
+from typing import Any, Awaitable, Callable
+from pyrogram.types import CallbackQuery
+
+CALLBACK_VERSION: str
+SEPARATOR: str
+MAX_CALLBACK_BYTES: int
+STALE_CALLBACK: str
+
+CallbackArg = int | str | date
+Handler = Callable[..., Awaitable[Any]]
+
+def pack(route: str, *args: CallbackArg) -> str: ...
+def unpack(data: str) -> tuple[str, list[str]] | None: ...
+
+class CallbackRoute:
+    name: str
+    types: tuple[type, ...]
+    admin: bool
+    def __init__(
+        self, name: str, types: tuple[type, ...] = (), admin: bool = False
+    ) -> None: ...
+
+class RouteStats:
+    calls: int
+    errors: int
+    total_time: float
+    max_time: float
+    def __init__(
+        self,
+        calls: int = 0,
+        errors: int = 0,
+        total_time: float = 0.0,
+        max_time: float = 0.0,
+    ) -> None: ...
+    @property
+    def avg_ms(self) -> float: ...
+
+def callback(
+    name: str, *types: type, admin: bool = False
+) -> Callable[[Handler], Handler]: ...
+
+class CallbackRouter:
+    logger: Logger
+    routes: dict[str, tuple[CallbackRoute, Handler]]
+    stats: dict[str, RouteStats]
+    def __init__(self) -> None: ...
+    def add(self, route: CallbackRoute, handler: Handler) -> None: ...
+    async def dispatch(self, _: Any, query: CallbackQuery) -> None: ...
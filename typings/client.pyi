@@ -6,15 +6,37 @@ from pyrogram.types import (
 )
 from typing import TypeVar
 from logging import Logger
-from .database import Database
-from .customtinkoffacquiringapclient import CustomTinkoffAcquiringAPIClient
+from src.metrics import MetricsServer
+from .callback_router import CallbackRouter
+from .database import AsyncDatabase, Database
+from .customtinkoffacquiringapclient import (
+    CustomTinkoffAcquiringAPIClient,
+    PaymentNotificationServer,
+)
+from .newsletter import Newsletter
+from .payment_tracker import PaymentTracker
+from .qr_cache import QRCache
+from .qr_renderer import QRRenderer
+from .seat_holds import SeatHolds
+from .ticket_index import ScanResult, TicketIndex
 
 ClientVar = TypeVar("ClientVar")
 
+CHECK_IN_REPLIES: dict[ScanResult, str]
+
 class CustomClient(Client):
     logger: Logger
-    db: Database
+    db: AsyncDatabase
     tb: CustomTinkoffAcquiringAPIClient
+    payment_notifications: PaymentNotificationServer | None
+    payment_tracker: PaymentTracker
+    seat_holds: SeatHolds
+    newsletter: Newsletter
+    ticket_index: TicketIndex
+    callbacks: CallbackRouter
+    metrics_server: MetricsServer | None
+    qr_renderer: QRRenderer
+    qr_cache: QRCache
     messages: dict[str, str]
     def __init__(
         self,
@@ -22,6 +44,7 @@ class CustomClient(Client):
         api_id: str | int | None = None,
         api_hash: str | None = None,
         bot_token: str | None = None,
+        db: Database | None = None,
     ) -> None: ...
     async def handle_genqr_admin(self, _, message: Message) -> None: ...
     async def handle_check_admin(self, message: Message) -> None: ...
@@ -29,3 +52,5 @@ class CustomClient(Client):
     async def handle_getmyqr(self, _, message: Message) -> None: ...
     async def handle_main_start(self, _: Client, message: Message) -> None: ...
     async def handle_addevent_admin(self, _, message: Message) -> None: ...
+    async def handle_reload_admin(self, _, message: Message) -> None: ...
+    async def handle_stats_admin(self, _, message: Message) -> None: ...
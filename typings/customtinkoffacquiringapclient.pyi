@@ -1,6 +1,44 @@
+from asyncio import Future
+from logging import Logger
+from typing import Any, Callable
+import httpx
+from aiohttp import web
 from tinkoff_acquiring.client import TinkoffAcquiringAPIClient
 
+FAILED_STATES: tuple[str, ...]
+MAX_EARLY_NOTIFICATIONS: int
+
 class CustomTinkoffAcquiringAPIClient(TinkoffAcquiringAPIClient):
     terminal_key: str | None
+    secret: str | None
+    notification_url: str | None
+    poll_interval: float
+    _waiters: dict[str, Future[str]]
+    notification_handlers: list[Callable[[str, str], None]]
+    _http: httpx.AsyncClient | None
     def __init__(self, terminal_key: str | None, secret: str | None) -> None: ...
+    async def send_request(self, endpoint: str, params: dict[str, Any]) -> Any: ...
+    async def close(self) -> None: ...
+    @staticmethod
+    def sign(params: dict[str, Any], secret: str) -> str: ...
+    def verify_notification(self, data: dict[str, Any]) -> bool: ...
+    def notify(self, payment_id: str | int, state: str) -> None: ...
     async def await_payment(self, order_id: str, timeout: float = 240.0) -> bool: ...
+
+class PaymentNotificationServer:
+    tb: CustomTinkoffAcquiringAPIClient
+    host: str
+    port: int
+    path: str
+    logger: Logger
+    _runner: web.AppRunner | None
+    def __init__(
+        self,
+        tb: CustomTinkoffAcquiringAPIClient,
+        host: str | None = None,
+        port: int | None = None,
+        path: str | None = None,
+    ) -> None: ...
+    async def start(self) -> int: ...
+    async def stop(self) -> None: ...
+    async def handle(self, request: web.Request) -> web.Response: ...
@@ -1,10 +1,17 @@
 from _typeshed import Incomplete
 from datetime import date, datetime
-from sqlalchemy import Column
+from sqlalchemy import Column, String, TypeDecorator
 from sqlalchemy.orm import Session as Session
-from typing import overload
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, NamedTuple, TypeVar, overload
 
 Base: Incomplete
+T = TypeVar("T")
+
+class TelegramId(TypeDecorator[str]):
+    impl: type[String]
+    cache_ok: bool
+    def process_bind_param(self, value: Any, dialect: Any) -> str | None: ...
 
 class Visitor(Base):
     __tablename__: str
@@ -13,12 +20,48 @@ class Visitor(Base):
     to_datetime: datetime | date
     hash_code: str
     is_active: bool | Column[bool]
+    holds_seat: bool | Column[bool]
+    hold_expires_at: datetime | None
 
 class User(Base):
     __tablename__: str
     id: str | int
     tg_id: str | int
 
+class TicketFile(Base):
+    __tablename__: str
+    id: str | int
+    hash_code: str
+    style: str
+    qr_key: str
+    file_id: str
+
+class PendingPayment(Base):
+    __tablename__: str
+    payment_id: str
+    hash_code: str
+    tg_id: int
+    chat_id: int
+    message_id: int
+    to_datetime: date
+    created_at: datetime
+    needs_refund: bool
+
+class Broadcast(Base):
+    __tablename__: str
+    id: int
+    author_id: int
+    text: str
+    chat_id: int
+    message_id: int
+    total: int
+    sent: int
+    failed: int
+    cursor: int
+    last_user_id: int
+    is_done: bool
+    created_at: datetime
+
 class Registration(Base):
     __tablename__: str
     id: str | int
@@ -26,6 +69,19 @@ class Registration(Base):
     max_visitors: int | Column[int]
     visitors_count: int | Column[int]
 
+class EventAvailability(NamedTuple):
+    date: date
+    available: int
+    is_registered: bool
+
+class AvailabilitySnapshot(NamedTuple):
+    day: date
+    events: tuple[tuple[date, int], ...]
+    registrations: dict[str, frozenset[date]]
+    built_at: float
+
+def get_engine(url: str) -> Incomplete: ...
+
 class Database:
     db_name: str
     engine: Incomplete
@@ -33,14 +89,56 @@ class Database:
     logger: Incomplete
     backup_dir: str
     dump_interval: int | float
-    def __init__(self, name: str = "database") -> None: ...
+    backup_pages: int
+    backup_sleep: float
+    max_backups: int
+    last_backup_bytes: int
+    last_backup_time: float
+    is_sqlite: bool
+    availability_ttl: float
+    def __init__(self, name: str = "database", url: str | None = None) -> None: ...
+    def setup(self, backups: bool = True) -> None: ...
     def get_session(self) -> Session: ...
     def get_all_visitors(self, q: str | int | None = None) -> list[Visitor]: ...
     def get_user_hashcode(
         self, tg_id: str | int, to_datetime: date | datetime
     ) -> str: ...
     def get_all_users(self) -> list[User]: ...
+    def get_users_after(
+        self, cursor: int, last_user_id: int, limit: int
+    ) -> list[tuple[int, str]]: ...
+    def get_ticket_file_id(
+        self, hash_code: str, style: str, qr_key: str
+    ) -> str | None: ...
+    def get_ticket_file_ids(
+        self, hash_codes: list[str], style: str
+    ) -> dict[str, tuple[str, str]]: ...
+    def save_ticket_file_id(
+        self, hash_code: str, style: str, qr_key: str, file_id: str
+    ) -> None: ...
+    def add_pending_payment(
+        self,
+        payment_id: str | int,
+        hash_code: str,
+        tg_id: str | int,
+        chat_id: int,
+        message_id: int,
+        to_datetime: date,
+    ) -> None: ...
+    def get_pending_payments(self) -> list[PendingPayment]: ...
+    def remove_pending_payment(self, payment_id: str | int) -> bool: ...
+    def mark_payment_for_refund(self, payment_id: str | int) -> bool: ...
+    def create_broadcast(
+        self, author_id: int, text: str, chat_id: int, message_id: int
+    ) -> Broadcast: ...
+    def get_unfinished_broadcasts(self) -> list[Broadcast]: ...
+    def save_broadcast_progress(
+        self, broadcast_id: int, cursor: int, sent: int, failed: int, is_done: bool
+    ) -> None: ...
     def add_user(self, tg_id: str | int) -> bool: ...
+    def use_hash(self, hash_code: str) -> bool: ...
+    def check_in_hashes(self, hash_codes: list[str]) -> dict[str, bool | None]: ...
+    def get_active_tickets(self, to_datetime: date) -> list[tuple[str, bool]]: ...
     @overload
     def enable_visitor(
         self,
@@ -51,12 +149,20 @@ class Database:
     @overload
     def enable_visitor(self, *, hash_code: str | None = None) -> str: ...
     def reg_new_visitor(
-        self, tg_id: str | int, to_datetime: datetime, is_active: bool = True
+        self,
+        tg_id: str | int,
+        to_datetime: datetime,
+        is_active: bool = True,
+        hold_until: datetime | None = None,
     ) -> str: ...
     def delete_visitor(
         self, tg_id: str | int, to_datetime: date | None = None
-    ) -> None: ...
+    ) -> list[str]: ...
     def disable_visitor(self, hash_code: str) -> bool: ...
+    def get_seat_holds(self) -> list[tuple[str, datetime | None]]: ...
+    def extend_seat_hold(self, hash_code: str, until: datetime) -> bool: ...
+    def release_seat_holds(self, hash_codes: list[str]) -> list[str]: ...
+    def release_expired_holds(self, now: datetime | None = None) -> list[str]: ...
     def check_registration_by_hash(
         self, hash_code: str, is_strict: bool = True
     ) -> Visitor | None: ...
@@ -67,6 +173,97 @@ class Database:
     def get_events(
         self, show_all: bool = False, show_old: bool = True
     ) -> list[Registration]: ...
+    def get_buy_events(self, tg_id: str | int) -> list[EventAvailability]: ...
+    def get_availability(self) -> AvailabilitySnapshot: ...
     def is_event_full(self, to_datetime: date) -> bool: ...
     def add_event(self, to_datetime: date, max_visitors: int) -> None: ...
     def delete_event(self, to_datetime: date) -> None: ...
+
+class AsyncDatabase:
+    db: Database
+    executor: ThreadPoolExecutor
+    pending: int
+    def __init__(self, db: Database, workers: int | None = None) -> None: ...
+    async def run(self, func: Callable[..., T], /, *args: Any, **kwargs: Any) -> T: ...
+    def close(self) -> None: ...
+    async def setup(self, backups: bool = True) -> None: ...
+    async def get_all_visitors(self, q: str | int | None = None) -> list[Visitor]: ...
+    async def get_user_hashcode(
+        self, tg_id: str | int, to_datetime: date | datetime
+    ) -> str: ...
+    async def get_all_users(self) -> list[User]: ...
+    async def get_users_after(
+        self, cursor: int, last_user_id: int, limit: int
+    ) -> list[tuple[int, str]]: ...
+    async def get_ticket_file_id(
+        self, hash_code: str, style: str, qr_key: str
+    ) -> str | None: ...
+    async def get_ticket_file_ids(
+        self, hash_codes: list[str], style: str
+    ) -> dict[str, tuple[str, str]]: ...
+    async def save_ticket_file_id(
+        self, hash_code: str, style: str, qr_key: str, file_id: str
+    ) -> None: ...
+    async def add_pending_payment(
+        self,
+        payment_id: str | int,
+        hash_code: str,
+        tg_id: str | int,
+        chat_id: int,
+        message_id: int,
+        to_datetime: date,
+    ) -> None: ...
+    async def get_pending_payments(self) -> list[PendingPayment]: ...
+    async def remove_pending_payment(self, payment_id: str | int) -> bool: ...
+    async def mark_payment_for_refund(self, payment_id: str | int) -> bool: ...
+    async def create_broadcast(
+        self, author_id: int, text: str, chat_id: int, message_id: int
+    ) -> Broadcast: ...
+    async def get_unfinished_broadcasts(self) -> list[Broadcast]: ...
+    async def save_broadcast_progress(
+        self, broadcast_id: int, cursor: int, sent: int, failed: int, is_done: bool
+    ) -> None: ...
+    async def add_user(self, tg_id: str | int) -> bool: ...
+    async def use_hash(self, hash_code: str) -> bool: ...
+    async def check_in_hashes(
+        self, hash_codes: list[str]
+    ) -> dict[str, bool | None]: ...
+    async def get_active_tickets(self, to_datetime: date) -> list[tuple[str, bool]]: ...
+    async def enable_visitor(
+        self,
+        *,
+        tg_id: int | str | None = None,
+        to_datetime: datetime | date | None = None,
+        hash_code: str | None = None
+    ) -> str: ...
+    async def reg_new_visitor(
+        self,
+        tg_id: str | int,
+        to_datetime: datetime,
+        is_active: bool = True,
+        hold_until: datetime | None = None,
+    ) -> str: ...
+    async def delete_visitor(
+        self, tg_id: str | int, to_datetime: date | None = None
+    ) -> list[str]: ...
+    async def disable_visitor(self, hash_code: str) -> bool: ...
+    async def get_seat_holds(self) -> list[tuple[str, datetime | None]]: ...
+    async def extend_seat_hold(self, hash_code: str, until: datetime) -> bool: ...
+    async def release_seat_holds(self, hash_codes: list[str]) -> list[str]: ...
+    async def release_expired_holds(self, now: datetime | None = None) -> list[str]: ...
+    async def check_registration_by_hash(
+        self, hash_code: str, is_strict: bool = True
+    ) -> Visitor | None: ...
+    async def check_registration_by_tgid(
+        self, tg_id: str | int, to_datetime: date, is_active: bool = True
+    ) -> bool: ...
+    async def get_available(self, date: str | date | Column[date]) -> int: ...
+    async def get_events(
+        self, show_all: bool = False, show_old: bool = True
+    ) -> list[Registration]: ...
+    async def get_buy_events(self, tg_id: str | int) -> list[EventAvailability]: ...
+    async def get_availability(self) -> AvailabilitySnapshot: ...
+    async def is_event_full(self, to_datetime: date) -> bool: ...
+    async def add_event(self, to_datetime: date, max_visitors: int) -> None: ...
+    async def get_event(self, to_datetime: date | str) -> Registration | None: ...
+    async def delete_event(self, to_datetime: date) -> None: ...
@@ -0,0 +1,38 @@
+from logging import Logger
+from typing import Any
+from .database import AsyncDatabase, Broadcast
+
+class TokenBucket:
+    rate: float
+    capacity: float
+    tokens: float
+    updated: float
+    paused_until: float
+    def __init__(self, rate: float, capacity: float | None = None) -> None: ...
+    def pause(self, seconds: float) -> None: ...
+    async def acquire(self) -> None: ...
+
+class Newsletter:
+    logger: Logger
+    client: Any
+    db: AsyncDatabase
+    concurrency: int
+    rate: float
+    progress_interval: float
+    max_retries: int
+    page_size: int
+    bucket: TokenBucket
+    def __init__(
+        self,
+        client: Any,
+        db: AsyncDatabase,
+        concurrency: int | None = None,
+        rate: float | None = None,
+        progress_interval: float | None = None,
+    ) -> None: ...
+    async def start(
+        self, author_id: int, text: str, chat_id: int, message_id: int
+    ) -> Broadcast: ...
+    async def resume(self) -> None: ...
+    async def stop(self) -> None: ...
+    async def wait(self) -> None: ...
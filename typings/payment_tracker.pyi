@@ -0,0 +1,49 @@
+from datetime import date
+from logging import Logger
+from typing import Any, Awaitable, Callable
+from .customtinkoffacquiringapclient import CustomTinkoffAcquiringAPIClient
+from .database import AsyncDatabase, PendingPayment
+
+class RefundRequired(Exception): ...
+
+class PaymentTracker:
+    logger: Logger
+    db: AsyncDatabase
+    tb: CustomTinkoffAcquiringAPIClient
+    on_confirmed: Callable[[PendingPayment], Awaitable[None]]
+    on_cancelled: Callable[[PendingPayment], Awaitable[Any]] | None
+    on_extended: Callable[[PendingPayment], Awaitable[Any]] | None
+    on_refund: Callable[[PendingPayment], Awaitable[Any]] | None
+    concurrency: int
+    min_interval: float
+    max_interval: float
+    ttl: float
+    confirm_attempts: int
+    confirm_ttl: float
+    checks: int
+    def __init__(
+        self,
+        db: AsyncDatabase,
+        tb: CustomTinkoffAcquiringAPIClient,
+        on_confirmed: Callable[[PendingPayment], Awaitable[None]],
+        concurrency: int | None = None,
+        min_interval: float | None = None,
+        max_interval: float | None = None,
+        ttl: float | None = None,
+        on_cancelled: Callable[[PendingPayment], Awaitable[Any]] | None = None,
+        on_extended: Callable[[PendingPayment], Awaitable[Any]] | None = None,
+        on_refund: Callable[[PendingPayment], Awaitable[Any]] | None = None,
+        confirm_attempts: int | None = None,
+        confirm_ttl: float | None = None,
+    ) -> None: ...
+    async def start(self) -> None: ...
+    async def stop(self) -> None: ...
+    async def track(
+        self,
+        payment_id: str | int,
+        hash_code: str,
+        tg_id: int,
+        chat_id: int,
+        message_id: int,
+        to_datetime: date,
+    ) -> None: ...
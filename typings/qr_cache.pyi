@@ -0,0 +1,26 @@
+from logging import Logger
+from pathlib import Path
+from typing import Any, Hashable
+
+class QRCache:
+    logger: Logger
+    max_bytes: int
+    max_disk_bytes: int
+    cache_dir: Path | None
+    size: int
+    disk_size: int
+    hits: int
+    disk_hits: int
+    misses: int
+    def __init__(
+        self,
+        max_bytes: int | None = None,
+        cache_dir: str | None = None,
+        max_disk_bytes: int | None = None,
+    ) -> None: ...
+    @staticmethod
+    def make_key(key: Hashable) -> str: ...
+    async def get(self, key: Hashable) -> bytes | None: ...
+    async def put(self, key: Hashable, png: bytes) -> None: ...
+    def invalidate(self, key: Hashable) -> None: ...
+    def stats(self) -> dict[str, Any]: ...
@@ -0,0 +1,20 @@
+from concurrent.futures import ProcessPoolExecutor
+from logging import Logger
+
+class QRRenderer:
+    logger: Logger
+    workers: int
+    max_tasks_per_child: int
+    chunk_size: int
+    executor: ProcessPoolExecutor | None
+    pending: int
+    submitted: int
+    def __init__(
+        self, workers: int | None = None, max_tasks_per_child: int | None = None
+    ) -> None: ...
+    async def start(self) -> None: ...
+    async def render(self, data: str | list[str], style: str | None = None) -> bytes: ...
+    async def render_many(
+        self, payloads: list[str | list[str]], style: str | None = None
+    ) -> list[bytes]: ...
+    def close(self) -> None: ...
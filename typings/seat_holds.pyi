@@ -0,0 +1,23 @@
+from datetime import datetime
+from logging import Logger
+from .database import AsyncDatabase
+
+class SeatHolds:
+    logger: Logger
+    db: AsyncDatabase
+    ttl: float
+    sweep_interval: float
+    def __init__(
+        self,
+        db: AsyncDatabase,
+        ttl: float | None = None,
+        sweep_interval: float | None = None,
+        min_ttl: float = 0,
+    ) -> None: ...
+    async def start(self) -> None: ...
+    async def stop(self) -> None: ...
+    def deadline(self) -> datetime: ...
+    def add(self, hash_code: str, expires_at: datetime) -> None: ...
+    async def extend(self, hash_code: str) -> bool: ...
+    async def release(self, hash_code: str) -> None: ...
+    def discard(self, hash_code: str) -> None: ...
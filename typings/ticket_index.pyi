@@ -0,0 +1,23 @@
+from datetime import date
+from enum import Enum
+from logging import Logger
+from .database import AsyncDatabase
+
+class ScanResult(Enum):
+    OK = "ok"
+    USED = "used"
+    INVALID = "invalid"
+    WRONG_DATE = "wrong_date"
+
+class TicketIndex:
+    logger: Logger
+    db: AsyncDatabase
+    day: date | None
+    def __init__(self, db: AsyncDatabase) -> None: ...
+    async def load(self, day: date | None = None) -> None: ...
+    def add(self, hash_code: str, to_datetime: date) -> None: ...
+    def discard(self, hash_code: str) -> None: ...
+    async def check_in(self, hash_code: str) -> ScanResult: ...
+    async def check_in_many(
+        self, hash_codes: list[str]
+    ) -> list[tuple[str, ScanResult]]: ...
@@ -0,0 +1,18 @@
+from datetime import date
+from typing import NamedTuple
+
+TOKEN_PREFIX: str
+SIGNATURE_BYTES: int
+EPOCH: date
+TOKEN_LENGTH: int
+
+class TicketToken(NamedTuple):
+    ticket_id: int
+    event_date: date
+    def sign(self, secret: bytes) -> str: ...
+    @classmethod
+    def verify(
+        cls, token: str, secrets: tuple[bytes, ...]
+    ) -> TicketToken | None: ...
+
+def is_token(code: str) -> bool: ...